@@ -0,0 +1,24 @@
+import os
+from contextlib import contextmanager
+
+# Every file the pipeline rewrites in place goes through here: it is written to a .tmp
+# sibling and renamed over the target, so readers and the next run see the old contents
+# or the new ones, never a partial write.
+
+@contextmanager
+def atomic_write(path, mode='w', encoding=None, newline=None, fsync=False, suffix=".tmp"):
+    # fsync for records that must survive a crash of the machine, not just of the process;
+    # suffix keeps concurrent writers of the same path apart
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}{suffix}"
+    try:
+        with open(tmp_path, mode, encoding=encoding, newline=newline) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
@@ -0,0 +1,198 @@
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import orjson
+import pytz
+import run_metrics
+import synthetic_data
+import update_star_history
+from repo_registry import RepoRegistry
+import convert_and_sort_star_history
+
+DEFAULT_SIZES = [5_000, 50_000]
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+def legacy_process_archive(payload):
+    # The line-by-line gzip + orjson extractor process_archive() replaced, minus the active-repo filter
+    counts = {}
+    with gzip.GzipFile(fileobj=io.BytesIO(payload)) as f:
+        for line in f:
+            if b'"type":"WatchEvent"' not in line:
+                continue
+            try:
+                repo_name = orjson.loads(line).get("repo", {}).get("name")
+            except Exception:
+                continue
+            if repo_name:
+                counts[repo_name] = counts.get(repo_name, 0) + 1
+    return counts
+
+def iter_chunks(payload, size=update_star_history.CHUNK_SIZE):
+    for start in range(0, len(payload), size):
+        yield payload[start:start + size]
+
+def measure(func, repeat):
+    # Best of `repeat` runs; peak RSS covers the measured calls only where the OS allows a reset
+    run_metrics.reset_peak_rss()
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result, run_metrics.peak_rss_mb()
+
+def bench_process_archive(events, watch_ratio, repeat, legacy=False):
+    payload = synthetic_data.archive_hour(events=events, watch_ratio=watch_ratio, members=2)
+    decompressed = len(gzip.decompress(payload))
+    if legacy:
+        seconds, counts, peak = measure(lambda: legacy_process_archive(payload), repeat)
+    else:
+        seconds, counts, peak = measure(
+            lambda: update_star_history.process_archive(update_star_history.iter_archive_blocks(iter_chunks(payload))),
+            repeat
+        )
+    return {
+        "seconds": seconds,
+        "throughput": events / seconds,
+        "unit": "events/s",
+        "decompressed_mb_per_s": decompressed / seconds / 1e6,
+        "watch_events": sum(counts.values()),
+        "peak_rss_mb": peak,
+        "counts": counts,
+    }
+
+def bench_write_batch_updates(size, repeat):
+    store = synthetic_data.star_store(synthetic_data.repo_names(size))
+    active_repos = set(store.repos)
+    registry = RepoRegistry()
+    registry.sync(dict.fromkeys(store.repos))
+    seconds, _, peak = measure(lambda: update_star_history.write_batch_updates(store, active_repos, registry), repeat)
+    return {"seconds": seconds, "throughput": size / seconds, "unit": "repos/s", "peak_rss_mb": peak}
+
+def bench_convert_to_cumulative(size, repeat):
+    store = synthetic_data.star_store(synthetic_data.repo_names(size))
+    histories = [store.history(repo) for repo in store.repos]
+
+    def run():
+        for history in histories:
+            convert_and_sort_star_history.convert_to_cumulative(history, 100_000)
+
+    seconds, _, peak = measure(run, repeat)
+    return {"seconds": seconds, "throughput": size / seconds, "unit": "repos/s", "peak_rss_mb": peak}
+
+def bench_convert_main(size, repeat, warm=False):
+    # Cold runs start without fingerprints so every converted history is written; warm runs reuse them
+    synthetic_data.write_tree(".", size)
+    os.makedirs("frontend/public", exist_ok=True)
+
+    def run():
+        if not warm:
+            shutil.rmtree("cache", ignore_errors=True)
+        convert_and_sort_star_history.main()
+
+    if warm:
+        run()
+    seconds, _, peak = measure(run, repeat)
+    return {"seconds": seconds, "throughput": size / seconds, "unit": "repos/s", "peak_rss_mb": peak}
+
+CASES = {
+    "process_archive": lambda size, args: bench_process_archive(args.events, args.watch_ratio, args.repeat),
+    "process_archive_legacy": lambda size, args: bench_process_archive(args.events, args.watch_ratio, args.repeat, legacy=True),
+    "write_batch_updates": lambda size, args: bench_write_batch_updates(size, args.repeat),
+    "convert_to_cumulative": lambda size, args: bench_convert_to_cumulative(size, args.repeat),
+    "convert_main": lambda size, args: bench_convert_main(size, args.repeat),
+    "convert_main_warm": lambda size, args: bench_convert_main(size, args.repeat, warm=True),
+}
+# These do not depend on the repo count, so they run once rather than per size
+SIZE_INDEPENDENT = {"process_archive", "process_archive_legacy"}
+
+def run_case(name, size, args):
+    # Runs in a fresh process inside a scratch directory, since the pipeline writes relative paths
+    logging.getLogger().setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="star-bench-")
+    os.chdir(workdir)
+    try:
+        return CASES[name](size, args)
+    finally:
+        os.chdir(args.root)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\nAgainst {baseline_path}:")
+    for result in results:
+        before = baseline.get((result["case"], result["size"]))
+        if before:
+            print(
+                f"  {result['case']:<24} {result['size'] or '-':>8} "
+                f"{before['seconds'] / result['seconds']:6.2f}x speed "
+                f"{result['peak_rss_mb'] - before['peak_rss_mb']:+8.1f} MB peak RSS"
+            )
+
+def main(args):
+    args.root = os.getcwd()
+    results = []
+    # spawn keeps each case's peak RSS free of pages inherited from this process
+    context = multiprocessing.get_context("spawn")
+    for name in args.cases:
+        for size in [None] if name in SIZE_INDEPENDENT else args.sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, name, size, args).result()
+            counts = result.pop("counts", None)
+            results.append({"case": name, "size": size, **result})
+            print(
+                f"{name:<24} {size or '-':>8} {result['seconds']:9.3f}s "
+                f"{result['throughput']:14,.0f} {result['unit']:<9} {result['peak_rss_mb']:8.1f} MB peak RSS",
+                flush=True
+            )
+            if counts is not None:
+                args.archive_counts = getattr(args, "archive_counts", None) or counts
+                if counts != args.archive_counts:
+                    print("  WARNING: WatchEvent counts differ from the other extractor", flush=True)
+
+    report = {
+        "generated_at": datetime.now(pytz.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "events": args.events,
+        "watch_ratio": args.watch_ratio,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the star history pipeline on synthetic data")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="benchmarks to run (default: all)")
+    parser.add_argument("--sizes", type=lambda s: [parse_size(x) for x in s.split(",")], default=DEFAULT_SIZES, help="comma-separated repo counts, e.g. 5k,50k,500k (default: 5k,50k)")
+    parser.add_argument("--events", type=int, default=100_000, help="events per synthetic archive hour")
+    parser.add_argument("--watch-ratio", type=float, default=0.06, help="share of archive events that are WatchEvents")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    main(parser.parse_args())
@@ -1,6 +1,7 @@
 import os
 import csv
 import logging
+from repo_registry import RepoRegistry
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -19,22 +20,20 @@ def get_active_repos():
     return active
 
 def cleanup_files(active_repos):
-    removed = 0
+    # The registry knows which file belongs to which repo, so only removed repos are touched
     if not os.path.exists(STAR_HISTORY_DIR):
-        return removed
-    for file in os.listdir(STAR_HISTORY_DIR):
-        if not file.endswith(".csv"):
-            continue
-        repo_name = file[:-4].replace('_', '/', 1)
-        if repo_name not in active_repos:
-            os.remove(os.path.join(STAR_HISTORY_DIR, file))
-            logging.info(f"Removed outdated: {repo_name}")
-            removed += 1
-    return removed
+        return 0
+    registry = RepoRegistry.load_or_bootstrap(active_repos)
+    removed = registry.prune(active_repos)
+    for repo_name in removed:
+        logging.info(f"Removed outdated: {repo_name}")
+    if removed:
+        registry.save()
+    return len(removed)
 
-def main():
+def main(active_repos=None):
     logging.info("Starting repository cleanup")
-    active = get_active_repos()
+    active = get_active_repos() if active_repos is None else active_repos
     removed = cleanup_files(active)
     logging.info(f"Removed {removed} outdated repository histories")
 
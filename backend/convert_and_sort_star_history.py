@@ -1,6 +1,17 @@
 import os
 import csv
+import json
+import time
+import hashlib
+import argparse
 import logging
+import numpy as np
+from growth_metrics import compute_growth_metrics, compute_post_day_metrics, compute_window_metrics
+from star_store import StarStore
+from repo_registry import RepoRegistry
+from frontend_bundle import build_bundle, write_bundle
+from atomic_file import atomic_write
+import run_metrics
 
 STAR_HISTORY_DIR = "star_history"
 REPO_INDEX_FILE = "repo_index.csv"
@@ -14,6 +25,10 @@ OUTPUT_RAW_1D = "frontend/public/sorted_raw_1d.csv"
 OUTPUT_RAW_5D = "frontend/public/sorted_raw_5d.csv"
 OUTPUT_RAW_30D = "frontend/public/sorted_raw_30d.csv"
 REPO_FILTERS_OUTPUT = "frontend/public/repo_filters.csv"
+POST_DAYS = range(1, 30)
+# Windows longer than the daily history, served from the store's weekly and monthly rollups
+LONG_WINDOWS = (90, 365)
+FINGERPRINTS_FILE = os.path.join("cache", "converted_fingerprints.json")
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -27,10 +42,13 @@ def load_repo_index():
                 metadata[repo_name] = row
     return metadata, reader.fieldnames
 
+def parse_repo_history(content):
+    reader = csv.reader(content.decode('utf-8').splitlines())
+    return [(row[0], None if row[1] == "NA" else int(row[1])) for row in reader]
+
 def load_repo_history(repo_filename):
-    with open(os.path.join(STAR_HISTORY_DIR, repo_filename), 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        return [(row[0], None if row[1] == "NA" else int(row[1])) for row in reader]
+    with open(os.path.join(STAR_HISTORY_DIR, repo_filename), 'rb') as f:
+        return parse_repo_history(f.read())
 
 def convert_to_cumulative(daily_deltas, current_count):
     cumulative = []
@@ -44,179 +62,179 @@ def convert_to_cumulative(daily_deltas, current_count):
     cumulative.reverse()
     return cumulative
 
-def clear_converted_dir():
-    if os.path.exists(CONVERTED_DIR):
-        for file in os.listdir(CONVERTED_DIR):
-            path = os.path.join(CONVERTED_DIR, file)
-            if os.path.isfile(path):
-                os.remove(path)
-    else:
-        os.makedirs(CONVERTED_DIR)
+def input_fingerprint(history, current_stars):
+    return hashlib.sha1(repr((history, current_stars)).encode()).hexdigest()
+
+def load_fingerprints():
+    try:
+        with open(FINGERPRINTS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_fingerprints(fingerprints):
+    with atomic_write(FINGERPRINTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(fingerprints, f)
+
+def remove_converted(repo_names):
+    for repo_name in repo_names:
+        path = os.path.join(CONVERTED_DIR, f"{repo_name}.csv")
+        if os.path.exists(path):
+            os.remove(path)
+            logging.info(f"Removed converted history for {repo_name}")
+        owner_dir = os.path.dirname(path)
+        if os.path.isdir(owner_dir) and not os.listdir(owner_dir):
+            os.rmdir(owner_dir)
+
+def iter_csv_histories(repo_names):
+    registry = RepoRegistry.load_or_bootstrap(repo_names)
+    for repo_name in registry.names():
+        try:
+            yield repo_name, load_repo_history(registry.file(repo_name))
+        except Exception as e:
+            logging.warning(f"Failed to read history for {repo_name}: {e}")
 
-def main():
+def iter_store_histories(store):
+    for repo_name in store.repos:
+        yield repo_name, store.history(repo_name)
+
+def long_window_metrics(names, star_counts, store):
+    # pct/raw columns for LONG_WINDOWS, empty when the history cannot cover a window
+    if store is None:
+        logging.info("No star store found, writing long-window rankings empty")
+    coverage = store.coverage_start() if store is not None else None
+    columns = {}
+    for window in LONG_WINDOWS:
+        gain_by_repo, covered = {}, False
+        if store is not None:
+            gains, window_start = store.window_gain(window)
+            gain_by_repo = dict(zip(store.repos, gains.tolist()))
+            covered = coverage is not None and window_start is not None and coverage <= window_start
+            if not covered:
+                logging.info(f"History starts {coverage}, too recent for {window}-day rankings; writing them empty")
+        columns.update(compute_window_metrics(
+            star_counts,
+            [gain_by_repo.get(name, 0) if covered else np.nan for name in names],
+            window
+        ))
+    return columns
+
+def rank_metrics(names, columns, keys):
+    # Every ranking from one stable argsort over a (metric, repo) matrix: descending by value,
+    # missing values last, ties in name order. Returns each key's repo positions in rank order.
+    by_name = np.argsort(np.array(names, dtype=str), kind='stable')
+    matrix = np.array([columns[key] for key in keys], dtype=np.float64).reshape(len(keys), len(names))
+    orders = by_name[np.argsort(-matrix[:, by_name], axis=1, kind='stable')]
+    return dict(zip(keys, orders))
+
+def main(top_k=None, repo_index=None, store=None):
+    # repo_index and store let the pipeline hand over data it already holds in memory
     logging.info("Starting conversion and growth-based sorting")
 
-    repo_metadata, fieldnames = load_repo_index()
-    repos_data = []
-
-    clear_converted_dir()
-
-    for filename in os.listdir(STAR_HISTORY_DIR):
-        if not filename.endswith(".csv"):
-            continue
-
-        repo_name = filename[:-4].replace("_", "/", 1)
+    repo_metadata, fieldnames = repo_index or load_repo_index()
+    names, star_counts, series, histories = [], [], [], []
+    old_fingerprints = load_fingerprints()
+    fingerprints = {}
+    written = 0
+    load_start = time.perf_counter()
+
+    if store is None:
+        store = StarStore.load()
+    # The per-repo CSVs are only read when there is no store, e.g. for histories from older versions
+    repo_histories = iter_csv_histories(repo_metadata) if store is None else iter_store_histories(store)
+    for repo_name, history in repo_histories:
         if repo_name not in repo_metadata:
             logging.warning(f"Missing metadata for {repo_name}, skipping")
             continue
 
-        try:
-            history = load_repo_history(filename)
-        except Exception as e:
-            logging.warning(f"Failed to read history for {repo_name}: {e}")
-            continue
-
         current_stars = int(repo_metadata[repo_name]["stargazers_count"])
         cumulative = convert_to_cumulative(history, current_stars)
         converted_path = os.path.join(CONVERTED_DIR, f"{repo_name}.csv")
-        os.makedirs(os.path.dirname(converted_path), exist_ok=True)
-
-        with open(converted_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["date", "stars"])
-            for date, stars in cumulative:
-                writer.writerow([date, stars if stars is not None else "NA"])
-
-        values = [v for (_, v) in cumulative if v is not None]
-
-        pct_30d = raw_30d = pct_1d = raw_1d = pct_5d = raw_5d = None
-        max_5d_index = None
-        post_pct_5d = post_raw_5d = None
-
-        if len(values) >= 2:
-            for i in range(len(values)-1):
-                if values[i] is not None and values[i+1] is not None:
-                    diff = values[i+1] - values[i]
-                    pct = ((diff) / values[i]) * 100 if values[i] > 0 else None
-                    if pct_1d is None or pct > pct_1d:
-                        pct_1d = pct
-                    if raw_1d is None or diff > raw_1d:
-                        raw_1d = diff
-
-        if len(values) >= 6:
-            for i in range(len(values) - 5):
-                segment = values[i:i+6]
-                if None in segment:
-                    continue
-                start, end = segment[0], segment[5]
-                diff = end - start
-                if start == 0:
-                    continue
-                pct = (diff / start) * 100
-                if pct_5d is None or pct > pct_5d:
-                    pct_5d = pct
-                    max_5d_index = i
-                if raw_5d is None or diff > raw_5d:
-                    raw_5d = diff
-
-        is_upcoming = False
-        if max_5d_index is not None and max_5d_index + 5 >= len(values) - 5:
-            is_upcoming = True
-
-        if max_5d_index is not None and max_5d_index + 6 < len(values):
-            post_start = values[max_5d_index + 6]
-            post_end = values[-1]
-            if post_start is not None and post_end is not None:
-                post_diff = post_end - post_start
-                if post_start > 0:
-                    post_pct_5d = (post_diff / post_start) * 100
-                post_raw_5d = post_diff
-
-        if len(values) >= 30:
-            start_30d = values[-30]
-            end_30d = values[-1]
-            diff = end_30d - start_30d
-            if start_30d > 0:
-                pct_30d = (diff / start_30d) * 100
-            raw_30d = diff
-
-        repos_data.append({
-            "name": repo_name,
-            "pct_1d": pct_1d,
-            "raw_1d": raw_1d,
-            "pct_5d": pct_5d,
-            "raw_5d": raw_5d,
-            "pct_30d": pct_30d,
-            "raw_30d": raw_30d,
-            "post_pct_5d": post_pct_5d,
-            "post_raw_5d": post_raw_5d,
-            "upcoming": is_upcoming
-        })
-
-    def write_sorted_output(output_file, key, label):
-        sorted_data = sorted(repos_data, key=lambda x: (x[key] is None, -x[key] if x[key] is not None else 0, x["name"]))
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["repo_name", label, "current_stars"])
-            for repo in sorted_data:
-                stars = int(repo_metadata[repo["name"]]["stargazers_count"])
-                writer.writerow([
-                    repo["name"],
-                    f"{repo[key]:.2f}" if repo[key] is not None else "",
-                    stars
-                ])
-
-    write_sorted_output(OUTPUT_PCT_1D, "pct_1d", "pct_1d_growth")
-    write_sorted_output(OUTPUT_RAW_1D, "raw_1d", "raw_1d_growth")
-    write_sorted_output(OUTPUT_PCT_5D, "pct_5d", "pct_5d_growth")
-    write_sorted_output(OUTPUT_RAW_5D, "raw_5d", "raw_5d_growth")
-    write_sorted_output(OUTPUT_PCT_30D, "pct_30d", "pct_30d_growth")
-    write_sorted_output(OUTPUT_RAW_30D, "raw_30d", "raw_30d_growth")
-    write_sorted_output(OUTPUT_PCT_POST_5D, "post_pct_5d", "post_pct_5d_growth")
-    write_sorted_output(OUTPUT_RAW_POST_5D, "post_raw_5d", "post_raw_5d_growth")
+        fingerprint = input_fingerprint(history, current_stars)
+        fingerprints[repo_name] = fingerprint
+
+        # Only rewrite outputs whose history or star count changed since the last run
+        if old_fingerprints.get(repo_name) != fingerprint or not os.path.exists(converted_path):
+            os.makedirs(os.path.dirname(converted_path), exist_ok=True)
+            with open(converted_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["date", "stars"])
+                for date, stars in cumulative:
+                    writer.writerow([date, stars if stars is not None else "NA"])
+            written += 1
+
+        names.append(repo_name)
+        star_counts.append(current_stars)
+        series.append([v for (_, v) in cumulative if v is not None])
+        histories.append(cumulative)
+
+    remove_converted(old_fingerprints.keys() - fingerprints.keys())
+    save_fingerprints(fingerprints)
+    logging.info(f"Rewrote {written} of {len(fingerprints)} converted histories")
+    run_metrics.observe("convert_histories_seconds", time.perf_counter() - load_start)
+    run_metrics.incr("converted_histories", len(fingerprints))
+    run_metrics.incr("converted_histories_rewritten", written)
+
+    with run_metrics.timed("growth_metrics_seconds"):
+        metrics = compute_growth_metrics(series)
+    columns = dict(metrics)
+    outputs = [
+        (OUTPUT_PCT_1D, "pct_1d", "pct_1d_growth"),
+        (OUTPUT_RAW_1D, "raw_1d", "raw_1d_growth"),
+        (OUTPUT_PCT_5D, "pct_5d", "pct_5d_growth"),
+        (OUTPUT_RAW_5D, "raw_5d", "raw_5d_growth"),
+        (OUTPUT_PCT_30D, "pct_30d", "pct_30d_growth"),
+        (OUTPUT_RAW_30D, "raw_30d", "raw_30d_growth"),
+        (OUTPUT_PCT_POST_5D, "post_pct_5d", "post_pct_5d_growth"),
+        (OUTPUT_RAW_POST_5D, "post_raw_5d", "post_raw_5d_growth"),
+    ]
+
+    columns.update(long_window_metrics(names, star_counts, store))
+    for window in LONG_WINDOWS:
+        outputs.append((f"frontend/public/sorted_pct_{window}d.csv", f"pct_{window}d", f"pct_{window}d_growth"))
+        outputs.append((f"frontend/public/sorted_raw_{window}d.csv", f"raw_{window}d", f"raw_{window}d_growth"))
+
+    filter_rows = []
+    for name, upcoming in zip(names, metrics["upcoming"]):
+        row = repo_metadata[name].copy()
+        row["upcoming"] = str(upcoming).lower()
+        filter_rows.append(row)
 
     with open(REPO_FILTERS_OUTPUT, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames + ["upcoming"])
         writer.writeheader()
-        for repo in repos_data:
-            row = repo_metadata[repo["name"]].copy()
-            row["upcoming"] = str(repo["upcoming"]).lower()
-            writer.writerow(row)
-
-    for day in range(1, 30):
-        pct_key = f"post_pct_day_{day}"
-        raw_key = f"post_raw_day_{day}"
-        for repo in repos_data:
-            values = [
-                v for (_, v) in convert_to_cumulative(
-                    load_repo_history(f"{repo['name'].replace('/', '_')}.csv"),
-                    int(repo_metadata[repo['name']]["stargazers_count"])
+        writer.writerows(filter_rows)
+
+    stage_start = time.perf_counter()
+    columns.update(compute_post_day_metrics(series, POST_DAYS))
+    logging.info(f"Computed post-day metrics for {len(names)} repos in {time.perf_counter() - stage_start:.2f}s")
+    run_metrics.observe("post_day_metrics_seconds", time.perf_counter() - stage_start)
+    for day in POST_DAYS:
+        outputs.append((f"frontend/public/sorted_pct_post_day_{day}.csv", f"post_pct_day_{day}", f"pct_post_day_{day}_growth"))
+        outputs.append((f"frontend/public/sorted_raw_post_day_{day}.csv", f"post_raw_day_{day}", f"raw_post_day_{day}_growth"))
+
+    rankings = {}
+    with run_metrics.timed("sorted_output_seconds"):
+        orders = rank_metrics(names, columns, [key for _, key, _ in outputs])
+        for output_file, key, label in outputs:
+            values = columns[key]
+            ranked = orders[key][:top_k].tolist()
+            with open(output_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["repo_name", label, "current_stars"])
+                writer.writerows(
+                    [names[i], f"{values[i]:.2f}" if values[i] is not None else "", star_counts[i]]
+                    for i in ranked
                 )
-                if v is not None
-            ]
-            if len(values) <= day or values[day] is None or values[-1] is None:
-                repo[pct_key] = None
-                repo[raw_key] = None
-                continue
-
-            start = values[day]
-            end = values[-1]
-            diff = end - start
-            repo[raw_key] = diff
-            repo[pct_key] = (diff / start) * 100 if start > 0 else None
-
-        write_sorted_output(
-            f"frontend/public/sorted_pct_post_day_{day}.csv",
-            pct_key,
-            f"pct_post_day_{day}_growth"
-        )
-        write_sorted_output(
-            f"frontend/public/sorted_raw_post_day_{day}.csv",
-            raw_key,
-            f"raw_post_day_{day}_growth"
-        )
+            rankings[os.path.basename(output_file)[:-4]] = (label, [(i, values[i]) for i in ranked])
+
+    with run_metrics.timed("bundle_seconds"):
+        write_bundle(build_bundle(filter_rows, fieldnames + ["upcoming"], rankings, histories))
 
     logging.info("Generated all CSVs including updated repo_filters.csv with upcoming column")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert star deltas to cumulative history and write growth rankings")
+    parser.add_argument("--top-k", type=int, help="only write the top K repositories to each sorted CSV")
+    args = parser.parse_args()
+    main(top_k=args.top_k)
\ No newline at end of file
@@ -1,10 +1,21 @@
 import os
+import re
+import json
+import math
+import time
+import shutil
+import argparse
+import threading
+import email.utils
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import csv
 import pytz
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from atomic_file import atomic_write
 
 load_dotenv()
 
@@ -19,20 +30,242 @@ HEADERS = {
 
 REPO_INDEX_FILE = "repo_index.csv"
 FRONTEND_FILTERS_FILE = "frontend/public/repo_filters.csv"
+SEARCH_RATE_PER_MINUTE = 30
+MAX_CONCURRENCY = 4
+MAX_PAGE_RETRIES = 6
+RESULTS_CAP = 1000
+RANGE_EPOCH = datetime(2000, 1, 1, tzinfo=pytz.utc)
+SEARCH_CACHE_FILE = os.path.join("cache", "search_cache.json")
+REPO_INDEX_DIFF_FILE = os.path.join("cache", "repo_index_diff.json")
+# Date range of a cached page's query (cache keys are "<q>&page=N")
+CREATED_RANGE_RE = re.compile(r"created:([\d-]+)\.\.([\d-]+)")
+SEARCH_WINDOWS_FILE = os.path.join("cache", "search_windows.json")
+# --delta always re-queries the newest windows, where young repos cross into the star range
+# from one day to the next. Older windows are refreshed in rotation, so each is re-queried
+# about every DELTA_REFRESH_DAYS, and their rows are carried forward in between.
+DELTA_RECENT_WINDOWS = 2
+DELTA_REFRESH_DAYS = 7
+INDEX_FIELDS = [
+    "repo_name", "html_url", "created_at", "stargazers_count",
+    "pushed_at", "forks_count", "topics", "license_spdx", "owner_type", "repo_id"
+]
 
 def get_date_ranges():
     end_date = datetime.now(pytz.utc) - timedelta(days=30)
     start_date = end_date - timedelta(days=335)
+    # Chunks sit on a fixed 30-day grid so the same queries repeat from one day to the
+    # next and only the edge windows change, which keeps the ETag cache useful
+    chunk = timedelta(days=30)
+    boundary = RANGE_EPOCH + ((start_date - RANGE_EPOCH) // chunk + 1) * chunk
     ranges = []
     while start_date < end_date:
-        chunk_end = start_date + timedelta(days=30)
-        if chunk_end > end_date:
-            chunk_end = end_date
+        chunk_end = min(boundary, end_date)
         ranges.append((start_date.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
         start_date = chunk_end
+        boundary += chunk
     return ranges
 
-def search_repositories(date_range):
+class RateLimiter:
+    # Token bucket for the search API, corrected by the X-RateLimit-* headers GitHub returns
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.time()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None:
+            return
+        with self.lock:
+            self.tokens = min(self.tokens, int(remaining))
+            if int(remaining) == 0 and reset is not None:
+                self.blocked_until = max(self.blocked_until, int(reset) + 1)
+
+    def backoff(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+def retry_after_seconds(value):
+    # Retry-After is either a number of seconds or an HTTP-date; None if it is neither
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=pytz.utc)
+    return max(when.timestamp() - time.time(), 0.0)
+
+def window_key(date_range):
+    return f"{date_range[0]}..{date_range[1]}"
+
+def load_window_state():
+    # {window: date it was last queried}
+    try:
+        with open(SEARCH_WINDOWS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_window_state(state):
+    with atomic_write(SEARCH_WINDOWS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def plan_windows(ranges, state):
+    # (windows to query, windows to carry forward) for a delta run. Windows never queried,
+    # such as the edge windows that move every day, are always queried.
+    recent = ranges[-DELTA_RECENT_WINDOWS:]
+    older = ranges[:-DELTA_RECENT_WINDOWS]
+    unknown = [r for r in older if window_key(r) not in state]
+    known = sorted((r for r in older if window_key(r) in state), key=lambda r: state[window_key(r)])
+    # Enough of the stalest windows that each one comes round within DELTA_REFRESH_DAYS
+    refresh = set(unknown + known[:math.ceil(len(known) / DELTA_REFRESH_DAYS)])
+    query = [r for r in ranges if r in refresh or r in recent]
+    return query, [r for r in older if r not in refresh]
+
+def carry_forward(old_rows, carried, queried):
+    # Rows of the previous index created inside a carried window and outside every queried one
+    # (adjacent windows share their boundary day)
+    created = INDEX_FIELDS.index("created_at")
+
+    def within(row, windows):
+        day = row[created][:10]
+        return any(start <= day <= end for start, end in windows)
+
+    return [row for row in old_rows if within(row, carried) and not within(row, queried)]
+
+def create_session():
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class SearchCache:
+    # ETag-keyed search pages; on save, entries not requested during the run are dropped
+    # unless they belong to a window the run carried forward
+    def __init__(self, path=SEARCH_CACHE_FILE):
+        self.path = path
+        self.used = set()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, key):
+        self.used.add(key)
+        return self.entries.get(key)
+
+    def put(self, key, etag, data):
+        self.entries[key] = {"etag": etag, "data": data}
+
+    def save(self, carried=()):
+        # Carried windows keep their ETags so their next refresh can still come back 304
+        def in_carried(key):
+            start, end = CREATED_RANGE_RE.search(key).groups()
+            return any(low <= start and end <= high for low, high in carried)
+
+        with atomic_write(self.path, 'w', encoding='utf-8') as f:
+            json.dump({key: entry for key, entry in self.entries.items() if key in self.used or in_carried(key)}, f)
+
+def trim_search_item(item):
+    # Only the fields the index needs are cached, which keeps the cache a few MB
+    return {
+        "id": item.get("id"),
+        "full_name": item.get("full_name"),
+        "html_url": item.get("html_url"),
+        "created_at": item.get("created_at"),
+        "stargazers_count": item.get("stargazers_count"),
+        "pushed_at": item.get("pushed_at"),
+        "forks_count": item.get("forks_count"),
+        "topics": item.get("topics") or [],
+        "license": {"spdx_id": (item.get("license") or {}).get("spdx_id", "")},
+        "owner": {"type": (item.get("owner") or {}).get("type", "")},
+        "mirror_url": item.get("mirror_url"),
+        "is_template": item.get("is_template"),
+    }
+
+def fetch_page(session, limiter, params, cache):
+    key = f"{params['q']}&page={params['page']}"
+    cached = cache.get(key)
+    headers = {"If-None-Match": cached["etag"]} if cached else None
+    backoff = 1
+    for attempt in range(MAX_PAGE_RETRIES):
+        limiter.acquire()
+        try:
+            response = session.get(GITHUB_API_URL, params=params, headers=headers, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Attempt {attempt + 1} failed for page {params['page']} of {params['q']}: {e}")
+            limiter.backoff(backoff)
+            backoff *= 2
+            continue
+
+        limiter.update(response.headers)
+        if response.status_code in (403, 429) or response.status_code >= 500:
+            retry_after = retry_after_seconds(response.headers.get("Retry-After", ""))
+            if retry_after is not None:
+                limiter.backoff(retry_after)
+            elif response.headers.get("X-RateLimit-Remaining") != "0":
+                # Secondary rate limits come without a reset time, so back off adaptively
+                limiter.backoff(backoff)
+                backoff *= 2
+            logging.warning(f"HTTP {response.status_code} on page {params['page']} of {params['q']}, retrying")
+            continue
+
+        if response.status_code == 304:
+            return cached["data"]
+
+        response.raise_for_status()
+        body = response.json()
+        data = {
+            "total_count": body.get("total_count", 0),
+            "items": [trim_search_item(item) for item in body.get("items", [])],
+        }
+        if response.headers.get("ETag"):
+            cache.put(key, response.headers["ETag"], data)
+        return data
+
+    raise RuntimeError(f"Giving up on page {params['page']} of {params['q']} after {MAX_PAGE_RETRIES} attempts")
+
+def split_date_range(date_range):
+    start = datetime.strptime(date_range[0], '%Y-%m-%d')
+    end = datetime.strptime(date_range[1], '%Y-%m-%d')
+    if end <= start:
+        return None
+    # created:a..b is inclusive on both ends, so the halves must not share a day
+    mid = start + (end - start) // 2
+    return [
+        (start.strftime('%Y-%m-%d'), mid.strftime('%Y-%m-%d')),
+        ((mid + timedelta(days=1)).strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')),
+    ]
+
+def search_repositories(date_range, session, limiter, cache):
     query = (
         f"stars:250..5000 forks:<=2000 created:{date_range[0]}..{date_range[1]} archived:false"
     )
@@ -45,13 +278,18 @@ def search_repositories(date_range):
     repos = []
     for page in range(1, 11):
         params["page"] = page
-        response = requests.get(GITHUB_API_URL, headers=HEADERS, params=params)
-        response.raise_for_status()
-        items = response.json().get("items", [])
-        
+        data = fetch_page(session, limiter, params, cache)
+        items = data.get("items", [])
+
+        if page == 1 and data.get("total_count", 0) > RESULTS_CAP:
+            halves = split_date_range(date_range)
+            if halves:
+                logging.info(f"{data['total_count']} results for {date_range[0]} to {date_range[1]}, splitting range")
+                return [repo for half in halves for repo in search_repositories(half, session, limiter, cache)]
+
         # 🔽 Filter out mirrored and template repos here
         filtered = [
-            r for r in items
+            dict(r) for r in items
             if not r.get("mirror_url") and not r.get("is_template")
         ]
 
@@ -64,50 +302,132 @@ def search_repositories(date_range):
         if len(items) < 100:
             break
 
-    if len(repos) >= 1000:
+    if len(repos) >= RESULTS_CAP:
         logging.warning(f"Hit max page limit (1000 repos) for range: {date_range[0]} to {date_range[1]}")
     return repos
 
-def save_repo_index(repos):
+def repo_to_row(repo):
+    row = [
+        repo.get("repo_name"),
+        repo.get("html_url"),
+        repo.get("created_at"),
+        repo.get("stargazers_count"),
+        repo.get("pushed_at"),
+        repo.get("forks_count"),
+        "|".join(repo.get("topics") or []),  # Pipe-separated
+        (repo.get("license") or {}).get("spdx_id", ""),
+        (repo.get("owner") or {}).get("type", ""),
+        repo.get("id")
+    ]
+    return ["" if value is None else str(value) for value in row]
+
+def save_repo_index(rows):
     with open(REPO_INDEX_FILE, "w", newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "repo_name", "html_url", "created_at", "stargazers_count",
-            "pushed_at", "forks_count", "topics", "license_spdx", "owner_type"
-        ])
-        for repo in repos:
-            writer.writerow([
-                repo.get("repo_name"),
-                repo.get("html_url"),
-                repo.get("created_at"),
-                repo.get("stargazers_count"),
-                repo.get("pushed_at"),
-                repo.get("forks_count"),
-                "|".join(repo.get("topics", [])),  # Pipe-separated
-                (repo.get("license") or {}).get("spdx_id", ""),
-                (repo.get("owner") or {}).get("type", "")
-            ])
+        writer.writerow(INDEX_FIELDS)
+        writer.writerows(rows)
+
+def load_repo_index():
+    try:
+        with open(REPO_INDEX_FILE, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return [row for row in reader if row]
+    except FileNotFoundError:
+        return []
+
+def merge_repo_index(old_rows, new_rows):
+    # Existing repos keep their position, new ones are appended in crawl order
+    new_by_name = {row[0]: row for row in new_rows}
+    old_names = {row[0] for row in old_rows}
+    merged, changed = [], {}
+    for row in old_rows:
+        new_row = new_by_name.get(row[0])
+        if new_row is None:
+            continue
+        if new_row != row:
+            changed[row[0]] = [field for field, old, new in zip(INDEX_FIELDS, row, new_row) if old != new]
+        merged.append(new_row)
+    added = [row[0] for row in new_rows if row[0] not in old_names]
+    merged.extend(new_by_name[name] for name in added)
+    diff = {
+        "added": added,
+        "removed": [row[0] for row in old_rows if row[0] not in new_by_name],
+        "changed": changed,
+    }
+    return merged, diff
+
+def save_index_diff(diff):
+    os.makedirs(os.path.dirname(REPO_INDEX_DIFF_FILE), exist_ok=True)
+    with open(REPO_INDEX_DIFF_FILE, 'w', encoding='utf-8') as f:
+        json.dump(diff, f, indent=2)
 
 def copy_for_frontend():
-    os.makedirs(os.path.dirname(FRONTEND_FILTERS_FILE), exist_ok=True)
-    with open(REPO_INDEX_FILE, 'r', encoding='utf-8') as src, \
-         open(FRONTEND_FILTERS_FILE, 'w', encoding='utf-8', newline='') as dest:
-        dest.write(src.read())
+    # Stands in until convert_and_sort_star_history rewrites it with the upcoming column
+    with open(REPO_INDEX_FILE, 'rb') as src, atomic_write(FRONTEND_FILTERS_FILE, 'wb') as dest:
+        shutil.copyfileobj(src, dest)
     logging.info(f"Copied repo_index.csv to {FRONTEND_FILTERS_FILE}")
 
-def main():
+def main(delta=False):
     logging.info("Starting repository discovery")
     all_repos, seen = [], set()
-    for r in get_date_ranges():
-        logging.info(f"Searching date range: {r[0]} to {r[1]}")
-        repos = search_repositories(r)
+    session = create_session()
+    limiter = RateLimiter(SEARCH_RATE_PER_MINUTE)
+    cache = SearchCache()
+
+    def search(date_range):
+        logging.info(f"Searching date range: {date_range[0]} to {date_range[1]}")
+        return search_repositories(date_range, session, limiter, cache)
+
+    ranges = get_date_ranges()
+    state = load_window_state()
+    old_rows = load_repo_index()
+    queried, carried = plan_windows(ranges, state) if delta and old_rows else (ranges, [])
+    if carried:
+        logging.info(f"Delta: querying {len(queried)} of {len(ranges)} date windows, carrying the rest forward")
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        results = list(executor.map(search, queried))
+    cache.save(carried)
+    today = datetime.now(pytz.utc).strftime('%Y-%m-%d')
+    save_window_state({
+        window_key(r): today if r in queried else state[window_key(r)]
+        for r in ranges
+    })
+
+    for repos in results:
         for repo in repos:
             if repo["repo_name"] not in seen:
                 seen.add(repo["repo_name"])
                 all_repos.append(repo)
-    save_repo_index(all_repos)
+    rows = [repo_to_row(repo) for repo in all_repos]
+
+    if delta:
+        carried_rows = [row for row in carry_forward(old_rows, carried, queried) if row[0] not in seen]
+        if carried_rows:
+            # Their removals and changes show up when their window is next queried
+            logging.info(f"Carried {len(carried_rows)} repositories forward from unqueried windows")
+        rows, diff = merge_repo_index(old_rows, rows + carried_rows)
+        save_index_diff(diff)
+        logging.info(
+            f"Index delta: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+            f"{len(diff['changed'])} changed"
+        )
+
+    if rows == old_rows:
+        # repo_filters.csv already holds this index, with the upcoming column convert adds
+        logging.info(f"{REPO_INDEX_FILE} unchanged")
+        if not os.path.exists(FRONTEND_FILTERS_FILE):
+            copy_for_frontend()
+        return rows
+
+    save_repo_index(rows)
     copy_for_frontend()
-    logging.info(f"Saved {len(all_repos)} repositories to {REPO_INDEX_FILE} and copied to frontend")
+    logging.info(f"Saved {len(rows)} repositories to {REPO_INDEX_FILE} and copied to frontend")
+    return rows
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Discover repositories via GitHub search and write repo_index.csv")
+    parser.add_argument("--delta", action="store_true", help="merge into the existing index and write a diff of added/removed/changed repos")
+    args = parser.parse_args()
+    main(delta=args.delta)
\ No newline at end of file
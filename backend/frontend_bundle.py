@@ -0,0 +1,129 @@
+import os
+import math
+import bisect
+import hashlib
+import logging
+import orjson
+from atomic_file import atomic_write
+
+BUNDLE_DIR = "frontend/public"
+BUNDLE_POINTER = os.path.join(BUNDLE_DIR, "data_bundle.json")
+BUNDLE_PREFIX = "data_bundle."
+INT_COLUMNS = {"stargazers_count", "forks_count"}
+# Backend-only index columns the dashboard never reads
+SKIPPED_COLUMNS = {"repo_id"}
+# Mirrors the dashboard's license filter buckets (filterUtils.ts)
+NAMED_LICENSES = {"MIT", "Apache-2.0", "GPL-3.0", "AGPL-3.0"}
+HISTOGRAM_BINS = 5
+QUANTILE_STEPS = 20
+
+def _column(rows, field):
+    if field in INT_COLUMNS:
+        return [int(row[field]) if row.get(field) else 0 for row in rows]
+    if field == "upcoming":
+        return [row[field] == "true" for row in rows]
+    return [row.get(field) or "" for row in rows]
+
+def license_group(spdx_id):
+    if not spdx_id or spdx_id == "NOASSERTION":
+        return "No License"
+    return spdx_id if spdx_id in NAMED_LICENSES else "Other"
+
+def build_indexes(rows):
+    # Inverted indexes from each categorical filter value to sorted repo ids, keyed the way
+    # the dashboard filters: lower-cased topics, license buckets, owner_type defaulting to User
+    indexes = {"topics": {}, "license": {}, "owner_type": {}}
+    for repo_id, row in enumerate(rows):
+        topics = {topic.strip() for topic in (row.get("topics") or "").lower().split("|") if topic.strip()}
+        for topic in topics:
+            indexes["topics"].setdefault(topic, []).append(repo_id)
+        indexes["license"].setdefault(license_group(row.get("license_spdx")), []).append(repo_id)
+        indexes["owner_type"].setdefault(row.get("owner_type") or "User", []).append(repo_id)
+    return {name: dict(sorted(index.items())) for name, index in indexes.items()}
+
+def build_histogram(values):
+    # Same bins as the dashboard's generateHistogram(): five bins over mean +/- 2 stddev,
+    # missing values counted as 0 and the last bin open-ended (max null)
+    values = [value or 0 for value in values]
+    if not values:
+        return []
+    mean = sum(values) / len(values)
+    std_dev = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+    low = max(0, mean - 2 * std_dev)
+    width = (mean + 2 * std_dev - low) / HISTOGRAM_BINS
+    edges = [low + i * width for i in range(HISTOGRAM_BINS)]
+    counts = [0] * HISTOGRAM_BINS
+    for value in values:
+        slot = bisect.bisect_right(edges, value) - 1
+        if slot >= 0:
+            counts[slot] += 1
+    return [
+        {"min": edge, "max": edges[i + 1] if i + 1 < HISTOGRAM_BINS else None, "count": counts[i]}
+        for i, edge in enumerate(edges)
+    ]
+
+def build_quantiles(values):
+    known = sorted(value for value in values if value is not None)
+    if not known:
+        return []
+    return [known[min(len(known) - 1, round(step * (len(known) - 1) / QUANTILE_STEPS))] for step in range(QUANTILE_STEPS + 1)]
+
+def build_bundle(rows, fieldnames, rankings, histories):
+    # Columnar layout: repo i is the i-th entry of every column and of history.stars.
+    # rankings maps an output name (e.g. sorted_pct_1d) to (label, [(repo id, value), ...]) in rank order.
+    dates = sorted({date for history in histories for date, _ in history})
+    date_index = {date: i for i, date in enumerate(dates)}
+    stars = []
+    for history in histories:
+        series = [None] * len(dates)
+        for date, value in history:
+            series[date_index[date]] = value
+        stars.append(series)
+
+    metrics = {}
+    for name, (label, ranked) in rankings.items():
+        values = [None if value is None else round(value, 2) for _, value in ranked]
+        metrics[name] = {
+            "label": label,
+            "order": [repo_id for repo_id, _ in ranked],
+            "values": values,
+            "histogram": build_histogram(values),
+            "quantiles": build_quantiles(values),
+        }
+
+    return {
+        "version": 1,
+        "repos": {field: _column(rows, field) for field in fieldnames if field not in SKIPPED_COLUMNS},
+        "metrics": metrics,
+        "indexes": build_indexes(rows),
+        "history": {"dates": dates, "stars": stars},
+    }
+
+def write_bundle(bundle):
+    payload = orjson.dumps(bundle)
+    digest = hashlib.sha256(payload).hexdigest()[:16]
+    filename = f"{BUNDLE_PREFIX}{digest}.json"
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+
+    path = os.path.join(BUNDLE_DIR, filename)
+    if not os.path.exists(path):
+        with atomic_write(path, 'wb') as f:
+            f.write(payload)
+
+    previous = None
+    if os.path.exists(BUNDLE_POINTER):
+        with open(BUNDLE_POINTER, 'rb') as f:
+            previous = orjson.loads(f.read()).get("file")
+
+    # The pointer is the only file that must be revalidated; the hashed bundle can be cached forever
+    with atomic_write(BUNDLE_POINTER, 'wb') as f:
+        f.write(orjson.dumps({"file": filename}))
+
+    # Keep the previous bundle so clients holding the old pointer can still finish loading
+    keep = {filename, previous, os.path.basename(BUNDLE_POINTER)}
+    for existing in os.listdir(BUNDLE_DIR):
+        if existing.startswith(BUNDLE_PREFIX) and existing.endswith(".json") and existing not in keep:
+            os.remove(os.path.join(BUNDLE_DIR, existing))
+
+    logging.info(f"Wrote frontend bundle {filename} ({len(payload) / 1024:.0f} KiB)")
+    return filename
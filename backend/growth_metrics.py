@@ -0,0 +1,106 @@
+from itertools import chain
+import numpy as np
+
+WINDOW_5D = 5
+WINDOW_30D = 30
+
+def build_value_matrix(series):
+    # Left-aligns each repo's known cumulative values into one NaN-padded row, so
+    # index i means "i-th known value", exactly like the per-repo lists did.
+    lengths = np.fromiter((len(values) for values in series), dtype=np.intp, count=len(series))
+    width = max(int(lengths.max(initial=0)), 1)
+    matrix = np.full((len(series), width), np.nan)
+    matrix[np.arange(width) < lengths[:, None]] = np.fromiter(
+        chain.from_iterable(series), dtype=np.float64, count=int(lengths.sum())
+    )
+    return matrix, lengths
+
+def _pct(diff, start):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(start > 0, (diff / start) * 100, np.nan)
+
+def _masked_max(values, valid):
+    if values.shape[1] == 0:
+        return np.full(values.shape[0], np.nan)
+    best = np.where(valid, values, -np.inf).max(axis=1)
+    return np.where(valid.any(axis=1), best, np.nan)
+
+def _take(matrix, index, valid):
+    if matrix.shape[1] == 0:
+        return np.full(matrix.shape[0], np.nan)
+    safe = np.clip(index, 0, matrix.shape[1] - 1)
+    return np.where(valid, matrix[np.arange(matrix.shape[0]), safe], np.nan)
+
+def _as_list(values, cast=float):
+    return [None if np.isnan(v) else cast(v) for v in values.tolist()]
+
+def compute_growth_metrics(series):
+    matrix, lengths = build_value_matrix(series)
+    rows, width = matrix.shape
+    positions = np.arange(width)
+    last = _take(matrix, lengths - 1, lengths > 0)
+
+    starts, ends = matrix[:, :-1], matrix[:, 1:]
+    valid_1d = positions[1:] < lengths[:, None]
+    diff_1d = ends - starts
+    pct_1d = _masked_max(_pct(diff_1d, starts), valid_1d & (starts > 0))
+    raw_1d = _masked_max(diff_1d, valid_1d)
+
+    # Windows starting at 0 stars are skipped for both pct and raw; the peak is the first max
+    starts, ends = matrix[:, :-WINDOW_5D], matrix[:, WINDOW_5D:]
+    valid_5d = (positions[WINDOW_5D:] < lengths[:, None]) & (starts != 0)
+    diff_5d = ends - starts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_5d_all = np.where(valid_5d, (diff_5d / starts) * 100, -np.inf)
+    has_peak = valid_5d.any(axis=1)
+    if pct_5d_all.shape[1]:
+        max_5d_index = pct_5d_all.argmax(axis=1)
+    else:
+        max_5d_index = np.zeros(rows, dtype=np.intp)
+    pct_5d = _take(pct_5d_all, max_5d_index, has_peak)
+    raw_5d = _masked_max(diff_5d, valid_5d)
+    upcoming = has_peak & (max_5d_index + WINDOW_5D >= lengths - 5)
+
+    has_post = has_peak & (max_5d_index + WINDOW_5D + 1 < lengths)
+    post_start = _take(matrix, max_5d_index + WINDOW_5D + 1, has_post)
+    post_raw_5d = last - post_start
+    post_pct_5d = _pct(post_raw_5d, post_start)
+
+    has_30d = lengths >= WINDOW_30D
+    start_30d = _take(matrix, lengths - WINDOW_30D, has_30d)
+    raw_30d = last - start_30d
+    pct_30d = _pct(raw_30d, start_30d)
+
+    return {
+        "pct_1d": _as_list(pct_1d),
+        "raw_1d": _as_list(raw_1d, int),
+        "pct_5d": _as_list(pct_5d),
+        "raw_5d": _as_list(raw_5d, int),
+        "pct_30d": _as_list(pct_30d),
+        "raw_30d": _as_list(raw_30d, int),
+        "post_pct_5d": _as_list(post_pct_5d),
+        "post_raw_5d": _as_list(post_raw_5d, int),
+        "upcoming": upcoming.tolist(),
+    }
+
+def compute_post_day_metrics(series, days):
+    # Growth from the day-th known value to the latest one, for every offset at once
+    matrix, lengths = build_value_matrix(series)
+    last = _take(matrix, lengths - 1, lengths > 0)
+    metrics = {}
+    for day in days:
+        start = _take(matrix, np.full(len(lengths), day), lengths > day)
+        raw = last - start
+        metrics[f"post_pct_day_{day}"] = _as_list(_pct(raw, start))
+        metrics[f"post_raw_day_{day}"] = _as_list(raw, int)
+    return metrics
+
+def compute_window_metrics(current_stars, gains, window_days):
+    # Growth over the last window_days from a precomputed star gain, for windows longer than
+    # the daily history; start is the star count the window began with
+    current = np.asarray(current_stars, dtype=np.float64)
+    raw = np.asarray(gains, dtype=np.float64)
+    return {
+        f"pct_{window_days}d": _as_list(_pct(raw, current - raw)),
+        f"raw_{window_days}d": _as_list(raw, int),
+    }
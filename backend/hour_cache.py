@@ -0,0 +1,82 @@
+import os
+import gzip
+import shutil
+import logging
+from datetime import datetime, timedelta
+import orjson
+import pytz
+from atomic_file import atomic_write
+
+CACHE_DIR = os.path.join("cache", "hours")
+MAX_AGE_DAYS = 35
+MAX_BYTES = 1024 * 1024 * 1024
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json.gz")
+
+def _key_date(key):
+    return datetime.strptime(key[:10], '%Y-%m-%d').replace(tzinfo=pytz.utc)
+
+def contains(key):
+    return os.path.exists(_path(key))
+
+def load(key):
+    try:
+        with gzip.open(_path(key), 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, orjson.JSONDecodeError) as e:
+        logging.warning(f"Discarding unreadable hour cache entry {key}: {e}")
+        os.remove(_path(key))
+        return None
+
+def store(key, counts):
+    # Workers may cache the same hour at once, hence a per-process temporary file
+    with atomic_write(_path(key), 'wb', suffix=f".{os.getpid()}.tmp") as raw, \
+            gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+        f.write(orjson.dumps(counts))
+
+def clear():
+    # For full rebuilds, so a bad cached hour is downloaded and parsed again
+    if os.path.exists(CACHE_DIR):
+        shutil.rmtree(CACHE_DIR)
+
+def evict(now=None, max_age_days=MAX_AGE_DAYS, max_bytes=MAX_BYTES):
+    if not os.path.exists(CACHE_DIR):
+        return 0
+    now = now or datetime.now(pytz.utc)
+    cutoff = now - timedelta(days=max_age_days)
+    entries = []
+    removed = 0
+    for filename in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, filename)
+        if filename.endswith(".tmp"):
+            os.remove(path)
+            continue
+        if not filename.endswith(".json.gz"):
+            continue
+        key = filename[:-len(".json.gz")]
+        try:
+            key_date = _key_date(key)
+        except ValueError:
+            continue
+        if key_date < cutoff:
+            os.remove(path)
+            removed += 1
+            continue
+        entries.append((key_date, int(key.rsplit('-', 1)[1]), path, os.path.getsize(path)))
+
+    # Over budget: drop the oldest hours first, they are the next to age out anyway
+    entries.sort()
+    total = sum(size for *_, size in entries)
+    for _, _, path, size in entries:
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+
+    if removed:
+        logging.info(f"Evicted {removed} hour cache entries")
+    return removed
@@ -0,0 +1,132 @@
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+class AdaptiveLimit:
+    # In-flight download limit tuned by hill climbing on aggregate throughput: after each
+    # window of downloads it steps one way and reverses when throughput stops improving.
+    # Congestion errors (timeouts, 429, 5xx) halve it straight away.
+
+    def __init__(self, initial, minimum=1, maximum=16, gain=0.05):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.peak = initial
+        self.adjustments = 0
+        self.in_flight = 0
+        self._gain = gain
+        self._direction = 1
+        self._last_rate = None
+        self._cond = threading.Condition()
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_bytes = 0
+        self._window_count = 0
+        self._window_start = time.perf_counter()
+
+    def _set_limit(self, limit):
+        limit = max(self.minimum, min(self.maximum, limit))
+        if limit != self.limit:
+            logging.info(f"Download concurrency {self.limit} -> {limit}")
+            self.limit = limit
+            self.peak = max(self.peak, limit)
+            self.adjustments += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record(self, nbytes, ok=True):
+        with self._cond:
+            if not ok:
+                self._set_limit(self.limit // 2)
+                self._direction = 1
+                self._last_rate = None
+                self._reset_window()
+                return
+            self._window_bytes += nbytes
+            self._window_count += 1
+            # A window spans at least one full round at the current limit
+            if self._window_count < max(self.limit, 4):
+                return
+            rate = self._window_bytes / max(time.perf_counter() - self._window_start, 1e-9)
+            if self._last_rate is not None and rate < self._last_rate * (1 + self._gain):
+                self._direction = -self._direction
+            self._last_rate = rate
+            self._set_limit(self.limit + self._direction)
+            self._reset_window()
+
+def run(keys, is_cached, fetch, executor, parse, limit, queue_size):
+    # Two-stage pipeline: I/O threads fetch payloads under `limit`, then `executor` runs
+    # parse(key, payload). Cached keys skip the I/O stage with payload None. At most
+    # queue_size keys are between dispatch and parsed, so downloads stall while the CPU
+    # stage is behind. Yields (key, parse result) as they finish, or (key, None) when
+    # fetch returned None.
+    results = queue.Queue()
+    slots = threading.Semaphore(queue_size)
+    stop = threading.Event()
+    keys = list(keys)
+
+    def finish(key, result=None, error=None):
+        slots.release()
+        results.put((key, result, error))
+
+    def parsed(key, future):
+        error = future.exception()
+        finish(key, None if error else future.result(), error)
+
+    def submit(key, payload):
+        executor.submit(parse, key, payload).add_done_callback(lambda future: parsed(key, future))
+
+    def download(key):
+        try:
+            with limit.slot():
+                payload = fetch(key)
+            if payload is None:
+                finish(key)
+            else:
+                submit(key, payload)
+        except BaseException as e:
+            finish(key, error=e)
+
+    def dispatch(downloads):
+        for key in keys:
+            slots.acquire()
+            if stop.is_set():
+                return
+            try:
+                if is_cached(key):
+                    submit(key, None)
+                else:
+                    downloads.submit(download, key)
+            except BaseException as e:
+                finish(key, error=e)
+
+    with ThreadPoolExecutor(max_workers=limit.maximum) as downloads:
+        dispatcher = threading.Thread(target=dispatch, args=(downloads,), daemon=True)
+        dispatcher.start()
+        try:
+            for _ in keys:
+                key, result, error = results.get()
+                if error is not None:
+                    raise error
+                yield key, result
+        finally:
+            stop.set()
+            # Wakes the dispatcher if it is waiting for a slot
+            slots.release()
+            dispatcher.join()
@@ -0,0 +1,381 @@
+import os
+import time
+import signal
+import hashlib
+import argparse
+import logging
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+import numpy as np
+import orjson
+from frontend_bundle import BUNDLE_POINTER
+
+DEFAULT_PORT = 8787
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CACHE_ENTRIES = 512
+# How often a request may stat the bundle pointer to pick up a new daily run
+RELOAD_CHECK_SECONDS = 5
+REPO_FIELDS = ["repo_name", "html_url", "created_at", "stargazers_count", "pushed_at", "forks_count", "topics", "license_spdx", "owner_type", "upcoming"]
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+class BadRequest(ValueError):
+    pass
+
+class NotFound(LookupError):
+    pass
+
+def _timestamps(values):
+    # ISO timestamps as datetime64; blanks and unparseable values become NaT
+    result = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[s]")
+    for i, value in enumerate(values):
+        try:
+            result[i] = np.datetime64(value.rstrip("Z"), "s")
+        except ValueError:
+            pass
+    return result
+
+class DataIndex:
+    # Read-only view of one published bundle: columns as numpy arrays for vectorised filtering,
+    # the categorical indexes as boolean masks, and each metric's ranking as an id array.
+    # Never mutated after construction, so requests can use it without locking.
+
+    def __init__(self, bundle_file, bundle):
+        self.bundle_file = bundle_file
+        repos = bundle["repos"]
+        self.columns = {field: repos.get(field) or [""] * len(repos["repo_name"]) for field in REPO_FIELDS}
+        self.size = len(repos["repo_name"])
+        self.repo_ids = {name: i for i, name in enumerate(repos["repo_name"])}
+        self.stars = np.asarray(repos["stargazers_count"], dtype=np.int64)
+        self.forks = np.asarray(repos["forks_count"], dtype=np.int64)
+        self.upcoming = np.asarray(repos["upcoming"], dtype=bool)
+        self.created = _timestamps(repos["created_at"])
+        self.pushed = _timestamps(repos["pushed_at"])
+        self.masks = {
+            name: {key: self._mask(ids) for key, ids in index.items()}
+            for name, index in bundle.get("indexes", {}).items()
+        }
+        self.metrics = {
+            name: {
+                "label": metric["label"],
+                "order": np.asarray(metric["order"], dtype=np.int64),
+                "values": metric["values"],
+                "histogram": metric.get("histogram"),
+                "quantiles": metric.get("quantiles"),
+            }
+            for name, metric in bundle["metrics"].items()
+        }
+        self.dates = bundle["history"]["dates"]
+        self.history = bundle["history"]["stars"]
+
+    def _mask(self, ids):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(ids, dtype=np.int64)] = True
+        return mask
+
+    @classmethod
+    def load(cls, pointer=BUNDLE_POINTER):
+        with open(pointer, 'rb') as f:
+            bundle_file = orjson.loads(f.read())["file"]
+        with open(os.path.join(os.path.dirname(pointer), bundle_file), 'rb') as f:
+            return cls(bundle_file, orjson.loads(f.read()))
+
+    def repo(self, repo_id):
+        return {field: self.columns[field][repo_id] for field in REPO_FIELDS}
+
+    def _union(self, name, keys):
+        index = self.masks.get(name, {})
+        mask = np.zeros(self.size, dtype=bool)
+        for key in keys:
+            if key in index:
+                mask |= index[key]
+        return mask
+
+    def filter_mask(self, filters):
+        # Same semantics as the dashboard's applyFilters: inclusive ranges, any included topic,
+        # no excluded topic, license buckets and owner types as allow-lists
+        mask = np.ones(self.size, dtype=bool)
+        if "min_stars" in filters:
+            mask &= self.stars >= filters["min_stars"]
+        if "max_stars" in filters:
+            mask &= self.stars <= filters["max_stars"]
+        if "min_forks" in filters:
+            mask &= self.forks >= filters["min_forks"]
+        if "max_forks" in filters:
+            mask &= self.forks <= filters["max_forks"]
+        # As in the dashboard, a missing push date fails its range and a missing creation date passes
+        for column, prefix, unknown in ((self.created, "created", True), (self.pushed, "pushed", False)):
+            missing = np.isnat(column)
+            if f"{prefix}_from" in filters:
+                mask &= np.where(missing, unknown, column >= filters[f"{prefix}_from"])
+            if f"{prefix}_to" in filters:
+                mask &= np.where(missing, unknown, column <= filters[f"{prefix}_to"])
+        if filters.get("topic"):
+            mask &= self._union("topics", filters["topic"])
+        if filters.get("exclude_topic"):
+            mask &= ~self._union("topics", filters["exclude_topic"])
+        if filters.get("license"):
+            mask &= self._union("license", filters["license"])
+        if filters.get("owner_type"):
+            mask &= self._union("owner_type", filters["owner_type"])
+        if "upcoming" in filters:
+            mask &= self.upcoming == filters["upcoming"]
+        return mask
+
+    def top(self, metric_name, filters, offset, limit):
+        metric = self.metrics.get(metric_name)
+        if metric is None:
+            raise NotFound(f"metric {metric_name}")
+        order = metric["order"]
+        # Positions in the ranking that pass, so ranks stay global rather than per page
+        positions = np.flatnonzero(self.filter_mask(filters)[order])
+        page = positions[offset:offset + limit]
+        items = []
+        for position in page.tolist():
+            repo_id = int(order[position])
+            items.append({"rank": position + 1, **self.repo(repo_id), "growth_value": metric["values"][position]})
+        return {
+            "metric": metric_name,
+            "label": metric["label"],
+            "total": int(len(positions)),
+            "offset": offset,
+            "limit": limit,
+            "items": items,
+        }
+
+    def repo_history(self, repo_name):
+        repo_id = self.repo_ids.get(repo_name)
+        if repo_id is None:
+            raise NotFound(f"repository {repo_name}")
+        series = self.history[repo_id]
+        return {
+            **self.repo(repo_id),
+            "history": [{"date": date, "stars": stars} for date, stars in zip(self.dates, series) if stars is not None],
+        }
+
+    def metric_list(self):
+        return {
+            "metrics": [
+                {"name": name, "label": metric["label"], "histogram": metric["histogram"], "quantiles": metric["quantiles"]}
+                for name, metric in self.metrics.items()
+            ]
+        }
+
+class ResponseCache:
+    # LRU of encoded response bodies keyed by bundle and normalised query
+
+    def __init__(self, capacity=CACHE_ENTRIES):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class QueryService:
+    # Holds the current DataIndex and swaps in a new one when the pipeline publishes a bundle.
+    # The replacement is fully built before the swap, so a request sees either the old
+    # bundle or the new one, never a mix.
+
+    def __init__(self, pointer=BUNDLE_POINTER, cache_entries=CACHE_ENTRIES):
+        self.pointer = pointer
+        self.cache = ResponseCache(cache_entries)
+        self.index = None
+        self._pointer_stat = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.reload(force=True)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.pointer)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def reload(self, force=False):
+        # Only one thread rebuilds; the others keep serving the current index meanwhile
+        if not self._reload_lock.acquire(blocking=force):
+            return
+        try:
+            stat = self._stat()
+            if stat is None or (not force and stat == self._pointer_stat):
+                return
+            try:
+                index = DataIndex.load(self.pointer)
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"Could not load bundle from {self.pointer}: {e}")
+                return
+            self._pointer_stat = stat
+            if self.index is not None and index.bundle_file == self.index.bundle_file:
+                return
+            self.index = index
+            self.cache.clear()
+            logging.info(f"Serving {index.bundle_file}: {index.size} repositories, {len(index.metrics)} metrics")
+        finally:
+            self._reload_lock.release()
+
+    def current(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + RELOAD_CHECK_SECONDS
+            self.reload()
+        return self.index
+
+def _values(query, name):
+    # Repeated parameters and comma-separated lists are equivalent
+    return [part.strip() for value in query.get(name, []) for part in value.split(",") if part.strip()]
+
+def _int_param(query, name, default=None, minimum=0, maximum=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[-1])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise BadRequest(f"{name} must be between {minimum} and {maximum}" if maximum is not None else f"{name} must be at least {minimum}")
+    return value
+
+def parse_filters(query):
+    filters = {}
+    for name in ("min_stars", "max_stars", "min_forks", "max_forks"):
+        value = _int_param(query, name)
+        if value is not None:
+            filters[name] = value
+    for name in ("created_from", "created_to", "pushed_from", "pushed_to"):
+        if query.get(name):
+            try:
+                filters[name] = np.datetime64(query[name][-1].rstrip("Z"), "s")
+            except ValueError:
+                raise BadRequest(f"{name} must be an ISO date")
+    filters["topic"] = [topic.lower() for topic in _values(query, "topic")]
+    filters["exclude_topic"] = [topic.lower() for topic in _values(query, "exclude_topic")]
+    filters["license"] = _values(query, "license")
+    filters["owner_type"] = _values(query, "owner_type")
+    if query.get("upcoming"):
+        value = query["upcoming"][-1].lower()
+        if value not in ("true", "false"):
+            raise BadRequest("upcoming must be true or false")
+        filters["upcoming"] = value == "true"
+    return filters
+
+def route(index, path, query):
+    # Returns the JSON-serialisable response for a GET
+    if path == "/api/health":
+        return {"bundle": index.bundle_file, "repositories": index.size, "metrics": len(index.metrics)}
+    if path == "/api/metrics":
+        return index.metric_list()
+    if path == "/api/repos":
+        metric = (query.get("metric") or [""])[-1]
+        if not metric:
+            raise BadRequest("metric is required")
+        offset = _int_param(query, "offset", 0)
+        limit = _int_param(query, "limit", DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+        return index.top(metric, parse_filters(query), offset, limit)
+    if path.startswith("/api/repos/") and path.endswith("/history"):
+        return index.repo_history(path[len("/api/repos/"):-len("/history")])
+    raise NotFound(path)
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path).rstrip("/") or "/"
+        query = parse_qs(url.query)
+        index = self.service.current()
+        if index is None:
+            self._send(503, orjson.dumps({"error": "no data bundle published yet"}))
+            return
+
+        # The bundle name is content-hashed, so it identifies the data behind a cached response
+        key = (index.bundle_file, path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+        entry = self.service.cache.get(key)
+        if entry is None:
+            try:
+                body = orjson.dumps(route(index, path, query))
+            except BadRequest as e:
+                self._send(400, orjson.dumps({"error": str(e)}))
+                return
+            except NotFound as e:
+                self._send(404, orjson.dumps({"error": f"not found: {e}"}))
+                return
+            entry = (f'"{hashlib.sha1(body).hexdigest()[:20]}"', body)
+            self.service.cache.put(key, entry)
+
+        etag, body = entry
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self._send(304, b"", etag)
+        else:
+            self._send(200, body, etag)
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            # Revalidate every time; a new daily bundle changes the ETag
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+def serve(host, port, pointer=BUNDLE_POINTER, cache_entries=CACHE_ENTRIES):
+    service = QueryService(pointer, cache_entries)
+    handler = type("BoundQueryHandler", (QueryHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    # SIGHUP reloads immediately instead of waiting for the next pointer check
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=service.reload, kwargs={"force": True}).start())
+    logging.info(f"Query API listening on http://{host}:{port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"Response cache: {service.cache.hits} hits, {service.cache.misses} misses")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve paginated, filtered repository rankings and star histories from the published data bundle")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--pointer", default=BUNDLE_POINTER, help=f"bundle pointer written by the pipeline (default: {BUNDLE_POINTER})")
+    parser.add_argument("--cache-entries", type=int, default=CACHE_ENTRIES, help=f"responses kept in the LRU cache (default: {CACHE_ENTRIES})")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.pointer, args.cache_entries)
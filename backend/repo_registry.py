@@ -0,0 +1,164 @@
+import os
+import csv
+import logging
+import orjson
+from atomic_file import atomic_write
+
+STAR_HISTORY_DIR = "star_history"
+REGISTRY_FILE = os.path.join(STAR_HISTORY_DIR, "registry.json")
+
+def legacy_filename(repo_name):
+    return f"{repo_name.replace('/', '_')}.csv"
+
+def parse_repo_id(value):
+    return int(value) if value not in (None, "") else None
+
+def read_index_ids(path="repo_index.csv"):
+    # {full name: GitHub id or None} from repo_index.csv; indexes written before the
+    # repo_id column existed give None for every repo
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        return {
+            row["repo_name"].strip(): parse_repo_id(row.get("repo_id"))
+            for row in reader
+            if row["repo_name"].strip()
+        }
+
+class RepoRegistry:
+    # Persistent identity table: GitHub repo id <-> full name <-> slot. A slot is assigned
+    # once per repository and owns its history file in star_history/, so a rename or
+    # transfer moves the file instead of orphaning it, and no stage has to turn a filename
+    # back into a repo name (owner_repo.csv is ambiguous when the owner has underscores).
+
+    def __init__(self, entries=None, next_slot=0):
+        self.slots = {}
+        self.by_name = {}
+        self.by_id = {}
+        self.files = {}
+        self.next_slot = next_slot
+        for entry in entries or []:
+            self._add(entry)
+            self.next_slot = max(self.next_slot, entry["slot"] + 1)
+
+    def _add(self, entry):
+        self.slots[entry["slot"]] = entry
+        if entry["name"] is not None:
+            self.by_name[entry["name"]] = entry
+        self.files[entry["file"]] = entry
+        if entry["id"] is not None:
+            self.by_id[entry["id"]] = entry
+
+    def _drop(self, entry):
+        del self.slots[entry["slot"]]
+        if entry["name"] is not None:
+            del self.by_name[entry["name"]]
+        del self.files[entry["file"]]
+        if entry["id"] is not None:
+            self.by_id.pop(entry["id"], None)
+
+    @classmethod
+    def load(cls, path=REGISTRY_FILE):
+        try:
+            with open(path, 'rb') as f:
+                data = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+        return cls(data["repos"], data["next_slot"])
+
+    @classmethod
+    def bootstrap(cls, repo_names, directory=STAR_HISTORY_DIR):
+        # One-off adoption of a history directory written before the registry existed.
+        # Files are matched against known names rather than parsed, so owners with
+        # underscores resolve; files no known repo maps to are registered without a name
+        # so the next prune deletes them.
+        registry = cls()
+        by_file = {legacy_filename(name): name for name in sorted(repo_names)}
+        existing = sorted(f for f in os.listdir(directory) if f.endswith(".csv")) if os.path.isdir(directory) else []
+        for filename in existing:
+            registry._add({"slot": registry._new_slot(), "id": None, "name": by_file.get(filename), "file": filename})
+        logging.info(f"Registered {len(existing)} existing history files")
+        return registry
+
+    @classmethod
+    def load_or_bootstrap(cls, repo_names, path=REGISTRY_FILE):
+        registry = cls.load(path)
+        if registry is None:
+            registry = cls.bootstrap(repo_names, os.path.dirname(path))
+        return registry
+
+    def save(self, path=REGISTRY_FILE):
+        with atomic_write(path, 'wb') as f:
+            f.write(orjson.dumps(
+                {"next_slot": self.next_slot, "repos": [self.slots[slot] for slot in sorted(self.slots)]},
+                option=orjson.OPT_INDENT_2
+            ))
+
+    def _new_slot(self):
+        slot = self.next_slot
+        self.next_slot += 1
+        return slot
+
+    def _free_file(self, repo_name, slot):
+        filename = legacy_filename(repo_name)
+        owner = self.files.get(filename)
+        if owner is None or owner["slot"] == slot:
+            return filename
+        # Another repo already owns the legacy name (a_b/c vs a/b_c); suffix with the slot
+        return f"{filename[:-4]}~{slot}.csv"
+
+    def __contains__(self, repo_name):
+        return repo_name in self.by_name
+
+    def __len__(self):
+        return len(self.slots)
+
+    def names(self):
+        return list(self.by_name)
+
+    def file(self, repo_name):
+        return self.by_name[repo_name]["file"]
+
+    def sync(self, repos, directory=STAR_HISTORY_DIR):
+        # repos maps full name -> GitHub id (None when unknown). Registers new repos and,
+        # when a known id shows up under a new name, renames its entry and moves its file.
+        # Returns {old name: new name} so holders of name-keyed data can follow.
+        renames = {}
+        for name, repo_id in repos.items():
+            entry = self.by_id.get(repo_id) if repo_id is not None else None
+            if entry is not None and entry["name"] != name and name not in self.by_name:
+                self._drop(entry)
+                old_name, old_file = entry["name"], entry["file"]
+                entry["name"] = name
+                entry["file"] = self._free_file(name, entry["slot"])
+                self._add(entry)
+                old_path = os.path.join(directory, old_file)
+                if os.path.exists(old_path):
+                    os.replace(old_path, os.path.join(directory, entry["file"]))
+                renames[old_name] = name
+                logging.info(f"Repository {old_name} is now {name}")
+                continue
+            entry = self.by_name.get(name)
+            if entry is None:
+                slot = self._new_slot()
+                self._add({"slot": slot, "id": repo_id, "name": name, "file": self._free_file(name, slot)})
+            elif repo_id is not None and entry["id"] != repo_id:
+                previous = self.by_id.get(repo_id)
+                if previous is not None:
+                    # Registered under both names before the id was known; the old name's
+                    # entry is left to be pruned
+                    previous["id"] = None
+                    del self.by_id[repo_id]
+                self._drop(entry)
+                entry["id"] = repo_id
+                self._add(entry)
+        return renames
+
+    def prune(self, active_repos, directory=STAR_HISTORY_DIR):
+        # Set difference against the registry; only the removed repos' files are touched
+        removed = [entry for entry in self.slots.values() if entry["name"] is None or entry["name"] not in active_repos]
+        for entry in removed:
+            self._drop(entry)
+            for path in (os.path.join(directory, entry["file"]), os.path.join(directory, f"{entry['file']}.tmp")):
+                if os.path.exists(path):
+                    os.remove(path)
+        return [entry["name"] or entry["file"] for entry in removed]
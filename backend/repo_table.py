@@ -0,0 +1,65 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+class RepoTable:
+    # Sorted, fixed-width table of repo names; a repo's id is its position in the table.
+    # The parent creates it in shared memory and workers attach without copying it.
+
+    def __init__(self, names, shm=None):
+        self.names = names
+        self.shm = shm
+
+    @classmethod
+    def create(cls, repo_names):
+        encoded = sorted(name.encode('utf-8') for name in repo_names)
+        width = max((len(name) for name in encoded), default=1)
+        size = max(len(encoded) * width, 1)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        names = np.ndarray((len(encoded),), dtype=f"S{width}", buffer=shm.buf)
+        names[:] = encoded
+        return cls(names, shm)
+
+    @classmethod
+    def attach(cls, spec):
+        shm_name, count, width = spec
+        shm = shared_memory.SharedMemory(name=shm_name)
+        return cls(np.ndarray((count,), dtype=f"S{width}", buffer=shm.buf), shm)
+
+    @property
+    def spec(self):
+        return self.shm.name, len(self.names), self.names.dtype.itemsize
+
+    def __len__(self):
+        return len(self.names)
+
+    def repo_names(self):
+        return [name.decode('utf-8') for name in self.names.tolist()]
+
+    def lookup(self, repo_names):
+        # One byte wider than the table so longer names can never collide with a truncated match
+        if not len(self.names):
+            return np.full(len(repo_names), -1, dtype=np.intp)
+        keys = np.array([name.encode('utf-8') for name in repo_names], dtype=f"S{self.names.dtype.itemsize + 1}")
+        ids = np.searchsorted(self.names, keys)
+        found = self.names[np.minimum(ids, len(self.names) - 1)] == keys
+        return np.where(found, ids, -1)
+
+    def count_array(self, counts):
+        # {repo: count} for any set of repos -> int32 array indexed by repo id, unknown repos dropped
+        result = np.zeros(len(self.names), dtype=np.int32)
+        if not counts:
+            return result
+        ids = self.lookup(list(counts))
+        values = np.fromiter(counts.values(), dtype=np.int32, count=len(counts))
+        known = ids >= 0
+        np.add.at(result, ids[known], values[known])
+        return result
+
+    def close(self, unlink=False):
+        if self.shm is None:
+            return
+        self.names = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
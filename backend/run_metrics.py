@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import resource
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import pytz
+from atomic_file import atomic_write
+
+RUN_REPORT_FILE = os.path.join("logs", "run_report.json")
+PROMETHEUS_FILE = os.path.join("logs", "run_report.prom")
+METRIC_PREFIX = "star_pipeline_"
+# Upper bounds in seconds; per-hour archive work sits in the middle, whole stages at the top
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+# Process-local registry; pool workers send snapshot() back with their results for merge()
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+def _new_histogram():
+    return {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+
+def observe(name, seconds):
+    slot = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+    with _lock:
+        histogram = _histograms.setdefault(name, _new_histogram())
+        histogram["buckets"][slot] += 1
+        histogram["count"] += 1
+        histogram["sum"] += seconds
+        histogram["max"] = max(histogram["max"], seconds)
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {name: {**h, "buckets": list(h["buckets"])} for name, h in _histograms.items()},
+        }
+
+def merge(other):
+    with _lock:
+        for name, value in other["counters"].items():
+            _counters[name] = _counters.get(name, 0) + value
+        _gauges.update(other["gauges"])
+        for name, theirs in other["histograms"].items():
+            ours = _histograms.setdefault(name, _new_histogram())
+            ours["buckets"] = [a + b for a, b in zip(ours["buckets"], theirs["buckets"])]
+            ours["count"] += theirs["count"]
+            ours["sum"] += theirs["sum"]
+            ours["max"] = max(ours["max"], theirs["max"])
+
+def reset_peak_rss():
+    # Linux lets a process reset its own high-water mark; elsewhere the peak is cumulative for the run
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def children_peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _bucket_label(i):
+    return "+Inf" if i == len(LATENCY_BUCKETS) else f"{LATENCY_BUCKETS[i]:g}"
+
+def _cumulative(buckets):
+    total, result = 0, {}
+    for i, count in enumerate(buckets):
+        total += count
+        result[_bucket_label(i)] = total
+    return result
+
+def build_report(stages=None):
+    data = snapshot()
+    return {
+        "generated_at": datetime.now(pytz.utc).isoformat(),
+        "stages": stages or [],
+        "counters": data["counters"],
+        "gauges": data["gauges"],
+        "histograms": {
+            name: {"count": h["count"], "sum": h["sum"], "max": h["max"], "buckets": _cumulative(h["buckets"])}
+            for name, h in data["histograms"].items()
+        },
+    }
+
+def prometheus_text(report):
+    lines = []
+    for name, value in sorted(report["counters"].items()):
+        lines.append(f"# TYPE {METRIC_PREFIX}{name}_total counter")
+        lines.append(f"{METRIC_PREFIX}{name}_total {value}")
+    for name, value in sorted(report["gauges"].items()):
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+        lines.append(f"{METRIC_PREFIX}{name} {value}")
+    for name, h in sorted(report["histograms"].items()):
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+        for bound, count in h["buckets"].items():
+            lines.append(f'{METRIC_PREFIX}{name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{METRIC_PREFIX}{name}_sum {h['sum']}")
+        lines.append(f"{METRIC_PREFIX}{name}_count {h['count']}")
+    if report["stages"]:
+        lines.append(f"# TYPE {METRIC_PREFIX}stage_wall_seconds gauge")
+        for stage in report["stages"]:
+            lines.append(f'{METRIC_PREFIX}stage_wall_seconds{{stage="{stage["name"]}",status="{stage["status"]}"}} {stage["wall_time_s"]}')
+        lines.append(f"# TYPE {METRIC_PREFIX}stage_peak_rss_bytes gauge")
+        for stage in report["stages"]:
+            if stage["peak_rss_mb"] is not None:
+                lines.append(f'{METRIC_PREFIX}stage_peak_rss_bytes{{stage="{stage["name"]}"}} {int(stage["peak_rss_mb"] * 1024 * 1024)}')
+    lines.append(f"# TYPE {METRIC_PREFIX}last_run_timestamp_seconds gauge")
+    lines.append(f"{METRIC_PREFIX}last_run_timestamp_seconds {int(time.time())}")
+    return "\n".join(lines) + "\n"
+
+def write_report(stages=None):
+    # JSON for humans and diffing between runs; the .prom file suits node_exporter's textfile collector
+    report = build_report(stages)
+    with atomic_write(RUN_REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    with atomic_write(PROMETHEUS_FILE, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(report))
+    return report
@@ -0,0 +1,237 @@
+import os
+import glob
+import cProfile
+import pstats
+import json
+import time
+import hashlib
+import argparse
+import logging
+from collections import namedtuple
+from datetime import datetime
+import pytz
+from atomic_file import atomic_write
+import fetch_repos
+import update_star_history
+import cleanup_old_repos
+import convert_and_sort_star_history
+import run_metrics
+from star_store import StarStore, STORE_FILE
+from repo_registry import REGISTRY_FILE, parse_repo_id
+from frontend_bundle import BUNDLE_POINTER
+
+PIPELINE_STATE_FILE = os.path.join("cache", "pipeline_state.json")
+PROFILE_DIR = os.path.join("logs", "profile")
+
+# Each stage module configures logging on import; the whole run should go to the daily log file
+os.makedirs("logs", exist_ok=True)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(f'logs/{datetime.now(pytz.utc).strftime("%Y-%m-%d")}.log'),
+        logging.StreamHandler()
+    ],
+    force=True
+)
+
+# fingerprint(ctx) hashes a stage's inputs and returns None when they cannot be fingerprinted;
+# outputs are files that must be unchanged since the stage last ran for it to be skipped
+Stage = namedtuple("Stage", ["name", "fingerprint", "run", "outputs"])
+
+class PipelineContext:
+    # Data shared between stages so the index and histories are loaded at most once per run
+
+    def __init__(self, args):
+        self.args = args
+        self.today = datetime.now(pytz.utc).strftime('%Y-%m-%d')
+        self.repo_index = None
+        self.store = None
+
+    def set_index_rows(self, rows):
+        metadata = {}
+        for row in rows:
+            repo_name = row[0].strip()
+            if repo_name:
+                metadata[repo_name] = dict(zip(fetch_repos.INDEX_FIELDS, row))
+        self.repo_index = (metadata, list(fetch_repos.INDEX_FIELDS))
+
+    def get_repo_index(self):
+        if self.repo_index is None:
+            self.repo_index = convert_and_sort_star_history.load_repo_index()
+        return self.repo_index
+
+    def active_repos(self):
+        return set(self.get_repo_index()[0])
+
+    def repo_ids(self):
+        return {name: parse_repo_id(row.get("repo_id")) for name, row in self.get_repo_index()[0].items()}
+
+    def get_store(self):
+        if self.store is None:
+            self.store = StarStore.load()
+        return self.store
+
+def file_digest(path):
+    h = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+def combine(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+def fetch_fingerprint(ctx):
+    # The search windows move with the calendar, so discovery runs once per UTC day
+    return combine(ctx.today, ctx.args.delta)
+
+def run_fetch(ctx):
+    ctx.set_index_rows(fetch_repos.main(delta=ctx.args.delta))
+
+def update_fingerprint(ctx):
+    return combine(ctx.today, file_digest(fetch_repos.REPO_INDEX_FILE), ctx.args.export_csv)
+
+def run_update(ctx):
+    ctx.store = update_star_history.main(full_rebuild=ctx.args.full, repo_ids=ctx.repo_ids(), export_csv=ctx.args.export_csv)
+
+def cleanup_fingerprint(ctx):
+    return combine(file_digest(fetch_repos.REPO_INDEX_FILE), file_digest(REGISTRY_FILE))
+
+def run_cleanup(ctx):
+    cleanup_old_repos.main(active_repos=ctx.active_repos())
+
+def convert_fingerprint(ctx):
+    store = ctx.get_store()
+    if store is None:
+        return None
+    return combine(file_digest(fetch_repos.REPO_INDEX_FILE), store.digest(), ctx.args.top_k)
+
+def run_convert(ctx):
+    convert_and_sort_star_history.main(top_k=ctx.args.top_k, repo_index=ctx.get_repo_index(), store=ctx.get_store())
+
+STAGES = [
+    Stage("fetch", fetch_fingerprint, run_fetch, [fetch_repos.REPO_INDEX_FILE]),
+    Stage("update", update_fingerprint, run_update, [STORE_FILE]),
+    Stage("cleanup", cleanup_fingerprint, run_cleanup, []),
+    Stage("convert", convert_fingerprint, run_convert, [convert_and_sort_star_history.REPO_FILTERS_OUTPUT, BUNDLE_POINTER]),
+]
+
+def load_state():
+    try:
+        with open(PIPELINE_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state):
+    with atomic_write(PIPELINE_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def is_up_to_date(stage, fingerprint, previous):
+    if fingerprint is None or not previous or previous.get("fingerprint") != fingerprint:
+        return False
+    return all(file_digest(path) == previous["outputs"].get(path) for path in stage.outputs)
+
+def run_pipeline(args):
+    state = load_state()
+    ctx = PipelineContext(args)
+    stage_names = [stage.name for stage in STAGES]
+    first = stage_names.index(args.from_stage) if args.from_stage else 0
+    # A full rebuild discards history, so it cannot be satisfied by the last run's outputs
+    forced = {args.from_stage, "update" if args.full else None}
+    report = []
+
+    for position, stage in enumerate(STAGES):
+        if position < first:
+            report.append((stage.name, "skipped", 0.0, None))
+            continue
+
+        fingerprint = stage.fingerprint(ctx)
+        if not args.force and stage.name not in forced and is_up_to_date(stage, fingerprint, state.get(stage.name)):
+            logging.info(f"Stage {stage.name}: inputs unchanged, skipping")
+            report.append((stage.name, "cached", 0.0, None))
+            continue
+
+        logging.info(f"Stage {stage.name}: starting")
+        # Drop the record first so a crash mid-stage resumes here rather than trusting stale outputs
+        state.pop(stage.name, None)
+        save_state(state)
+        run_metrics.reset_peak_rss()
+        started = time.perf_counter()
+        try:
+            if args.profile:
+                run_profiled(stage, ctx)
+            else:
+                stage.run(ctx)
+        except BaseException:
+            logging.error(f"Stage {stage.name} failed after {time.perf_counter() - started:.1f}s; rerun to resume from here")
+            log_report(report + [(stage.name, "failed", time.perf_counter() - started, run_metrics.peak_rss_mb())])
+            raise
+        elapsed = time.perf_counter() - started
+        run_metrics.observe("stage_seconds", elapsed)
+        peak = run_metrics.peak_rss_mb()
+        report.append((stage.name, "ran", elapsed, peak))
+
+        state[stage.name] = {
+            "fingerprint": fingerprint,
+            "outputs": {path: file_digest(path) for path in stage.outputs},
+            "finished_at": datetime.now(pytz.utc).isoformat(),
+            "wall_time_s": round(elapsed, 3),
+            "peak_rss_mb": round(peak, 1),
+        }
+        save_state(state)
+
+    log_report(report)
+
+def run_profiled(stage, ctx):
+    # The parent's profile misses pool workers, so update workers also profile each
+    # archive hour; those are merged into one file afterwards
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    hours_dir = os.path.join(PROFILE_DIR, f"{stage.name}-hours")
+    os.makedirs(hours_dir, exist_ok=True)
+    os.environ[update_star_history.PROFILE_DIR_ENV] = hours_dir
+    profile = cProfile.Profile()
+    try:
+        profile.runcall(stage.run, ctx)
+    finally:
+        del os.environ[update_star_history.PROFILE_DIR_ENV]
+        profile.dump_stats(os.path.join(PROFILE_DIR, f"{stage.name}.prof"))
+        hour_profiles = sorted(glob.glob(os.path.join(hours_dir, "*.prof")))
+        if hour_profiles:
+            pstats.Stats(*hour_profiles).dump_stats(os.path.join(PROFILE_DIR, f"{stage.name}-workers.prof"))
+        for path in hour_profiles:
+            os.remove(path)
+        os.rmdir(hours_dir)
+        logging.info(f"Wrote profile for stage {stage.name} to {PROFILE_DIR}")
+
+def log_report(report):
+    workers_ran = any(name == "update" and status in ("ran", "failed") for name, status, _, _ in report)
+    workers_peak = run_metrics.children_peak_rss_mb() if workers_ran else 0
+    if workers_peak:
+        run_metrics.set_gauge("update_worker_peak_rss_mb", round(workers_peak, 1))
+    run_metrics.write_report([
+        {"name": name, "status": status, "wall_time_s": round(elapsed, 3), "peak_rss_mb": None if peak is None else round(peak, 1)}
+        for name, status, elapsed, peak in report
+    ])
+    logging.info("Pipeline summary:")
+    for name, status, elapsed, peak in report:
+        peak_text = f"{peak:8.1f} MB peak RSS" if peak is not None else ""
+        logging.info(f"  {name:<8} {status:<7} {elapsed:8.2f}s {peak_text}")
+    if workers_peak:
+        logging.info(f"  worker processes peaked at {workers_peak:.1f} MB RSS")
+    logging.info(f"Run report written to {run_metrics.RUN_REPORT_FILE} and {run_metrics.PROMETHEUS_FILE}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run repository discovery, star history update, cleanup and conversion in one process")
+    parser.add_argument("--from", dest="from_stage", choices=[stage.name for stage in STAGES], help="start at this stage and run it even if its inputs are unchanged")
+    parser.add_argument("--force", action="store_true", help="run every stage even if its inputs are unchanged")
+    parser.add_argument("--delta", action="store_true", help="pass --delta to repository discovery")
+    parser.add_argument("--full", action="store_true", help="pass --full to the star history update")
+    parser.add_argument("--export-csv", action="store_true", help="pass --export-csv to the star history update")
+    parser.add_argument("--top-k", type=int, help="pass --top-k to conversion")
+    parser.add_argument("--profile", action="store_true", help=f"write cProfile stats for each stage that runs to {PROFILE_DIR}")
+    run_pipeline(parser.parse_args())
@@ -0,0 +1,327 @@
+import os
+import sys
+import glob
+import time
+import hashlib
+import argparse
+import functools
+import logging
+import threading
+import subprocess
+import http.server
+from datetime import datetime, timedelta
+import numpy as np
+import orjson
+import pytz
+import hour_cache
+import run_metrics
+import synthetic_data
+import update_star_history
+from update_star_history import HOURS_PER_DAY, STAR_HISTORY_DIR
+from atomic_file import atomic_write
+from repo_table import RepoTable
+
+# Sharded ingestion for backfills too large for one machine. The (day, hour) units of a date
+# range are dealt round-robin to N workers; each writes a self-describing count shard, and
+# a merge step adds shards into the star history store. The manifest keeps a ledger of the
+# hours merged into each day, so merging the same shard twice is a no-op and hours no shard
+# covered are reported rather than silently left at zero.
+SHARD_DIR = os.path.join("cache", "shards")
+SHARD_FORMAT = 1
+MERGE_REPORT_FILE = os.path.join("logs", "shard_merge_report.json")
+ALL_HOURS = (1 << len(HOURS_PER_DAY)) - 1
+
+def day_range(start, end):
+    first = datetime.strptime(start, '%Y-%m-%d')
+    days = (datetime.strptime(end, '%Y-%m-%d') - first).days + 1
+    return [(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+def shard_units(start, end, shard, shards):
+    # Round-robin rather than contiguous slices, so every worker sees a mix of quiet and busy
+    # hours and a missing worker leaves scattered holes instead of losing whole weeks
+    units = [(day, hour) for day in day_range(start, end) for hour in HOURS_PER_DAY]
+    return units[shard::shards]
+
+def repos_digest(repos):
+    return hashlib.sha1("\n".join(repos).encode('utf-8')).hexdigest()
+
+def shard_path(directory, start, end, shard, shards):
+    return os.path.join(directory, f"shard-{start}-{end}-{shard:03d}-of-{shards:03d}.npz")
+
+def mask_hours(mask):
+    return [hour for hour in HOURS_PER_DAY if mask >> hour & 1]
+
+def write_shard(path, meta, repos, hours):
+    # hours is [((day, hour), (repo ids, counts))]. Hours are kept apart rather than summed per
+    # day so a re-run worker's shard can fill in just the hours an earlier merge lacked; counts
+    # are stored sparsely (CSR over hours) since most repos gain nothing in a given hour.
+    hours = sorted(hours)
+    indptr = np.cumsum([0] + [len(ids) for _, (ids, _) in hours], dtype=np.int64)
+    with atomic_write(path, 'wb') as f:
+        np.savez(
+            f,
+            meta=np.array(orjson.dumps(meta).decode('utf-8')),
+            repos=np.array(repos, dtype=str),
+            days=np.array([day for (day, _), _ in hours], dtype=str),
+            hours=np.array([hour for (_, hour), _ in hours], dtype=np.int8),
+            indptr=indptr,
+            repo_ids=np.concatenate([ids for _, (ids, _) in hours] or [np.empty(0, dtype=np.int32)]),
+            counts=np.concatenate([counts for _, (_, counts) in hours] or [np.empty(0, dtype=np.int32)]),
+        )
+
+def read_shard(path):
+    with np.load(path, allow_pickle=False) as data:
+        meta = orjson.loads(str(data["meta"]))
+        if meta.get("format") != SHARD_FORMAT:
+            raise ValueError(f"unsupported shard format {meta.get('format')}")
+        shard = {key: data[key] for key in ("hours", "indptr", "repo_ids", "counts")}
+        shard["repos"] = data["repos"].tolist()
+        shard["days"] = data["days"].tolist()
+    if repos_digest(shard["repos"]) != meta["repos_sha1"]:
+        raise ValueError("repository list does not match its digest")
+    shard["meta"] = meta
+    return shard
+
+def run_worker(start, end, shard, shards, repos, output_dir=SHARD_DIR, cpu_workers=update_star_history.CPU_WORKERS):
+    # Ingests this worker's units with the same pipeline as the daily update and writes its shard.
+    # Hours that could not be read are listed in the shard so the merge can tell them apart
+    # from hours no worker was asked for.
+    units = shard_units(start, end, shard, shards)
+    spool_dir = os.path.join("cache", f"spool-{shard}")
+    table = RepoTable.create(repos)
+    hours, failed = [], []
+    started = time.perf_counter()
+    try:
+        repos = table.repo_names()
+        for day, hour, counts in update_star_history.ingest_hours(units, table, cpu_workers, spool_dir):
+            if counts is None:
+                failed.append(f"{day}-{hour}")
+                continue
+            nonzero = np.flatnonzero(counts)
+            hours.append(((day, hour), (nonzero.astype(np.int32), counts[nonzero])))
+    finally:
+        table.close(unlink=True)
+        update_star_history.clear_spool(spool_dir)
+        os.rmdir(spool_dir)
+
+    meta = {
+        "format": SHARD_FORMAT,
+        "shard": shard,
+        "shards": shards,
+        "start": start,
+        "end": end,
+        "repos_sha1": repos_digest(repos),
+        "units": len(units),
+        "failed": sorted(failed),
+        "created_at": datetime.now(pytz.utc).isoformat(),
+        "seconds": round(time.perf_counter() - started, 3),
+        # Each worker's counters travel with its shard rather than overwriting the run report
+        "counters": run_metrics.snapshot()["counters"],
+    }
+    path = shard_path(output_dir, start, end, shard, shards)
+    write_shard(path, meta, repos, hours)
+    logging.info(f"Wrote shard {shard + 1}/{shards}: {len(units) - len(failed)} of {len(units)} hours to {path}")
+    return path
+
+def load_shards(directory):
+    shards = []
+    for path in sorted(glob.glob(os.path.join(directory, "shard-*.npz"))):
+        try:
+            shards.append(read_shard(path))
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Skipping unreadable shard {path}: {e}")
+    return shards
+
+def missing_shards(shards):
+    # {"<start>..<end>/<shards>": [indices]} for runs some of whose workers left no shard
+    runs = {}
+    for shard in shards:
+        meta = shard["meta"]
+        runs.setdefault((meta["start"], meta["end"], meta["shards"]), set()).add(meta["shard"])
+    return {
+        f"{start}..{end}/{total}": [i for i in range(total) if i not in seen]
+        for (start, end, total), seen in sorted(runs.items())
+        if len(seen) < total
+    }
+
+def missing_hours(days, covered, skipped=()):
+    # {day: [hours]} for hours of the given days that no shard or earlier merge covered
+    missing = {}
+    for day in days:
+        hours = mask_hours(ALL_HOURS & ~covered.get(day, 0))
+        if hours and day not in skipped:
+            missing[day] = hours
+    return missing
+
+def merge_shards(directory=SHARD_DIR, repo_ids=None, report_path=MERGE_REPORT_FILE):
+    shards = load_shards(directory)
+    if not shards:
+        logging.warning(f"No shards found in {directory}")
+        return None
+
+    if repo_ids is None:
+        repo_ids = update_star_history.get_repo_ids()
+    active_repos = set(repo_ids)
+    os.makedirs(STAR_HISTORY_DIR, exist_ok=True)
+    manifest, store, registry = update_star_history.prepare_store(repo_ids)
+    since = update_star_history.daily_since(manifest, store)
+    ledger = dict(manifest.get("merged_hours", {}))
+
+    all_rows = np.arange(len(store.repos))
+    merged, duplicates, skipped = {}, 0, set()
+    for shard in shards:
+        # Shards are matched to the store by repo name, so they may predate index changes
+        rows = np.array([store.repo_index.get(repo, -1) for repo in shard["repos"]], dtype=np.intp)
+        for i, (day, hour) in enumerate(zip(shard["days"], shard["hours"].tolist())):
+            done = ledger.get(day, 0)
+            if not done and since is not None and day >= since:
+                skipped.add(day)
+                continue
+            if done >> hour & 1:
+                duplicates += 1
+                continue
+            if not done:
+                # First hour for this day: every repo starts at zero rather than MISSING
+                store.add_day_values(day, all_rows, np.zeros(len(all_rows), dtype=np.int32))
+            lo, hi = shard["indptr"][i], shard["indptr"][i + 1]
+            ids = rows[shard["repo_ids"][lo:hi]]
+            known = ids >= 0
+            store.add_day_values(day, ids[known], shard["counts"][lo:hi][known])
+            ledger[day] = done | 1 << hour
+            merged[day] = merged.get(day, 0) | 1 << hour
+
+    window = set(update_star_history.history_window())
+    for day in merged:
+        if day in window:
+            manifest["days"][day] = "complete" if ledger[day] == ALL_HOURS else "partial"
+    if since is not None:
+        manifest["daily_since"] = since
+
+    # Ledger first, marked pending against the store about to be saved; see settle_pending_merge()
+    update_star_history.compact_store(store, active_repos)
+    manifest["pending_merge"] = {"store_digest": store.digest(), "merged_hours": ledger}
+    update_star_history.save_manifest(manifest)
+    update_star_history.write_batch_updates(store, active_repos, registry)
+    del manifest["pending_merge"]
+    # Hours older than the store's oldest bucket were dropped by trim() and would be again
+    coverage = store.coverage_start()
+    manifest["merged_hours"] = {day: mask for day, mask in ledger.items() if coverage is None or day >= coverage}
+    manifest["repos"] = sorted(active_repos)
+    update_star_history.save_manifest(manifest)
+
+    # Failed hours a later shard has since supplied are no longer worth reporting
+    failed = sorted({
+        unit for shard in shards for unit in shard["meta"]["failed"]
+        if not ledger.get(unit[:10], 0) >> int(unit[11:]) & 1
+    })
+    days = sorted({day for shard in shards for day in day_range(shard["meta"]["start"], shard["meta"]["end"])})
+    missing = missing_hours(days, ledger, skipped)
+    report = {
+        "generated_at": datetime.now(pytz.utc).isoformat(),
+        "shards": len(shards),
+        "missing_shards": missing_shards(shards),
+        "merged_hours": sum(bin(mask).count("1") for mask in merged.values()),
+        "duplicate_hours": duplicates,
+        "skipped_daily_days": sorted(skipped),
+        "failed_hours": failed,
+        "missing_hours": missing,
+    }
+    with atomic_write(report_path, 'wb') as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    logging.info(
+        f"Merged {report['merged_hours']} hours from {len(shards)} shards "
+        f"({duplicates} already merged, {len(skipped)} days left to the daily update)"
+    )
+    for run, indices in report["missing_shards"].items():
+        logging.warning(f"Run {run} is missing shards {indices}")
+    if missing:
+        missing_count = sum(len(hours) for hours in missing.values())
+        logging.warning(f"{missing_count} hours in {len(missing)} days are missing; see {report_path}")
+    return report
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixtures(directory):
+    # Local stand-in for data.gharchive.org; missing hours 404 like the real archive
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def evict_hour_cache(end):
+    # Ages are measured from the end of the range, so a backfill keeps its own cached hours for
+    # retries while the size budget still applies
+    hour_cache.evict(now=datetime.strptime(end, '%Y-%m-%d').replace(tzinfo=pytz.utc) + timedelta(days=1))
+
+def run_local(args):
+    # Runs every worker as its own process against a local archive server, then merges, so the
+    # whole sharded flow can be exercised on one machine
+    if args.generate:
+        repos = sorted(update_star_history.get_repo_ids())
+        written = synthetic_data.write_archive_fixtures(args.fixtures, day_range(args.start, args.end), repos, seed=args.seed)
+        logging.info(f"Generated {written} fixture archive hours in {args.fixtures}")
+    # Once here rather than in each worker, which share this cache and would race on it
+    evict_hour_cache(args.end)
+    server = serve_fixtures(args.fixtures)
+    archive_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        workers = [
+            subprocess.Popen([
+                sys.executable, os.path.abspath(__file__), "worker",
+                "--start", args.start, "--end", args.end,
+                "--shard", str(shard), "--shards", str(args.shards),
+                "--output", args.output, "--archive-url", archive_url,
+                "--cpu-workers", str(args.cpu_workers), "--no-evict",
+            ])
+            for shard in range(args.shards)
+        ]
+        failed = [shard for shard, worker in enumerate(workers) if worker.wait() != 0]
+    finally:
+        server.shutdown()
+    if failed:
+        # Their hours show up as missing in the merge report
+        logging.warning(f"Workers for shards {failed} failed")
+    return merge_shards(args.output)
+
+def main(args):
+    if args.command == "worker":
+        update_star_history.GITHUB_ARCHIVE_URL = args.archive_url
+        if not args.no_evict:
+            evict_hour_cache(args.end)
+        run_worker(args.start, args.end, args.shard, args.shards, list(update_star_history.get_repo_ids()), args.output, args.cpu_workers)
+    elif args.command == "merge":
+        merge_shards(args.output)
+    else:
+        run_local(args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded GH Archive ingestion for backfills across several workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_range(command):
+        command.add_argument("--start", required=True, help="first day, YYYY-MM-DD")
+        command.add_argument("--end", required=True, help="last day, YYYY-MM-DD (inclusive)")
+        command.add_argument("--shards", type=int, required=True, help="total number of workers")
+        command.add_argument("--cpu-workers", type=int, default=update_star_history.CPU_WORKERS, help="parse processes per worker")
+
+    worker = commands.add_parser("worker", help="ingest one shard of a date range")
+    add_range(worker)
+    worker.add_argument("--shard", type=int, required=True, help="this worker's index, 0 to shards - 1")
+    worker.add_argument("--archive-url", default=update_star_history.GITHUB_ARCHIVE_URL, help="GH Archive base URL")
+    worker.add_argument("--no-evict", action="store_true", help="leave the hour cache alone (for workers sharing one cache)")
+    merge = commands.add_parser("merge", help="merge every shard in the shard directory into the star history")
+    local = commands.add_parser("local", help="run all workers as local processes against fixture archives, then merge")
+    add_range(local)
+    local.add_argument("--fixtures", required=True, help="directory of <day>-<hour>.json.gz archives")
+    local.add_argument("--generate", action="store_true", help="first write synthetic fixtures for the indexed repos")
+    local.add_argument("--seed", type=int, default=0, help="seed for --generate")
+    for command in (worker, merge, local):
+        command.add_argument("--output", default=SHARD_DIR, help=f"shard directory (default: {SHARD_DIR})")
+    args = parser.parse_args()
+    if args.command != "merge" and not 0 <= getattr(args, "shard", 0) < args.shards:
+        parser.error("--shard must be between 0 and --shards - 1")
+    update_star_history.configure_logging()
+    main(args)
@@ -0,0 +1,251 @@
+import os
+import csv
+import hashlib
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from atomic_file import atomic_write
+
+STORE_FILE = os.path.join("star_history", "store.npz")
+NA = -1
+MISSING = -2
+
+def _parse_day(date_str):
+    return datetime.strptime(date_str, '%Y-%m-%d')
+
+def segment_start(date_str):
+    # Week-of-month bucket: weeks start on Monday but never cross a month boundary,
+    # so segments always roll up exactly into calendar months
+    date = _parse_day(date_str)
+    return max(date - timedelta(days=date.weekday()), date.replace(day=1)).strftime('%Y-%m-%d')
+
+def month_start(date_str):
+    return date_str[:8] + "01"
+
+class StarStore:
+    # Dense repos x days matrix of daily star deltas. NA marks a day with no
+    # archive data, MISSING a day that was never ingested for that repo.
+    # Days that age out of the daily window are folded into week-of-month
+    # segments, and old segments into months; rollups hold plain star totals
+    # (NA and MISSING days count as 0) keyed by their first day.
+
+    def __init__(self, repos=None, days=None, counts=None, segments=None, segment_counts=None, months=None, month_counts=None):
+        self.repos = list(repos or [])
+        self.days = list(days or [])
+        self.repo_index = {repo: i for i, repo in enumerate(self.repos)}
+        if counts is None:
+            counts = np.full((len(self.repos), len(self.days)), MISSING, dtype=np.int32)
+        self.counts = counts
+        self.segments = list(segments or [])
+        self.segment_counts = self._tier(segment_counts, self.segments)
+        self.months = list(months or [])
+        self.month_counts = self._tier(month_counts, self.months)
+
+    def _tier(self, counts, keys):
+        if counts is None:
+            return np.zeros((len(self.repos), len(keys)), dtype=np.int32)
+        return counts
+
+    @classmethod
+    def load(cls, path=STORE_FILE):
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            # Rollup tiers are optional so stores written before they existed still load
+            tiers = {
+                key: data[key].tolist() if key in ("segments", "months") else data[key]
+                for key in ("segments", "segment_counts", "months", "month_counts")
+                if key in data.files
+            }
+            return cls(data["repos"].tolist(), data["days"].tolist(), data["counts"], **tiers)
+
+    @classmethod
+    def from_csv_dir(cls, directory, files):
+        # files maps repo name -> history filename (see RepoRegistry)
+        histories = {}
+        for repo_name, filename in files.items():
+            try:
+                with open(os.path.join(directory, filename), 'r', newline='', encoding='utf-8') as f:
+                    rows = {row[0]: row[1] for row in csv.reader(f) if row}
+                histories[repo_name] = {day: count if count == "NA" else int(count) for day, count in rows.items()}
+            except FileNotFoundError:
+                # Registered but not exported yet
+                continue
+            except (IndexError, ValueError) as e:
+                logging.warning(f"Failed to import history for {repo_name}: {e}")
+        store = cls()
+        store.add_repos(histories)
+        for day in sorted({day for rows in histories.values() for day in rows}):
+            store.set_day(day, {repo: rows[day] for repo, rows in histories.items() if day in rows})
+        return store
+
+    def save(self, path=STORE_FILE):
+        with atomic_write(path, 'wb') as f:
+            np.savez(
+                f,
+                repos=np.array(self.repos, dtype=str),
+                days=np.array(self.days, dtype=str),
+                counts=self.counts,
+                segments=np.array(self.segments, dtype=str),
+                segment_counts=self.segment_counts,
+                months=np.array(self.months, dtype=str),
+                month_counts=self.month_counts,
+            )
+
+    def digest(self):
+        # Content hash that, unlike the .npz bytes, does not change when identical data is re-saved
+        h = hashlib.sha1()
+        h.update("\n".join(self.repos).encode('utf-8'))
+        h.update(b"\0")
+        h.update("\n".join(self.days).encode('utf-8'))
+        h.update(b"\0")
+        h.update(np.ascontiguousarray(self.counts, dtype=np.int32).tobytes())
+        for keys, counts in ((self.segments, self.segment_counts), (self.months, self.month_counts)):
+            h.update(b"\0" + "\n".join(keys).encode('utf-8') + b"\0")
+            h.update(np.ascontiguousarray(counts, dtype=np.int32).tobytes())
+        return h.hexdigest()
+
+    def add_repos(self, repos):
+        new_repos = sorted(set(repos) - self.repo_index.keys())
+        if not new_repos:
+            return
+        for repo in new_repos:
+            self.repo_index[repo] = len(self.repos)
+            self.repos.append(repo)
+        padding = np.full((len(new_repos), len(self.days)), MISSING, dtype=np.int32)
+        self.counts = np.vstack([self.counts, padding])
+        self.segment_counts = np.vstack([self.segment_counts, np.zeros((len(new_repos), len(self.segments)), dtype=np.int32)])
+        self.month_counts = np.vstack([self.month_counts, np.zeros((len(new_repos), len(self.months)), dtype=np.int32)])
+
+    def rename(self, renames):
+        for old, new in renames.items():
+            if old in self.repo_index and new not in self.repo_index:
+                row = self.repo_index.pop(old)
+                self.repos[row] = new
+                self.repo_index[new] = row
+
+    def retain(self, repos):
+        keep = [i for i, repo in enumerate(self.repos) if repo in repos]
+        if len(keep) == len(self.repos):
+            return
+        self.counts = self.counts[keep]
+        self.segment_counts = self.segment_counts[keep]
+        self.month_counts = self.month_counts[keep]
+        self.repos = [self.repos[i] for i in keep]
+        self.repo_index = {repo: i for i, repo in enumerate(self.repos)}
+
+    def _day_column(self, date_str):
+        if date_str not in self.days:
+            self.days.append(date_str)
+            self.days.sort()
+            column = np.full((len(self.repos), 1), MISSING, dtype=np.int32)
+            position = self.days.index(date_str)
+            self.counts = np.hstack([self.counts[:, :position], column, self.counts[:, position:]])
+        return self.days.index(date_str)
+
+    def set_day(self, date_str, daily_counts):
+        self.add_repos(daily_counts)
+        col = self._day_column(date_str)
+        rows = np.fromiter((self.repo_index[repo] for repo in daily_counts), dtype=np.intp, count=len(daily_counts))
+        values = np.fromiter(
+            (NA if count == "NA" else int(count) for count in daily_counts.values()),
+            dtype=np.int32,
+            count=len(daily_counts),
+        )
+        self.counts[rows, col] = values
+
+    def set_day_values(self, date_str, rows, values):
+        # Vectorised set_day for callers that already know each repo's row
+        col = self._day_column(date_str)
+        self.counts[rows, col] = values
+
+    def add_day_values(self, date_str, rows, values):
+        # Accumulates into a day, e.g. from several ingestion shards; NA and MISSING count as 0
+        col = self._day_column(date_str)
+        current = self.counts[rows, col]
+        self.counts[rows, col] = np.where(current >= 0, current, 0) + values
+
+    def trim(self, days_history, segment_history_days=0, month_history_days=0):
+        # Without rollup retention, days that leave the daily window are simply dropped
+        if len(self.days) > days_history:
+            if segment_history_days or month_history_days:
+                dropped = self.counts[:, :-days_history]
+                self._roll_into_segments(self.days[:-days_history], np.where(dropped > 0, dropped, 0))
+            self.days = self.days[-days_history:]
+            self.counts = self.counts[:, -days_history:]
+        if not self.days:
+            return
+        newest = _parse_day(self.days[-1])
+        segment_cutoff = (newest - timedelta(days=segment_history_days)).strftime('%Y-%m-%d')
+        aged = [i for i, start in enumerate(self.segments) if start < segment_cutoff]
+        if aged:
+            if month_history_days:
+                self._roll_into_months([self.segments[i] for i in aged], self.segment_counts[:, aged])
+            keep = [i for i, start in enumerate(self.segments) if start >= segment_cutoff]
+            self.segments = [self.segments[i] for i in keep]
+            self.segment_counts = self.segment_counts[:, keep]
+        month_cutoff = month_start((newest - timedelta(days=month_history_days)).strftime('%Y-%m-%d'))
+        keep = [i for i, start in enumerate(self.months) if start >= month_cutoff]
+        if len(keep) < len(self.months):
+            self.months = [self.months[i] for i in keep]
+            self.month_counts = self.month_counts[:, keep]
+
+    def _roll_into_segments(self, days, values):
+        self.segments, self.segment_counts = _roll(self.segments, self.segment_counts, [segment_start(day) for day in days], values)
+
+    def _roll_into_months(self, segments, values):
+        self.months, self.month_counts = _roll(self.months, self.month_counts, [month_start(start) for start in segments], values)
+
+    def coverage_start(self):
+        # Earliest day any tier holds data for
+        starts = self.months[:1] + self.segments[:1] + self.days[:1]
+        return min(starts) if starts else None
+
+    def window_gain(self, days):
+        # Stars gained over the last `days` days, using the finest tier that holds each period.
+        # Rollup buckets count only if they start inside the window, so windows reaching past the
+        # daily tier are rounded inward to bucket boundaries. Returns (gains, window start).
+        if not self.days:
+            return np.zeros(len(self.repos), dtype=np.int64), None
+        start = (_parse_day(self.days[-1]) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        gains = np.zeros(len(self.repos), dtype=np.int64)
+        day_cols = [i for i, day in enumerate(self.days) if day >= start]
+        recent = self.counts[:, day_cols]
+        gains += np.where(recent > 0, recent, 0).sum(axis=1)
+        gains += self.segment_counts[:, [i for i, key in enumerate(self.segments) if key >= start]].sum(axis=1)
+        gains += self.month_counts[:, [i for i, key in enumerate(self.months) if key >= start]].sum(axis=1)
+        return gains, start
+
+    def history(self, repo_name):
+        row = self.counts[self.repo_index[repo_name]]
+        return [
+            (day, None if value == NA else int(value))
+            for day, value in zip(self.days, row)
+            if value != MISSING
+        ]
+
+    def export_csv(self, directory, filename):
+        # filename(repo) names each repo's history file (RepoRegistry.file)
+        os.makedirs(directory, exist_ok=True)
+        for repo, row in zip(self.repos, self.counts):
+            file_path = os.path.join(directory, filename(repo))
+            # Renamed into place so an interrupted export never leaves a truncated history
+            with atomic_write(file_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerows(
+                    [day, "NA" if value == NA else value]
+                    for day, value in zip(self.days, row.tolist())
+                    if value != MISSING
+                )
+        logging.info(f"Exported {len(self.repos)} repository histories to {directory}")
+
+def _roll(keys, counts, bucket_keys, values):
+    # Adds each column of values into the bucket named by bucket_keys, creating buckets in sorted order
+    for key in sorted(set(bucket_keys) - set(keys)):
+        position = sum(1 for existing in keys if existing < key)
+        keys = keys[:position] + [key] + keys[position:]
+        counts = np.hstack([counts[:, :position], np.zeros((counts.shape[0], 1), dtype=np.int32), counts[:, position:]])
+    index = {key: i for i, key in enumerate(keys)}
+    for bucket_key, column in zip(bucket_keys, values.T):
+        counts[:, index[bucket_key]] += column
+    return keys, counts
@@ -0,0 +1,118 @@
+import os
+import csv
+import gzip
+import random
+from datetime import datetime, timedelta
+import numpy as np
+from fetch_repos import INDEX_FIELDS
+from star_store import StarStore, NA
+from repo_registry import RepoRegistry
+
+# Fixed so generated trees and archives are identical from run to run
+SYNTHETIC_END_DATE = datetime(2025, 1, 31)
+OTHER_EVENT_TYPES = ["PushEvent", "CreateEvent", "IssueCommentEvent", "PullRequestEvent", "ForkEvent", "IssuesEvent"]
+TOPICS = ["python", "rust", "llm", "cli", "react", "database", "neovim", "docker", "kubernetes", "game"]
+LICENSES = ["MIT", "Apache-2.0", "GPL-3.0", "BSD-3-Clause", ""]
+
+def repo_names(count, seed=0):
+    rng = random.Random(seed)
+    owners = [f"owner{i}" for i in range(max(count // 4, 1))]
+    return [f"{rng.choice(owners)}/repo-{i}.{rng.choice(['js', 'rs', 'py', 'go'])}_{i % 7}" for i in range(count)]
+
+def day_strings(days, end=SYNTHETIC_END_DATE):
+    return [(end - timedelta(days=days - 1 - i)).strftime('%Y-%m-%d') for i in range(days)]
+
+def _actor(rng, event_id):
+    login = f"user{rng.randrange(1_000_000)}"
+    return (
+        f'{{"id":{rng.randrange(10**8)},"login":"{login}","display_login":"{login}","gravatar_id":"",'
+        f'"url":"https://api.github.com/users/{login}","avatar_url":"https://avatars.githubusercontent.com/u/{event_id}?"}}'
+    )
+
+def archive_lines(events, watch_ratio, repos, seed=0, payload_bytes=1200):
+    # GH Archive's layout: id, type, actor, repo, payload, public, created_at, optional org.
+    # Repos are drawn with a heavy tail so a few get most of the stars, as in real hours.
+    rng = random.Random(seed)
+    created_at = SYNTHETIC_END_DATE.strftime('%Y-%m-%dT%H:%M:%SZ')
+    padding = "x" * payload_bytes
+    for i in range(events):
+        event_id = 30_000_000_000 + i
+        repo = repos[min(int(rng.paretovariate(1.2)) - 1, len(repos) - 1)] if rng.random() < 0.5 else rng.choice(repos)
+        repo_json = f'{{"id":{rng.randrange(10**9)},"name":"{repo}","url":"https://api.github.com/repos/{repo}"}}'
+        if rng.random() < watch_ratio:
+            event_type, payload = "WatchEvent", '{"action":"started"}'
+        else:
+            event_type = rng.choice(OTHER_EVENT_TYPES)
+            payload = f'{{"push_id":{event_id},"size":1,"ref":"refs/heads/main","description":"{padding[:rng.randrange(payload_bytes)]}"}}'
+        org = f',"org":{{"id":{rng.randrange(10**7)},"login":"org{i % 97}"}}' if rng.random() < 0.2 else ""
+        yield (
+            f'{{"id":"{event_id}","type":"{event_type}","actor":{_actor(rng, event_id)},"repo":{repo_json},'
+            f'"payload":{payload},"public":true,"created_at":"{created_at}"{org}}}'
+        )
+
+def archive_hour(events=100_000, watch_ratio=0.06, repos=None, seed=0, payload_bytes=1200, members=1):
+    # Returns the gzip bytes of one hour file; members > 1 concatenates gzip members like some real hours
+    repos = repos or repo_names(5_000, seed)
+    lines = list(archive_lines(events, watch_ratio, repos, seed, payload_bytes))
+    step = -(-len(lines) // members)
+    return b"".join(
+        gzip.compress(("\n".join(lines[i:i + step]) + "\n").encode(), compresslevel=6)
+        for i in range(0, len(lines), step)
+    )
+
+def write_archive_fixtures(directory, days, repos, events=2_000, watch_ratio=0.06, seed=0):
+    # <day>-<hour>.json.gz files named like GH Archive's, for serving to local ingestion runs
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for i, day in enumerate(days):
+        for hour in range(24):
+            path = os.path.join(directory, f"{day}-{hour}.json.gz")
+            with open(path, 'wb') as f:
+                f.write(archive_hour(events, watch_ratio, repos, seed=seed * 100_000 + i * 24 + hour, payload_bytes=200))
+            written += 1
+    return written
+
+def star_store(repos, days=30, seed=0, na_days=1):
+    rng = np.random.default_rng(seed)
+    store = StarStore()
+    store.add_repos(repos)
+    dates = day_strings(days)
+    # Mostly quiet repos with occasional spikes
+    counts = rng.poisson(rng.gamma(0.6, 8.0, size=(len(store.repos), 1)), size=(len(store.repos), days)).astype(np.int32)
+    for i, date in enumerate(dates):
+        store.set_day_values(date, np.arange(len(store.repos)), counts[:, i])
+    for date in rng.choice(dates, size=min(na_days, days), replace=False):
+        store.set_day_values(str(date), np.arange(len(store.repos)), np.full(len(store.repos), NA, dtype=np.int32))
+    return store
+
+def write_repo_index(path, store, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(INDEX_FIELDS)
+        for repo_id, (repo, row) in enumerate(zip(store.repos, store.counts), start=100_000):
+            gained = int(row[row > 0].sum())
+            writer.writerow([
+                repo,
+                f"https://github.com/{repo}",
+                "2024-06-01T00:00:00Z",
+                gained + rng.randrange(100, 50_000),
+                "2025-01-30T12:00:00Z",
+                rng.randrange(0, 5_000),
+                "|".join(rng.sample(TOPICS, rng.randrange(0, 4))),
+                rng.choice(LICENSES),
+                rng.choice(["User", "Organization"]),
+                repo_id,
+            ])
+
+def write_tree(root, repo_count, days=30, seed=0):
+    # repo_index.csv and star_history/ with its registry and store under root, laid out like the real pipeline
+    store = star_store(repo_names(repo_count, seed), days, seed)
+    history_dir = os.path.join(root, "star_history")
+    registry = RepoRegistry()
+    registry.sync(dict.fromkeys(store.repos))
+    store.export_csv(history_dir, registry.file)
+    registry.save(os.path.join(history_dir, "registry.json"))
+    store.save(os.path.join(history_dir, "store.npz"))
+    write_repo_index(os.path.join(root, "repo_index.csv"), store, seed)
+    return store
@@ -0,0 +1,25 @@
+import os
+import pytest
+from atomic_file import atomic_write
+
+
+def test_replaces_the_target_in_one_step(tmp_path):
+    path = tmp_path / "nested" / "state.json"
+    with atomic_write(str(path), 'w', encoding='utf-8') as f:
+        f.write("old")
+    with atomic_write(str(path), 'w', encoding='utf-8', fsync=True) as f:
+        f.write("new")
+        assert path.read_text() == "old"
+    assert path.read_text() == "new"
+    assert os.listdir(path.parent) == ["state.json"]
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_bytes(b"old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path), 'wb') as f:
+            f.write(b"partial")
+            raise RuntimeError("interrupted")
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["state.json"]
@@ -0,0 +1,33 @@
+import math
+import random
+import convert_and_sort_star_history
+
+
+def test_long_window_rankings_are_empty_without_a_store():
+    columns = convert_and_sort_star_history.long_window_metrics(["a/one", "b/two"], [10, 5], None)
+    assert columns == {
+        f"{format}_{window}d": [None, None]
+        for window in convert_and_sort_star_history.LONG_WINDOWS
+        for format in ("pct", "raw")
+    }
+
+
+def test_rank_metrics_matches_sorting_each_metric():
+    rng = random.Random(3)
+    names = [f"owner{rng.randrange(50)}/repo{i}" for i in range(400)]
+    columns = {
+        "pct": [None if rng.random() < 0.2 else rng.choice([0.0, -0.0, 12.5, rng.uniform(-50, 500)]) for _ in names],
+        "raw": [None if rng.random() < 0.2 else rng.randrange(-3, 8) for _ in names],
+        "empty": [None] * len(names),
+    }
+    orders = convert_and_sort_star_history.rank_metrics(names, columns, list(columns))
+    for key, values in columns.items():
+        # The loop this replaced: name order first, then a stable sort on the value
+        by_name = sorted(range(len(names)), key=lambda i: names[i])
+        expected = sorted(by_name, key=lambda i: (values[i] is None, -values[i] if values[i] is not None else 0))
+        assert orders[key].tolist() == expected
+
+
+def test_rank_metrics_without_repos():
+    orders = convert_and_sort_star_history.rank_metrics([], {"pct_1d": []}, ["pct_1d"])
+    assert orders["pct_1d"].tolist() == []
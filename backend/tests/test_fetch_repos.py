@@ -0,0 +1,198 @@
+import re
+import json
+import threading
+import email.utils
+import http.server
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+import pytest
+import fetch_repos
+
+class FakeClock:
+    # Stands in for the time module inside fetch_repos so rate-limit waits take no real time
+    def __init__(self):
+        self.now = 1_700_000_000.0
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+def make_repos(count, start, days):
+    first = datetime.strptime(start, '%Y-%m-%d')
+    return [
+        {
+            "id": i,
+            "full_name": f"owner{i % 17}/repo-{i}",
+            "html_url": f"https://github.com/owner{i % 17}/repo-{i}",
+            "created_at": (first + timedelta(days=i % days)).strftime('%Y-%m-%dT12:00:00Z'),
+            "stargazers_count": 250 + i,
+            "pushed_at": "2025-01-01T00:00:00Z",
+            "forks_count": 1,
+            "topics": [],
+            "license": {"spdx_id": "MIT"},
+            "owner": {"type": "User"},
+        }
+        for i in range(count)
+    ]
+
+class SearchHandler(http.server.BaseHTTPRequestHandler):
+    # Mock of the search API: filters server.repos by the created:a..b qualifier and pages them
+    # 100 at a time up to GitHub's 1000-result cap. server.failures is a list of
+    # (status, headers) answered, in turn, before any real result.
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query)
+        server.requests.append((server.clock.now, query["q"][0], int(query["page"][0])))
+        if server.failures:
+            status, headers = server.failures.pop(0)
+            self.reply(status, {"message": "rate limited"}, headers(server.clock) if callable(headers) else headers)
+            return
+        start, end = re.search(r"created:(\S+)\.\.(\S+)", query["q"][0]).groups()
+        matches = [repo for repo in server.repos if start <= repo["created_at"][:10] <= end]
+        page = int(query["page"][0])
+        items = matches[:fetch_repos.RESULTS_CAP][(page - 1) * 100:page * 100]
+        self.reply(200, {"total_count": len(matches), "items": items}, {})
+
+    def reply(self, status, body, headers):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def search_api(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetch_repos, "time", clock)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SearchHandler)
+    server.clock = clock
+    server.repos = []
+    server.failures = []
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(fetch_repos, "GITHUB_API_URL", f"http://127.0.0.1:{server.server_port}/search/repositories")
+    server.cache = fetch_repos.SearchCache(str(tmp_path / "search_cache.json"))
+    yield server
+    server.shutdown()
+
+def search(server, date_range):
+    limiter = fetch_repos.RateLimiter(fetch_repos.SEARCH_RATE_PER_MINUTE)
+    return fetch_repos.search_repositories(date_range, fetch_repos.create_session(), limiter, server.cache)
+
+def test_retry_after_seconds():
+    assert fetch_repos.retry_after_seconds("7") == 7.0
+    assert fetch_repos.retry_after_seconds("") is None
+    assert fetch_repos.retry_after_seconds("soon") is None
+    assert fetch_repos.retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+@pytest.mark.parametrize("retry_after", [
+    lambda clock: "90",
+    lambda clock: email.utils.formatdate(clock.now + 90, usegmt=True),
+])
+def test_403_with_retry_after(search_api, retry_after):
+    search_api.repos = make_repos(30, "2024-01-01", 10)
+    search_api.failures = [(403, lambda clock: {"Retry-After": retry_after(clock)})]
+    repos = search(search_api, ("2024-01-01", "2024-01-10"))
+    assert len(repos) == 30
+    (failed_at, _, _), (retried_at, _, _) = search_api.requests
+    assert retried_at - failed_at >= 90
+
+def test_exhausted_rate_limit_waits_for_reset(search_api):
+    search_api.repos = make_repos(30, "2024-01-01", 10)
+    search_api.failures = [(403, lambda clock: {"X-RateLimit-Remaining": 0, "X-RateLimit-Reset": int(clock.now) + 300})]
+    repos = search(search_api, ("2024-01-01", "2024-01-10"))
+    assert len(repos) == 30
+    (failed_at, _, _), (retried_at, _, _) = search_api.requests
+    assert retried_at >= int(failed_at) + 300
+
+def test_range_over_result_cap_is_split(search_api):
+    # 2,500 repos over 100 days: no single query may return them all
+    search_api.repos = make_repos(2_500, "2024-01-01", 100)
+    repos = search(search_api, ("2024-01-01", "2024-04-09"))
+    assert sorted(repo["id"] for repo in repos) == list(range(2_500))
+    split_queries = {q for _, q, _ in search_api.requests}
+    assert len(split_queries) > 1
+
+
+def test_delta_rotates_older_windows():
+    ranges = [(f"2025-{m:02d}-01", f"2025-{m + 1:02d}-01") for m in range(1, 12)]
+    state = {}
+    last_queried = {}
+    for day in range(1, 4 * fetch_repos.DELTA_REFRESH_DAYS):
+        today = f"2026-01-{day:02d}"
+        query, carried = fetch_repos.plan_windows(ranges, state)
+        assert set(ranges[-fetch_repos.DELTA_RECENT_WINDOWS:]) <= set(query)
+        assert sorted(query + carried) == ranges
+        if day == 1:
+            assert carried == []  # nothing is known yet
+        else:
+            assert len(query) < len(ranges)
+        for r in query:
+            state[fetch_repos.window_key(r)] = today
+            last_queried[r] = day
+        assert all(day - last_queried[r] < fetch_repos.DELTA_REFRESH_DAYS for r in ranges)
+
+
+def test_carry_forward_keeps_rows_outside_queried_windows():
+    created = fetch_repos.INDEX_FIELDS.index("created_at")
+
+    def row(name, created_at):
+        values = [""] * len(fetch_repos.INDEX_FIELDS)
+        values[0], values[created] = name, created_at
+        return values
+
+    old_rows = [
+        row("a/old", "2025-01-15T10:00:00Z"),
+        row("b/boundary", "2025-02-01T00:00:00Z"),
+        row("c/queried", "2025-02-15T10:00:00Z"),
+    ]
+    carried = [("2025-01-01", "2025-02-01")]
+    queried = [("2025-02-01", "2025-03-01")]
+    assert [r[0] for r in fetch_repos.carry_forward(old_rows, carried, queried)] == ["a/old"]
+
+
+def test_search_cache_keeps_entries_of_carried_windows(tmp_path):
+    path = str(tmp_path / "search_cache.json")
+    cache = fetch_repos.SearchCache(path)
+    keys = {
+        window: f"stars:250..5000 forks:<=2000 created:{window[0]}..{window[1]} archived:false&page=1"
+        for window in [("2025-01-01", "2025-01-31"), ("2025-02-01", "2025-02-28"), ("2025-03-01", "2025-03-31")]
+    }
+    split = "stars:250..5000 forks:<=2000 created:2025-02-01..2025-02-14 archived:false&page=2"
+    for key in [*keys.values(), split]:
+        cache.put(key, f'"{key}"', {"total_count": 0, "items": []})
+    cache.get(keys[("2025-03-01", "2025-03-31")])
+    cache.save(carried=[("2025-02-01", "2025-02-28")])
+
+    saved = fetch_repos.SearchCache(path).entries
+    assert set(saved) == {keys[("2025-02-01", "2025-02-28")], split, keys[("2025-03-01", "2025-03-31")]}
+
+
+def test_unchanged_index_leaves_repo_filters_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = {
+        "repo_name": "a/one", "full_name": "a/one", "html_url": "https://github.com/a/one",
+        "created_at": "2025-01-15T10:00:00Z", "stargazers_count": 300, "pushed_at": "2025-06-01T00:00:00Z",
+        "forks_count": 3, "topics": [], "license": {"spdx_id": "MIT"}, "owner": {"type": "User"}, "id": 1,
+    }
+    monkeypatch.setattr(fetch_repos, "get_date_ranges", lambda: [("2025-01-01", "2025-01-31")])
+    monkeypatch.setattr(fetch_repos, "search_repositories", lambda *args: [dict(repo)])
+    fetch_repos.main()
+    filters = tmp_path / fetch_repos.FRONTEND_FILTERS_FILE
+    assert filters.read_text() == (tmp_path / fetch_repos.REPO_INDEX_FILE).read_text()
+
+    # convert_and_sort_star_history adds the upcoming column
+    with_upcoming = filters.read_text().replace("repo_id\n", "repo_id,upcoming\n", 1).replace(",1\n", ",1,false\n")
+    filters.write_text(with_upcoming)
+    for delta in (False, True):
+        fetch_repos.main(delta=delta)
+        assert filters.read_text() == with_upcoming
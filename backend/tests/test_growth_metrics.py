@@ -0,0 +1,142 @@
+import random
+import pytest
+from growth_metrics import compute_growth_metrics
+
+def reference_growth_metrics(values):
+    # The per-repo loop convert_and_sort_star_history.py used before compute_growth_metrics(),
+    # kept verbatim as the reference
+    pct_30d = raw_30d = pct_1d = raw_1d = pct_5d = raw_5d = None
+    max_5d_index = None
+    post_pct_5d = post_raw_5d = None
+
+    if len(values) >= 2:
+        for i in range(len(values)-1):
+            if values[i] is not None and values[i+1] is not None:
+                diff = values[i+1] - values[i]
+                pct = ((diff) / values[i]) * 100 if values[i] > 0 else None
+                if pct_1d is None or pct > pct_1d:
+                    pct_1d = pct
+                if raw_1d is None or diff > raw_1d:
+                    raw_1d = diff
+
+    if len(values) >= 6:
+        for i in range(len(values) - 5):
+            segment = values[i:i+6]
+            if None in segment:
+                continue
+            start, end = segment[0], segment[5]
+            diff = end - start
+            if start == 0:
+                continue
+            pct = (diff / start) * 100
+            if pct_5d is None or pct > pct_5d:
+                pct_5d = pct
+                max_5d_index = i
+            if raw_5d is None or diff > raw_5d:
+                raw_5d = diff
+
+    is_upcoming = False
+    if max_5d_index is not None and max_5d_index + 5 >= len(values) - 5:
+        is_upcoming = True
+
+    if max_5d_index is not None and max_5d_index + 6 < len(values):
+        post_start = values[max_5d_index + 6]
+        post_end = values[-1]
+        if post_start is not None and post_end is not None:
+            post_diff = post_end - post_start
+            if post_start > 0:
+                post_pct_5d = (post_diff / post_start) * 100
+            post_raw_5d = post_diff
+
+    if len(values) >= 30:
+        start_30d = values[-30]
+        end_30d = values[-1]
+        diff = end_30d - start_30d
+        if start_30d > 0:
+            pct_30d = (diff / start_30d) * 100
+        raw_30d = diff
+
+    return {
+        "pct_1d": pct_1d,
+        "raw_1d": raw_1d,
+        "pct_5d": pct_5d,
+        "raw_5d": raw_5d,
+        "pct_30d": pct_30d,
+        "raw_30d": raw_30d,
+        "post_pct_5d": post_pct_5d,
+        "post_raw_5d": post_raw_5d,
+        "upcoming": is_upcoming,
+    }
+
+def known_values(cumulative):
+    # What convert_and_sort_star_history.py passes on: NA days are dropped from the series
+    return [value for value in cumulative if value is not None]
+
+def assert_matches_reference(histories):
+    series = [known_values(cumulative) for cumulative in histories]
+    metrics = compute_growth_metrics(series)
+    for i, values in enumerate(series):
+        expected = reference_growth_metrics(values)
+        for key, value in expected.items():
+            actual = metrics[key][i]
+            if value is None:
+                assert actual is None, (key, values)
+            else:
+                assert actual == pytest.approx(value), (key, values)
+
+def test_na_days_are_skipped():
+    assert_matches_reference([
+        [None, 10, 12, None, 15, 15, 20, 30, None, 31],
+        [None, None, None],
+        [5, None, None, None, None, None, None, 9],
+    ])
+
+def test_short_histories():
+    # Fewer than 2, 6 and 30 known values switch off 1d, 5d and 30d metrics in turn
+    short = [[], [7], [7, 9], [1, 2, 3, 4, 5]]
+    # On their own, too: a batch with no 5-day window at all
+    assert_matches_reference(short)
+    histories = short + [[1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 6, 7]]
+    histories += [list(range(100, 100 + length)) for length in (29, 30, 31, 45)]
+    assert_matches_reference(histories)
+
+def test_zero_and_negative_starts():
+    # Cumulative counts rebuilt from deltas can start at or below zero for young repos
+    assert_matches_reference([
+        [0, 0, 0, 0, 0, 0, 3, 8],
+        [-4, -2, 0, 1, 5, 9, 9, 12],
+        [-3, -3, -3, -3, -3, -3, -1],
+        [0] * 30 + [2, 4],
+        [-1] * 10 + list(range(0, 25)),
+    ])
+
+def test_zero_start_after_growth_is_skipped():
+    # The loop raised TypeError comparing None with a float here; non-positive starts are skipped
+    metrics = compute_growth_metrics([[5, 0, 4, 6]])
+    assert metrics["pct_1d"] == [50.0]
+    assert metrics["raw_1d"] == [4]
+
+def test_peak_ties_keep_the_first_window():
+    # Equal 5-day percentages: the earliest window decides upcoming and post-peak growth
+    assert_matches_reference([
+        [10, 10, 10, 10, 10, 20] * 4,
+        [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 12, 12, 12, 12, 12, 12],
+        [4, 4, 4, 4, 4, 8, 8, 8, 8, 8, 16, 16, 16, 16, 16, 16, 16],
+    ])
+
+def test_random_histories():
+    rng = random.Random(0)
+    histories = []
+    for _ in range(500):
+        length = rng.randrange(0, 45)
+        value = rng.choice([-20, -3, 0, 0, 1, 50, 10_000])
+        cumulative = []
+        for _ in range(length):
+            if rng.random() < 0.1:
+                cumulative.append(None)
+                continue
+            # Small steps with many zeros, so windows often tie
+            value += rng.choice([0, 0, 0, 1, 2, 5, 40])
+            cumulative.append(value)
+        histories.append(cumulative)
+    assert_matches_reference(histories)
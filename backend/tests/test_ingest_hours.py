@@ -0,0 +1,102 @@
+import threading
+import http.server
+import pytest
+import synthetic_data
+import update_star_history
+from benchmark import legacy_process_archive
+from repo_table import RepoTable
+
+DAY = "2025-01-31"
+REPOS = synthetic_data.repo_names(50)
+
+class ArchiveHandler(http.server.BaseHTTPRequestHandler):
+    # Serves server.responses[path], a list of bodies handed out in turn (the last one repeats);
+    # unknown paths 404 like an hour GH Archive has not published
+    def do_GET(self):
+        bodies = self.server.responses.get(self.path)
+        if not bodies:
+            self.send_error(404)
+            return
+        body = bodies.pop(0) if len(bodies) > 1 else bodies[0]
+        self.server.requests.append(self.path)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def archive_server(tmp_path, monkeypatch):
+    # Relative cache/ and spool paths land in tmp_path; retries don't wait
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(update_star_history.time, "sleep", lambda seconds: None)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    server.responses = {}
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(update_star_history, "GITHUB_ARCHIVE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield server
+    server.shutdown()
+
+def hour_archive(hour, members=1):
+    return synthetic_data.archive_hour(events=400, watch_ratio=0.3, repos=REPOS, seed=hour, payload_bytes=50, members=members)
+
+def ingest(hours, spool_dir="spool"):
+    table = RepoTable.create(REPOS)
+    try:
+        results = {
+            (day, hour): counts
+            for day, hour, counts in update_star_history.ingest_hours(hours, table, cpu_workers=2, spool_dir=spool_dir)
+        }
+        return results, table.repo_names()
+    finally:
+        table.close(unlink=True)
+
+def as_dict(counts, names):
+    return {name: int(count) for name, count in zip(names, counts) if count}
+
+def test_corrupt_download_is_fetched_again(archive_server):
+    archive = hour_archive(0)
+    # The first transfer is cut short, the second is whole
+    archive_server.responses[f"/{DAY}-0.json.gz"] = [archive[:len(archive) // 2], archive]
+    results, names = ingest([(DAY, 0)])
+    assert as_dict(results[(DAY, 0)], names) == legacy_process_archive(archive)
+    assert len(archive_server.requests) == 2
+
+def test_multi_member_truncated_and_missing_hours(archive_server, tmp_path):
+    whole = hour_archive(0, members=4)
+    truncated = hour_archive(1)
+    archive_server.responses[f"/{DAY}-0.json.gz"] = [whole]
+    archive_server.responses[f"/{DAY}-1.json.gz"] = [truncated[:-20]]
+    # Hour 2 is not served at all
+    results, names = ingest([(DAY, 0), (DAY, 1), (DAY, 2)])
+
+    assert as_dict(results[(DAY, 0)], names) == legacy_process_archive(whole)
+    assert results[(DAY, 1)] is None
+    assert results[(DAY, 2)] is None
+    # The truncated hour was downloaded once plus ARCHIVE_RETRIES more times
+    assert archive_server.requests.count(f"/{DAY}-1.json.gz") == update_star_history.ARCHIVE_RETRIES + 1
+    assert list((tmp_path / "spool").iterdir()) == []
+
+def test_parsed_hours_are_served_from_the_cache(archive_server):
+    archive = hour_archive(3, members=2)
+    archive_server.responses[f"/{DAY}-3.json.gz"] = [archive]
+    first, names = ingest([(DAY, 3)])
+    second, _ = ingest([(DAY, 3)])
+    assert as_dict(second[(DAY, 3)], names) == as_dict(first[(DAY, 3)], names) == legacy_process_archive(archive)
+    assert archive_server.requests == [f"/{DAY}-3.json.gz"]
+
+def test_cleared_cache_hours_are_downloaded_again(archive_server):
+    # What main(full_rebuild=True) relies on to repair a bad cached hour
+    stale, fresh = hour_archive(4), hour_archive(5)
+    archive_server.responses[f"/{DAY}-4.json.gz"] = [stale, fresh]
+    first, names = ingest([(DAY, 4)])
+    cached, _ = ingest([(DAY, 4)])
+    assert as_dict(cached[(DAY, 4)], names) == as_dict(first[(DAY, 4)], names) == legacy_process_archive(stale)
+
+    update_star_history.hour_cache.clear()
+    rebuilt, _ = ingest([(DAY, 4)])
+    assert as_dict(rebuilt[(DAY, 4)], names) == legacy_process_archive(fresh)
+    assert len(archive_server.requests) == 2
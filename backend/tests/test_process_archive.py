@@ -0,0 +1,87 @@
+import gzip
+import pytest
+import synthetic_data
+from benchmark import legacy_process_archive
+from update_star_history import iter_archive_blocks, process_archive
+
+ACTOR = '{"id":1,"login":"octo","display_login":"octo","gravatar_id":"","url":"https://api.github.com/users/octo","avatar_url":"https://avatars.githubusercontent.com/u/1?"}'
+
+def event(event_id, event_type, repo, payload='{"action":"started"}', org=""):
+    # One line in GH Archive's own layout
+    return (
+        f'{{"id":"{event_id}","type":"{event_type}","actor":{ACTOR},'
+        f'"repo":{{"id":{event_id},"name":"{repo}","url":"https://api.github.com/repos/{repo}"}},'
+        f'"payload":{payload},"public":true,"created_at":"2025-01-31T00:00:00Z"{org}}}'
+    )
+
+# Recorded-style fixture: ordinary events plus every layout the fast path must hand to orjson
+FIXTURE_LINES = [
+    event(1, "WatchEvent", "torvalds/linux"),
+    event(2, "WatchEvent", "torvalds/linux", org=',"org":{"id":7,"login":"linux"}'),
+    event(3, "PushEvent", "torvalds/linux", payload='{"push_id":3,"size":1}'),
+    event(4, "WatchEvent", "a-b_c.d/e.f-g_h"),
+    # Reordered keys
+    '{"type":"WatchEvent","id":"5","repo":{"name":"rust-lang/rust","id":5},"actor":{"id":2},"payload":{}}',
+    '{"id":"6","type":"WatchEvent","repo":{"name":"rust-lang/rust","id":6},"actor":{"id":2},"payload":{}}',
+    # Escaped names
+    event(7, "WatchEvent", "owner\\/escaped"),
+    event(8, "WatchEvent", "own\\u0065r/unicode-escape"),
+    # Malformed or incomplete lines carrying the marker
+    '{"id":"9","type":"WatchEvent","actor":{"id":1},"repo":{"id":9,"name":"broken/json"',
+    '{"id":"10","type":"WatchEvent","actor":{"id":1},"repo":null,"payload":{}}',
+    '{"id":"11","type":"WatchEvent","actor":{"id":1},"payload":{}}',
+    'not json at all "type":"WatchEvent"',
+    # The marker inside the payload, of another event and of a WatchEvent
+    event(12, "IssuesEvent", "nested/marker", payload='{"issue":{"type":"WatchEvent"}}'),
+    event(13, "WatchEvent", "double/marker", payload='{"action":"started","type":"WatchEvent"}'),
+    event(14, "WatchEvent", "torvalds/linux"),
+    "",
+]
+
+def new_counts(payload, chunk_size):
+    chunks = (payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size))
+    return process_archive(iter_archive_blocks(chunks))
+
+def gzip_members(text, members=1):
+    data = text.encode('utf-8')
+    step = -(-len(data) // members)
+    return b"".join(gzip.compress(data[i:i + step]) for i in range(0, len(data), step))
+
+CHUNK_SIZES = [1, 7, 100, 4096, 1 << 20]
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_fixture_matches_legacy(chunk_size):
+    payload = gzip_members("\n".join(FIXTURE_LINES) + "\n")
+    expected = legacy_process_archive(payload)
+    assert expected["torvalds/linux"] == 3
+    # The fallback cases are really in there
+    assert expected["owner/escaped"] == expected["owner/unicode-escape"] == 1
+    assert expected["rust-lang/rust"] == 2
+    assert new_counts(payload, chunk_size) == expected
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_crlf_line_endings(chunk_size):
+    payload = gzip_members("\r\n".join(FIXTURE_LINES) + "\r\n")
+    assert new_counts(payload, chunk_size) == legacy_process_archive(payload)
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_multi_member_gzip(chunk_size):
+    # Members split at arbitrary bytes, so lines straddle member boundaries too
+    payload = gzip_members("\n".join(FIXTURE_LINES) + "\n", members=5)
+    assert new_counts(payload, chunk_size) == legacy_process_archive(payload)
+
+def test_last_line_without_newline():
+    payload = gzip_members("\n".join(FIXTURE_LINES[:3]))
+    assert new_counts(payload, 64) == legacy_process_archive(payload) == {"torvalds/linux": 2}
+
+def test_line_split_across_chunks():
+    line = event(1, "WatchEvent", "split/across-chunks") + "\n"
+    payload = gzip_members(line * 3)
+    # Cut inside the compressed stream at every position of a small payload
+    for cut in range(1, len(payload)):
+        chunks = iter([payload[:cut], payload[cut:]])
+        assert process_archive(iter_archive_blocks(chunks)) == {"split/across-chunks": 3}
+
+def test_synthetic_hour_matches_legacy():
+    payload = synthetic_data.archive_hour(events=5_000, watch_ratio=0.2, repos=synthetic_data.repo_names(200), members=3)
+    assert new_counts(payload, 64 * 1024) == legacy_process_archive(payload)
@@ -0,0 +1,215 @@
+import random
+import threading
+import http.client
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlencode
+import orjson
+import pytest
+import frontend_bundle
+import query_server
+
+FIELDNAMES = ["repo_name", "html_url", "created_at", "stargazers_count", "pushed_at", "forks_count",
+              "topics", "license_spdx", "owner_type", "repo_id", "upcoming"]
+TOPICS = ["python", "rust", "cli", "machine-learning", "Web"]
+LICENSES = ["MIT", "Apache-2.0", "GPL-3.0", "AGPL-3.0", "BSD-3-Clause", "NOASSERTION", ""]
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp() + rng.randrange(400) * 86400 + rng.randrange(86400)
+        pushed = created + rng.randrange(200) * 86400
+        rows.append({
+            "repo_name": f"owner{i % 7}/repo{i}",
+            "html_url": f"https://github.com/owner{i % 7}/repo{i}",
+            # A few blank dates, which the dashboard treats differently for created and pushed
+            "created_at": "" if i % 23 == 5 else datetime.fromtimestamp(created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "stargazers_count": str(rng.randrange(200, 6000)),
+            "pushed_at": "" if i % 29 == 7 else datetime.fromtimestamp(pushed, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "forks_count": str(rng.randrange(0, 2500)),
+            "topics": "|".join(rng.sample(TOPICS, rng.randrange(3))),
+            "license_spdx": rng.choice(LICENSES),
+            "owner_type": rng.choice(["User", "Organization", ""]),
+            "repo_id": str(i),
+            "upcoming": rng.choice(["true", "false"]),
+        })
+    return rows
+
+def publish(rows, seed):
+    rng = random.Random(seed)
+    values = [None if rng.random() < 0.1 else round(rng.uniform(-5, 300), 2) for _ in rows]
+    ranked = sorted(range(len(rows)), key=lambda i: (values[i] is None, -(values[i] or 0)))
+    rankings = {"sorted_pct_1d": ("pct_1d_growth", [(i, values[i]) for i in ranked])}
+    histories = [[("2025-01-01", 10 + i), ("2025-01-02", None), ("2025-01-03", 12 + i)] for i in range(len(rows))]
+    return frontend_bundle.write_bundle(frontend_bundle.build_bundle(rows, FIELDNAMES, rankings, histories))
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(query_server, "RELOAD_CHECK_SECONDS", 0)
+    rows = make_rows(120, seed=1)
+    publish(rows, seed=1)
+    service = query_server.QueryService(frontend_bundle.BUNDLE_POINTER)
+    handler = type("TestQueryHandler", (query_server.QueryHandler,), {"service": service})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.rows = rows
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(server, path, params=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    connection.request("GET", path + (f"?{urlencode(params, doseq=True)}" if params else ""), headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response.status, response.getheader("ETag"), orjson.loads(body) if body else None
+
+def js_date(value):
+    # new Date(value) for the ISO strings the dashboard handles; None stands for Invalid Date
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if "T" in value else datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+def apply_filters(bundle, filters):
+    # Port of the dashboard's applyFilters (filterUtils.ts) with a FilterLookup from the bundle
+    indexes, repos = bundle["indexes"], bundle["repos"]
+
+    def union(index, keys):
+        return {repo_id for key in keys for repo_id in index.get(key, [])}
+
+    allowed = None
+    for name, keys in (("license", filters["licenses"]), ("owner_type", filters["ownership"]),
+                       ("topics", [topic.lower() for topic in filters["includeTopics"]])):
+        if keys:
+            ids = union(indexes[name], keys)
+            allowed = ids if allowed is None else allowed & ids
+    excluded = union(indexes["topics"], [topic.lower() for topic in filters["excludeTopics"]])
+
+    def before(a, b):
+        # Comparisons with an Invalid Date are false
+        return a is not None and b is not None and a < b
+
+    result = []
+    for repo_id, name in enumerate(repos["repo_name"]):
+        stars, forks = repos["stargazers_count"][repo_id], repos["forks_count"][repo_id]
+        if stars < filters["stars"][0] or stars > filters["stars"][1]:
+            continue
+        if forks < filters["forks"][0] or forks > filters["forks"][1]:
+            continue
+        created, pushed = js_date(repos["created_at"][repo_id]), js_date(repos["pushed_at"][repo_id])
+        if pushed is None:
+            continue
+        if before(pushed, js_date(filters["lastPush"][0])) or before(js_date(filters["lastPush"][1]), pushed):
+            continue
+        if before(created, js_date(filters["dateCreated"][0])) or before(js_date(filters["dateCreated"][1]), created):
+            continue
+        if allowed is not None and repo_id not in allowed:
+            continue
+        if repo_id in excluded:
+            continue
+        if filters["upcoming"] is not None and repos["upcoming"][repo_id] != filters["upcoming"]:
+            continue
+        result.append(name)
+    return set(result)
+
+def as_query(filters):
+    params = {
+        "metric": "sorted_pct_1d", "limit": query_server.MAX_PAGE_SIZE,
+        "min_stars": filters["stars"][0], "max_stars": filters["stars"][1],
+        "min_forks": filters["forks"][0], "max_forks": filters["forks"][1],
+        "created_from": filters["dateCreated"][0], "created_to": filters["dateCreated"][1],
+        "pushed_from": filters["lastPush"][0], "pushed_to": filters["lastPush"][1],
+        "topic": filters["includeTopics"], "exclude_topic": filters["excludeTopics"],
+        "license": filters["licenses"], "owner_type": filters["ownership"],
+    }
+    if filters["upcoming"] is not None:
+        params["upcoming"] = str(filters["upcoming"]).lower()
+    return params
+
+def load_bundle():
+    with open(frontend_bundle.BUNDLE_POINTER, 'rb') as f:
+        name = orjson.loads(f.read())["file"]
+    with open(f"{frontend_bundle.BUNDLE_DIR}/{name}", 'rb') as f:
+        return orjson.loads(f.read())
+
+def test_pages_cover_the_ranking_with_global_ranks(api):
+    status, _, full = get(api, "/api/repos", {"metric": "sorted_pct_1d", "limit": 500})
+    assert status == 200 and full["total"] == 120
+    assert [item["rank"] for item in full["items"]] == list(range(1, 121))
+
+    pages = []
+    for offset in range(0, 120, 25):
+        _, _, page = get(api, "/api/repos", {"metric": "sorted_pct_1d", "offset": offset, "limit": 25})
+        assert page["offset"] == offset and page["total"] == 120
+        pages.extend(page["items"])
+    assert pages == full["items"]
+
+    # Filtered pages keep each repo's rank in the full ranking
+    _, _, filtered = get(api, "/api/repos", {"metric": "sorted_pct_1d", "owner_type": "Organization", "limit": 500})
+    by_name = {item["repo_name"]: item["rank"] for item in full["items"]}
+    assert filtered["items"] and all(item["rank"] == by_name[item["repo_name"]] for item in filtered["items"])
+    assert [item["rank"] for item in filtered["items"]] == sorted(item["rank"] for item in filtered["items"])
+
+    assert get(api, "/api/repos", {"metric": "sorted_pct_1d", "limit": 0})[0] == 400
+    assert get(api, "/api/repos", {"metric": "sorted_nope"})[0] == 404
+
+@pytest.mark.parametrize("seed", range(12))
+def test_filters_match_the_dashboard(api, seed):
+    rng = random.Random(seed)
+    low_stars = rng.randrange(200, 3000)
+    filters = {
+        "stars": [low_stars, rng.randrange(low_stars, 6000)],
+        "forks": [rng.choice([0, 100]), rng.choice([2000, 1500])],
+        "dateCreated": [rng.choice(["2024-01-01", "2024-03-15"]), rng.choice(["2025-02-04", "2024-12-31T12:00:00Z"])],
+        "lastPush": [rng.choice(["2024-01-01", "2024-06-01"]), rng.choice(["2026-01-01", "2025-03-01"])],
+        "includeTopics": rng.sample(TOPICS + ["web"], rng.randrange(3)),
+        "excludeTopics": rng.sample(TOPICS, rng.randrange(2)),
+        "licenses": rng.sample(["MIT", "Apache-2.0", "GPL-3.0", "AGPL-3.0", "No License", "Other"], rng.randrange(1, 7)),
+        "ownership": rng.sample(["User", "Organization"], rng.randrange(1, 3)),
+        "upcoming": rng.choice([None, True, False]),
+    }
+    status, _, page = get(api, "/api/repos", as_query(filters))
+    assert status == 200
+    assert {item["repo_name"] for item in page["items"]} == apply_filters(load_bundle(), filters)
+
+def test_blank_dates_filter_like_the_dashboard(api):
+    # Only the repo filters matter here: blank created_at passes the created range, blank pushed_at never passes
+    filters = {
+        "stars": [0, 10000], "forks": [0, 5000], "dateCreated": ["2024-01-01", "2026-01-01"],
+        "lastPush": ["2020-01-01", "2030-01-01"], "includeTopics": [], "excludeTopics": [],
+        "licenses": [], "ownership": [], "upcoming": None,
+    }
+    _, _, page = get(api, "/api/repos", as_query(filters))
+    names = {item["repo_name"] for item in page["items"]}
+    assert names == apply_filters(load_bundle(), filters)
+    assert "owner5/repo5" in names and "owner0/repo7" not in names
+
+def test_matching_etag_gets_304(api):
+    params = {"metric": "sorted_pct_1d", "limit": 10}
+    status, etag, body = get(api, "/api/repos", params)
+    assert status == 200 and etag and body["items"]
+    assert get(api, "/api/repos", params, {"If-None-Match": etag})[:2] == (304, etag)
+    assert get(api, "/api/repos", params, {"If-None-Match": f'"other", {etag}'})[0] == 304
+    assert get(api, "/api/repos", params, {"If-None-Match": '"other"'})[0] == 200
+
+def test_new_bundle_is_picked_up_as_a_whole(api):
+    params = {"metric": "sorted_pct_1d", "limit": 500}
+    _, old_etag, old = get(api, "/api/repos", params)
+    _, _, old_health = get(api, "/api/health")
+
+    rows = make_rows(80, seed=2)
+    new_file = publish(rows, seed=2)
+    status, new_etag, new = get(api, "/api/repos", params, {"If-None-Match": old_etag})
+    assert status == 200 and new_etag != old_etag
+    assert new["total"] == 80 and new != old
+    _, _, health = get(api, "/api/health")
+    assert health == {"bundle": new_file, "repositories": 80, "metrics": 1} != old_health
+
+    # Every response now comes from the new bundle, cached ones included
+    _, _, history = get(api, "/api/repos/owner1/repo1/history")
+    assert history["html_url"] == rows[1]["html_url"]
+    assert [point["stars"] for point in history["history"]] == [11, 13]
+    assert get(api, "/api/repos/owner1/repo100/history")[0] == 404
@@ -0,0 +1,104 @@
+import pytest
+from repo_registry import RepoRegistry
+
+
+def write_history(directory, filename, text):
+    (directory / filename).write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def history_dir(tmp_path):
+    directory = tmp_path / "star_history"
+    directory.mkdir()
+    return directory
+
+
+def test_new_repos_get_slots_and_legacy_file_names(history_dir):
+    registry = RepoRegistry()
+    assert registry.sync({"octo/cat": 1, "rust-lang/rust": 2}, str(history_dir)) == {}
+    assert registry.file("octo/cat") == "octo_cat.csv"
+    assert registry.file("rust-lang/rust") == "rust-lang_rust.csv"
+    assert sorted(entry["slot"] for entry in registry.slots.values()) == [0, 1]
+
+
+def test_rename_keeps_the_slot_and_moves_the_history_file(history_dir):
+    registry = RepoRegistry()
+    registry.sync({"octo/cat": 1}, str(history_dir))
+    slot = registry.by_name["octo/cat"]["slot"]
+    write_history(history_dir, "octo_cat.csv", "2025-01-01,3\n")
+
+    assert registry.sync({"octo/kitten": 1}, str(history_dir)) == {"octo/cat": "octo/kitten"}
+    assert "octo/cat" not in registry
+    assert registry.by_name["octo/kitten"]["slot"] == slot
+    assert registry.file("octo/kitten") == "octo_kitten.csv"
+    assert [path.name for path in history_dir.iterdir()] == ["octo_kitten.csv"]
+    assert (history_dir / "octo_kitten.csv").read_text() == "2025-01-01,3\n"
+
+
+def test_transfer_to_another_owner_follows_the_id(history_dir):
+    registry = RepoRegistry()
+    registry.sync({"alice/tool": 7}, str(history_dir))
+    write_history(history_dir, "alice_tool.csv", "2025-01-01,1\n")
+
+    assert registry.sync({"acme/tool": 7}, str(history_dir)) == {"alice/tool": "acme/tool"}
+    assert registry.by_id[7]["name"] == "acme/tool"
+    assert (history_dir / "acme_tool.csv").exists()
+    assert not (history_dir / "alice_tool.csv").exists()
+
+
+def test_underscore_owners_do_not_share_a_file(history_dir):
+    registry = RepoRegistry()
+    registry.sync({"a_b/c": 1, "a/b_c": 2}, str(history_dir))
+    first, second = registry.by_name["a_b/c"], registry.by_name["a/b_c"]
+    assert first["file"] == "a_b_c.csv"
+    assert second["file"] == f"a_b_c~{second['slot']}.csv"
+
+
+def test_rename_onto_a_taken_file_name_is_suffixed(history_dir):
+    registry = RepoRegistry()
+    registry.sync({"a_b/c": 1, "x/y": 2}, str(history_dir))
+    write_history(history_dir, "a_b_c.csv", "2025-01-01,1\n")
+    write_history(history_dir, "x_y.csv", "2025-01-01,2\n")
+
+    assert registry.sync({"a_b/c": 1, "a/b_c": 2}, str(history_dir)) == {"x/y": "a/b_c"}
+    slot = registry.by_name["a/b_c"]["slot"]
+    assert registry.file("a/b_c") == f"a_b_c~{slot}.csv"
+    assert (history_dir / f"a_b_c~{slot}.csv").read_text() == "2025-01-01,2\n"
+    assert (history_dir / "a_b_c.csv").read_text() == "2025-01-01,1\n"
+
+
+def test_rename_onto_an_existing_name_is_not_applied(history_dir):
+    registry = RepoRegistry()
+    registry.sync({"octo/cat": 1, "octo/dog": None}, str(history_dir))
+    # The id now appears under a name registered separately before its id was known
+    assert registry.sync({"octo/dog": 1}, str(history_dir)) == {}
+    assert registry.by_id[1]["name"] == "octo/dog"
+    assert registry.by_name["octo/cat"]["id"] is None
+    assert registry.prune({"octo/dog"}, str(history_dir)) == ["octo/cat"]
+
+
+def test_bootstrap_matches_files_to_known_names(history_dir):
+    for filename in ("a_b_c.csv", "octo_cat.csv", "gone_repo.csv"):
+        write_history(history_dir, filename, "2025-01-01,1\n")
+    registry = RepoRegistry.bootstrap(["a_b/c", "octo/cat"], str(history_dir))
+
+    assert registry.file("a_b/c") == "a_b_c.csv"
+    assert registry.file("octo/cat") == "octo_cat.csv"
+    assert registry.files["gone_repo.csv"]["name"] is None
+    # The unmatched file belongs to no indexed repo and goes on the next prune
+    assert registry.prune({"a_b/c", "octo/cat"}, str(history_dir)) == ["gone_repo.csv"]
+    assert sorted(path.name for path in history_dir.iterdir()) == ["a_b_c.csv", "octo_cat.csv"]
+
+
+def test_save_and_load_keep_slots(history_dir):
+    registry = RepoRegistry()
+    registry.sync({"a_b/c": 1, "a/b_c": 2}, str(history_dir))
+    registry.prune({"a/b_c"}, str(history_dir))
+    path = str(history_dir / "registry.json")
+    registry.save(path)
+
+    loaded = RepoRegistry.load(path)
+    assert loaded.slots == registry.slots
+    # Slots are never reused, even after a prune
+    loaded.sync({"new/repo": 3}, str(history_dir))
+    assert loaded.by_name["new/repo"]["slot"] == 2
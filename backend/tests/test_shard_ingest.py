@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pytest
+import shard_ingest
+import synthetic_data
+import update_star_history
+from repo_table import RepoTable
+from star_store import StarStore
+
+REPOS = synthetic_data.repo_names(40)
+SHARDS = 3
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    # Two days of archives inside the history window, served like GH Archive; relative
+    # cache/, star_history/ and logs/ paths land in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(update_star_history.time, "sleep", lambda seconds: None)
+    days = update_star_history.history_window()[-3:-1]
+    synthetic_data.write_archive_fixtures("fixtures", days, REPOS, events=300, watch_ratio=0.3)
+    server = shard_ingest.serve_fixtures("fixtures")
+    monkeypatch.setattr(update_star_history, "GITHUB_ARCHIVE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield days
+    server.shutdown()
+
+def run_workers(days, shards=range(SHARDS)):
+    for shard in shards:
+        shard_ingest.run_worker(days[0], days[-1], shard, SHARDS, REPOS, "shards", cpu_workers=1)
+
+def merge():
+    return shard_ingest.merge_shards("shards", repo_ids={repo: None for repo in REPOS})
+
+def single_process_counts(days):
+    # What the daily update's ingest_hours reads from the same archives, summed per day
+    table = RepoTable.create(REPOS)
+    totals = {day: np.zeros(len(REPOS), dtype=np.int64) for day in days}
+    try:
+        units = [(day, hour) for day in days for hour in update_star_history.HOURS_PER_DAY]
+        for day, hour, counts in update_star_history.ingest_hours(units, table, cpu_workers=1, spool_dir="spool"):
+            if counts is not None:
+                totals[day] += counts
+        names = table.repo_names()
+    finally:
+        table.close(unlink=True)
+    update_star_history.hour_cache.clear()
+    return {day: dict(zip(names, values.tolist())) for day, values in totals.items()}
+
+def store_counts(days):
+    store = StarStore.load()
+    return {day: {repo: int(store.counts[store.repo_index[repo], store.days.index(day)]) for repo in REPOS} for day in days}
+
+def test_merged_shards_match_single_process_ingestion(fixtures):
+    expected = single_process_counts(fixtures)
+    run_workers(fixtures)
+    report = merge()
+    assert report["merged_hours"] == 48
+    assert report["missing_hours"] == {} and report["missing_shards"] == {}
+    assert store_counts(fixtures) == expected
+
+def test_merging_again_is_a_no_op(fixtures):
+    run_workers(fixtures)
+    merge()
+    digest = StarStore.load().digest()
+    report = merge()
+    assert report["merged_hours"] == 0
+    assert report["duplicate_hours"] == 48
+    assert StarStore.load().digest() == digest
+    assert os.path.exists(shard_ingest.MERGE_REPORT_FILE)
+
+def test_dropped_shard_and_hour_are_reported_missing(fixtures):
+    day = fixtures[0]
+    os.remove(os.path.join("fixtures", f"{day}-5.json.gz"))
+    # Shard 1 never ran
+    run_workers(fixtures, shards=[0, 2])
+    report = merge()
+
+    dropped = shard_ingest.shard_units(fixtures[0], fixtures[-1], 1, SHARDS)
+    expected = {}
+    for missing_day, hour in sorted(dropped + [(day, 5)]):
+        expected.setdefault(missing_day, []).append(hour)
+    assert report["missing_shards"] == {f"{fixtures[0]}..{fixtures[-1]}/{SHARDS}": [1]}
+    assert report["failed_hours"] == [f"{day}-5"]
+    assert report["missing_hours"] == {d: sorted(hours) for d, hours in expected.items()}
+
+    # The late shard fills its hours in; the deleted archive stays missing
+    run_workers(fixtures, shards=[1])
+    report = merge()
+    assert report["merged_hours"] == len(dropped)
+    assert report["missing_hours"] == {day: [5]}
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pytest
+import shard_ingest
+import synthetic_data
+import update_journal
+import update_star_history
+from benchmark import legacy_process_archive
+from star_store import StarStore
+
+REPOS = synthetic_data.repo_names(30)
+
+class Crash(Exception):
+    pass
+
+@pytest.fixture
+def archives(tmp_path, monkeypatch):
+    # A three-day window of fixture archives served like GH Archive, with relative paths in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(update_star_history, "DAYS_HISTORY", 3)
+    monkeypatch.setattr(update_star_history.time, "sleep", lambda seconds: None)
+    days = update_star_history.history_window()
+    synthetic_data.write_archive_fixtures("fixtures", days, REPOS, events=150, watch_ratio=0.3)
+    expected = {day: {repo: 0 for repo in REPOS} for day in days}
+    for day in days:
+        for hour in update_star_history.HOURS_PER_DAY:
+            with open(os.path.join("fixtures", f"{day}-{hour}.json.gz"), 'rb') as f:
+                for repo, count in legacy_process_archive(f.read()).items():
+                    expected[day][repo] += count
+    server = shard_ingest.serve_fixtures("fixtures")
+    monkeypatch.setattr(update_star_history, "GITHUB_ARCHIVE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield days, expected
+    server.shutdown()
+
+def run_update():
+    return update_star_history.main(repo_ids={repo: None for repo in REPOS})
+
+def day_counts(store, day):
+    return {repo: int(store.counts[store.repo_index[repo], store.days.index(day)]) for repo in REPOS}
+
+def test_interrupted_run_is_replayed_from_the_journal(archives, monkeypatch):
+    days, expected = archives
+    # The run dies after ingesting every day but before the store reaches disk
+    with monkeypatch.context() as patch:
+        def crash(*args):
+            raise Crash()
+        patch.setattr(update_star_history, "write_batch_updates", crash)
+        with pytest.raises(Crash):
+            run_update()
+    assert not os.path.exists(update_star_history.STORE_FILE)
+    assert sorted(f for f in os.listdir(update_journal.JOURNAL_DIR) if f.endswith(".npz")) == [f"{day}.npz" for day in days]
+
+    # Only the day whose journal entry is lost may be fetched again
+    os.remove(os.path.join(update_journal.JOURNAL_DIR, f"{days[1]}.npz"))
+    update_star_history.hour_cache.clear()
+    for filename in os.listdir("fixtures"):
+        if not filename.startswith(days[1]):
+            os.remove(os.path.join("fixtures", filename))
+
+    store = run_update()
+    assert {day: day_counts(store, day) for day in days} == expected
+    assert update_star_history.load_manifest()["days"] == {day: "complete" for day in days}
+    assert not os.path.exists(update_journal.JOURNAL_DIR)
+
+def test_journal_of_another_repository_set_is_discarded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert update_journal.begin(["a/one", "b/two"]) == {}
+    update_journal.record("2025-01-01", "complete", np.array([3, 4], dtype=np.int32))
+    replayed = update_journal.begin(["a/one", "b/two"])
+    assert list(replayed) == ["2025-01-01"]
+    assert replayed["2025-01-01"][0] == "complete"
+    assert replayed["2025-01-01"][1].tolist() == [3, 4]
+
+    assert update_journal.begin(["a/one", "c/three"]) == {}
+    assert os.listdir(update_journal.JOURNAL_DIR) == ["run.json"]
+
+def test_journalled_days_outside_the_window_are_not_replayed():
+    store = StarStore()
+    store.add_repos(["a/one", "b/two"])
+    rows = np.arange(2)
+    journalled = {
+        "2025-01-01": ("complete", np.array([1, 2], dtype=np.int32)),
+        "2025-01-05": ("partial", np.array([5, 6], dtype=np.int32)),
+    }
+    replayed = update_star_history.replay_journal(journalled, ["2025-01-04", "2025-01-05"], store, rows)
+    assert replayed == {"2025-01-05": "partial"}
+    assert store.days == ["2025-01-05"]
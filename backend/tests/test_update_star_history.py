@@ -0,0 +1,29 @@
+import os
+import numpy as np
+import update_star_history
+from repo_registry import RepoRegistry
+from star_store import StarStore
+
+REPOS = {"a_b/c": 1, "octo/cat": 2}
+
+def saved_store(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.chdir(tmp_path)
+    registry = RepoRegistry()
+    registry.sync(REPOS)
+    store = StarStore()
+    store.add_repos(REPOS)
+    day = update_star_history.history_window()[-1]
+    store.set_day_values(day, np.arange(len(REPOS)), np.array([3, 4], dtype=np.int32))
+    update_star_history.write_batch_updates(store, set(REPOS), registry, **kwargs)
+    return registry, day
+
+def test_history_csvs_are_not_written_by_default(tmp_path, monkeypatch):
+    saved_store(tmp_path, monkeypatch)
+    assert StarStore.load() is not None
+    assert [f for f in os.listdir(update_star_history.STAR_HISTORY_DIR) if f.endswith(".csv")] == []
+
+def test_export_csv_writes_every_history(tmp_path, monkeypatch):
+    registry, day = saved_store(tmp_path, monkeypatch, export_csv=True)
+    for repo, count in zip(sorted(REPOS), (3, 4)):
+        with open(os.path.join(update_star_history.STAR_HISTORY_DIR, registry.file(repo)), encoding="utf-8") as f:
+            assert f.read().splitlines() == [f"{day},{count}"]
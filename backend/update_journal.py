@@ -0,0 +1,62 @@
+import os
+import shutil
+import logging
+import numpy as np
+import orjson
+from atomic_file import atomic_write
+
+# Write-ahead journal for the star history update: every day committed to the in-memory
+# store is also written here, so a run that dies before the store is saved can be replayed
+# instead of re-ingested. Cleared once the store and manifest are safely on disk.
+JOURNAL_DIR = os.path.join("cache", "update_journal")
+HEADER_FILE = os.path.join(JOURNAL_DIR, "run.json")
+
+def _day_path(date_str):
+    return os.path.join(JOURNAL_DIR, f"{date_str}.npz")
+
+def _load_header():
+    try:
+        with open(HEADER_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+def begin(repos):
+    # repos in table order; the days already journalled for the same repos are kept and
+    # returned as {date: (status, counts)}, anything else is discarded
+    header = _load_header()
+    if header is not None and header.get("repos") == repos:
+        return replay(len(repos))
+    if header is not None:
+        logging.info("Discarding update journal written for a different repository set")
+    clear()
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    # Records are what a crashed run leaves behind, so unlike caches they are fsynced
+    with atomic_write(HEADER_FILE, 'wb', fsync=True) as f:
+        f.write(orjson.dumps({"repos": repos}))
+    return {}
+
+def replay(repo_count):
+    days = {}
+    for filename in sorted(os.listdir(JOURNAL_DIR)):
+        if not filename.endswith(".npz"):
+            continue
+        date_str = filename[:-len(".npz")]
+        try:
+            with np.load(os.path.join(JOURNAL_DIR, filename), allow_pickle=False) as data:
+                status, counts = str(data["status"]), data["counts"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Skipping unreadable journal entry for {date_str}: {e}")
+            continue
+        if len(counts) != repo_count:
+            logging.warning(f"Skipping journal entry for {date_str}: {len(counts)} counts for {repo_count} repositories")
+            continue
+        days[date_str] = (status, counts)
+    return days
+
+def record(date_str, status, counts):
+    with atomic_write(_day_path(date_str), 'wb', fsync=True) as f:
+        np.savez(f, status=np.array(status), counts=counts)
+
+def clear():
+    shutil.rmtree(JOURNAL_DIR, ignore_errors=True)
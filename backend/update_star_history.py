@@ -1,212 +1,552 @@
 import os
-import csv
-import gzip
+import cProfile
+import re
+import zlib
 import time
+import zipfile
+import argparse
+import multiprocessing
 import orjson
+import numpy as np
 from datetime import datetime, timedelta
 import pytz
 import requests
 import logging
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+import hour_cache
+import hour_scheduler
+import run_metrics
+import update_journal
+from atomic_file import atomic_write
+from star_store import StarStore, STORE_FILE, NA, MISSING
+from repo_table import RepoTable
+from repo_registry import RepoRegistry, REGISTRY_FILE, read_index_ids
 
 # Constants
 GITHUB_ARCHIVE_URL = "https://data.gharchive.org"
 REPO_INDEX_FILE = "repo_index.csv"
 STAR_HISTORY_DIR = "star_history"
+MANIFEST_FILE = os.path.join(STAR_HISTORY_DIR, "manifest.json")
 DAYS_HISTORY = 30
+# Beyond the daily window, history is kept as week-of-month totals and then monthly totals
+SEGMENT_HISTORY_DAYS = 120
+MONTH_HISTORY_DAYS = 400
 HOURS_PER_DAY = list(range(24))
-MAX_WORKERS = 8
-
-# Configure logging
-os.makedirs("logs", exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f'logs/{datetime.now(pytz.utc).strftime("%Y-%m-%d")}.log'),
-        logging.StreamHandler()
-    ]
+# Parsing is CPU-bound, downloads are not: the pool matches the cores, downloads adapt
+CPU_WORKERS = os.cpu_count() or 1
+INITIAL_DOWNLOADS = 4
+MAX_DOWNLOADS = 16
+# Downloaded hours are spooled to disk for the parse pool rather than handed over in memory:
+# an hour is 50-150 MB compressed, and the queue below would otherwise hold that many in RAM
+# and pickle each one into a worker. Hours between dispatch and parsed are capped at
+# MAX_DOWNLOADS plus this many per parse worker, which bounds the spool to roughly that many.
+SPOOL_QUEUE_PER_WORKER = 2
+SPOOL_DIR = os.path.join("cache", "spool")
+# Attempts after the first for a failed download, and for an archive that turns out corrupt
+ARCHIVE_RETRIES = 2
+# Returned by the parse stage for an archive that did not decompress, so it is downloaded again
+CORRUPT_ARCHIVE = "corrupt"
+CHUNK_SIZE = 64 * 1024
+WATCH_EVENT_MARKER = b'"type":"WatchEvent"'
+# {"id":"...","type":"WatchEvent","actor":{...},"repo":{"id":N,"name":"..."},...} on one complete line
+WATCH_EVENT_RE = re.compile(
+    rb'\{"id":"\d+","type":"WatchEvent","actor":\{[^{}\n]*\},'
+    rb'"repo":\{"id":\d+,"name":"([\x21\x23-\x5b\x5d-\x7e]+)"[^\n]*\}\r?(?:\n|$)'
 )
 
-def is_first_run():
-    if not os.path.exists(STAR_HISTORY_DIR):
-        return True
-    for filename in os.listdir(STAR_HISTORY_DIR):
-        if filename.endswith(".csv"):
-            filepath = os.path.join(STAR_HISTORY_DIR, filename)
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                lines = list(reader)
-                if len(lines) != DAYS_HISTORY:
-                    return True
-    return False
+# Set in each pool worker by init_worker()
+worker_repo_table = None
+# Set by configure_logging() so spawned pool workers log the same way as their parent
+logging_configured = False
+# When set, each archive hour is profiled into this directory (see run_pipeline --profile)
+PROFILE_DIR_ENV = "STAR_PIPELINE_PROFILE_DIR"
+
+def configure_logging():
+    # Called by entry points only, so importing this module never creates logs/ in the working directory
+    global logging_configured
+    logging_configured = True
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(f'logs/{datetime.now(pytz.utc).strftime("%Y-%m-%d")}.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'rb') as f:
+            manifest = orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    if not isinstance(manifest.get("days"), dict) or not isinstance(manifest.get("repos"), list):
+        return None
+    return manifest
+
+def save_manifest(manifest):
+    with atomic_write(MANIFEST_FILE, 'wb') as f:
+        f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
 
 def clear_star_history():
     for filename in os.listdir(STAR_HISTORY_DIR):
         if filename.endswith('.csv'):
             os.remove(os.path.join(STAR_HISTORY_DIR, filename))
+    for path in (MANIFEST_FILE, STORE_FILE, REGISTRY_FILE):
+        if os.path.exists(path):
+            os.remove(path)
 
-def get_active_repos():
-    active_repos = set()
+def get_repo_ids():
     try:
-        with open(REPO_INDEX_FILE, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if row:
-                    active_repos.add(row[0])
+        return read_index_ids(REPO_INDEX_FILE)
     except FileNotFoundError:
         logging.warning("No repository index found.")
-    return active_repos
+        return {}
+
+def iter_archive_blocks(chunks):
+    # GH Archive hours can be several concatenated gzip members, so restart the
+    # decompressor whenever one ends. Blocks always end on a line boundary and
+    # memory stays bounded by one decompressed chunk plus the longest line.
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    in_member = False
+    pending = b""
+    compressed_bytes = decompressed_bytes = 0
+    decompress_seconds = 0.0
+    try:
+        for chunk in chunks:
+            compressed_bytes += len(chunk)
+            while chunk:
+                in_member = True
+                started = time.perf_counter()
+                data = decompressor.decompress(chunk)
+                decompress_seconds += time.perf_counter() - started
+                decompressed_bytes += len(data)
+                chunk = b""
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                    in_member = False
+                if not data:
+                    continue
+                data = pending + data
+                cut = data.rfind(b"\n") + 1
+                pending = data[cut:]
+                if cut:
+                    yield data[:cut]
+        if in_member:
+            raise zlib.error("truncated gzip stream")
+        if pending:
+            yield pending
+    finally:
+        run_metrics.incr("archive_compressed_bytes", compressed_bytes)
+        run_metrics.incr("archive_decompressed_bytes", decompressed_bytes)
+        run_metrics.incr("archive_decompress_seconds", decompress_seconds)
+
+def _decode_watch_repo(line):
+    try:
+        return orjson.loads(line).get("repo", {}).get("name")
+    except Exception:
+        return None
+
+def process_archive(blocks):
+    # Counts every repo, not just active ones, so the hour cache survives index changes.
+    # Only lines containing the WatchEvent marker are looked at; those in GH Archive's
+    # usual layout have the repo name read straight from the bytes, anything else is decoded.
+    counts = {}
+    lines_scanned = fast_matches = slow_matches = 0
+    for block in blocks:
+        lines_scanned += block.count(b"\n")
+        pos = block.find(WATCH_EVENT_MARKER)
+        while pos != -1:
+            line_start = block.rfind(b"\n", 0, pos) + 1
+            match = WATCH_EVENT_RE.match(block, line_start)
+            if match:
+                repo_name = match.group(1).decode('ascii')
+                line_end = match.end()
+                fast_matches += 1
+            else:
+                line_end = block.find(b"\n", pos)
+                if line_end == -1:
+                    line_end = len(block)
+                repo_name = _decode_watch_repo(block[line_start:line_end])
+                slow_matches += 1
+            if repo_name:
+                counts[repo_name] = counts.get(repo_name, 0) + 1
+            pos = block.find(WATCH_EVENT_MARKER, line_end)
+    run_metrics.incr("archive_lines_scanned", lines_scanned)
+    run_metrics.incr("watch_events_fast_path", fast_matches)
+    run_metrics.incr("watch_events_decoded", slow_matches)
+    run_metrics.incr("watch_events_counted", sum(counts.values()))
+    return counts
 
-def download_archive(date, hour):
-    url = f"{GITHUB_ARCHIVE_URL}/{date.strftime('%Y-%m-%d')}-{hour}.json.gz"
-    local_path = f"temp_{date.strftime('%Y-%m-%d')}-{hour}.json.gz"
-    max_retries = 2
+def is_congestion_error(error):
+    # Missing hours (404) are expected near the present and say nothing about link capacity
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return True
+
+def fetch_archive(date_str, hour, limit, spool_dir=SPOOL_DIR):
+    # I/O stage: download one hour into the spool directory and return its path, or None
+    url = f"{GITHUB_ARCHIVE_URL}/{date_str}-{hour}.json.gz"
+    path = os.path.join(spool_dir, f"{date_str}-{hour}.json.gz")
+    max_retries = ARCHIVE_RETRIES
     backoff = 1
 
     for attempt in range(max_retries + 1):
         start_time = time.time()
         try:
-            response = requests.get(url, stream=True, timeout=15)
-            response.raise_for_status()
-
-            download_time = time.time() - start_time
-            if download_time > 10:
-                logging.warning(f"Slow download detected ({download_time:.2f}s): {url}")
-            else:
-                logging.info(f"Downloaded in {download_time:.2f}s: {url}")
-
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-
-            return local_path
+            with requests.get(url, stream=True, timeout=15) as response:
+                response.raise_for_status()
+
+                download_time = time.time() - start_time
+                run_metrics.observe("archive_response_seconds", download_time)
+                if download_time > 10:
+                    logging.warning(f"Slow download detected ({download_time:.2f}s): {url}")
+                else:
+                    logging.info(f"Downloaded in {download_time:.2f}s: {url}")
+
+                size = 0
+                with run_metrics.timed("archive_body_seconds"), atomic_write(path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+            limit.record(size)
+            run_metrics.incr("archives_downloaded")
+            return path
 
         except requests.exceptions.RequestException as e:
+            run_metrics.incr("archive_download_errors")
+            limit.record(0, ok=not is_congestion_error(e))
             logging.warning(f"Attempt {attempt + 1} failed to download {url}: {e}")
             if attempt < max_retries:
                 time.sleep(backoff)
                 backoff *= 2
             else:
                 logging.warning(f"Giving up on {url} after {max_retries + 1} attempts.")
+                run_metrics.incr("archives_failed")
                 return None
 
-def process_archive(file_path, active_repos):
-    counts = {}
+def load_store(registry):
     try:
-        with gzip.open(file_path, 'rb') as f:
-            for line in f:
-                if b'"type":"WatchEvent"' not in line:
-                    continue
-                try:
-                    event = orjson.loads(line)
-                    repo_name = event.get("repo", {}).get("name")
-                    if repo_name in active_repos:
-                        counts[repo_name] = counts.get(repo_name, 0) + 1
-                except Exception:
-                    continue
-    finally:
-        os.remove(file_path)
-    return counts
-
-def write_batch_updates(date_str, daily_counts):
-    os.makedirs(STAR_HISTORY_DIR, exist_ok=True)
-    for repo_name, count in daily_counts.items():
-        clean_name = repo_name.replace('/', '_')
-        file_path = os.path.join(STAR_HISTORY_DIR, f"{clean_name}.csv")
-        new_line = [date_str, count]
-
-        lines = []
-        seen = False
-
-        if os.path.exists(file_path):
-            with open(file_path, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if row:
-                        lines.append(row)
-                        if row[0] == date_str:
-                            seen = True
-
-        if not seen:
-            lines.append(new_line)
-
-        # Always trim to most recent 30 days
-        lines = sorted(lines, key=lambda x: x[0])[-DAYS_HISTORY:]
-
-        with open(file_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(lines)
-
-def process_hour(date, hour, active_repos):
-    archive_file = download_archive(date, hour)
-    if archive_file:
-        logging.info(f"Processing archive: {date.strftime('%Y-%m-%d')} hour {hour}")
-        return process_archive(archive_file, active_repos)
-    return {}
-
-def process_day_wrapper(args):
-    day_str, active_repos = args
-    process_day(day_str, active_repos)
-
-def process_day(date_str, active_repos):
-    logging.info(f"Processing day: {date_str}")
-    date = datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=pytz.utc)
-    total_counts = {repo: 0 for repo in active_repos}
-    any_data_found = False
-
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(process_hour, date, hour, active_repos): hour for hour in HOURS_PER_DAY}
-        for future in as_completed(futures):
-            hourly_counts = future.result()
-            if hourly_counts:
-                any_data_found = True
-                for repo, count in hourly_counts.items():
-                    total_counts[repo] += count
-
-    if any_data_found:
-        write_batch_updates(date_str, total_counts)
-    else:
-        logging.warning(f"No data available for {date_str}, inserting NA for all repos")
-        na_counts = {repo: "NA" for repo in active_repos}
-        write_batch_updates(date_str, na_counts)
-
-def cleanup_temp_files():
-    for filename in os.listdir('.'):
-        if filename.startswith('temp_') and filename.endswith('.json.gz'):
+        store = StarStore.load()
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        # The CSVs hold the history as of the last export (--export-csv or an earlier version);
+        # days missing from them are fetched again
+        logging.warning(f"Ignoring unreadable {STORE_FILE} ({e}); rebuilding it from the history files")
+        store = None
+    if store is None:
+        # Seed from the per-repo CSVs written by earlier versions
+        store = StarStore.from_csv_dir(STAR_HISTORY_DIR, {repo: registry.file(repo) for repo in registry.names()})
+    return store
+
+def compact_store(store, active_repos):
+    # Idempotent, so callers that need the final store before saving may run it first
+    store.retain(active_repos)
+    store.trim(DAYS_HISTORY, SEGMENT_HISTORY_DAYS, MONTH_HISTORY_DAYS)
+
+def write_batch_updates(store, active_repos, registry, export_csv=False):
+    # Single writer: workers only return counts, the parent commits them here
+    compact_store(store, active_repos)
+    with run_metrics.timed("store_save_seconds"):
+        store.save()
+    if export_csv:
+        # Opt-in: the window moves every day, so every repo's file changes and is rewritten
+        with run_metrics.timed("csv_export_seconds"):
+            store.export_csv(STAR_HISTORY_DIR, registry.file)
+    # Files of repos that left the index, plus any export a crash left as .tmp
+    removed = registry.prune(active_repos)
+    if removed:
+        logging.info(f"Removed {len(removed)} histories of repositories no longer indexed")
+    registry.save()
+
+def init_worker(table_spec, configure=False):
+    global worker_repo_table
+    if configure:
+        configure_logging()
+    worker_repo_table = RepoTable.attach(table_spec)
+
+def parse_hour(key, spool_path):
+    # CPU stage, run in the process pool. Returns the hour's counts as an int32 array indexed
+    # by id in the shared repo table (None if unusable, CORRUPT_ARCHIVE if the download was bad)
+    # plus the metrics it recorded.
+    run_metrics.reset()
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    with run_metrics.timed("hour_seconds"):
+        if not profile_dir:
+            counts = _parse_hour(key, spool_path)
+        else:
+            profile = cProfile.Profile()
             try:
-                os.remove(filename)
-                logging.info(f"Deleted leftover temp file: {filename}")
-            except Exception as e:
-                logging.warning(f"Failed to delete temp file {filename}: {e}")
-
-def main():
+                counts = profile.runcall(_parse_hour, key, spool_path)
+            finally:
+                profile.dump_stats(os.path.join(profile_dir, f"hour-{key[0]}-{key[1]:02d}.prof"))
+    return counts, run_metrics.snapshot()
+
+def _parse_hour(key, spool_path):
+    date_str, hour = key
+    cache_key = f"{date_str}-{hour}"
+    if spool_path is None:
+        counts = hour_cache.load(cache_key)
+        if counts is None:
+            return None
+        run_metrics.incr("hour_cache_hits")
+        logging.info(f"Using cached counts: {date_str} hour {hour}")
+    else:
+        run_metrics.incr("hour_cache_misses")
+        logging.info(f"Processing archive: {date_str} hour {hour}")
+        try:
+            with open(spool_path, 'rb') as f:
+                counts = process_archive(iter_archive_blocks(iter(lambda: f.read(CHUNK_SIZE), b"")))
+        except zlib.error as e:
+            logging.warning(f"Discarding corrupt archive {date_str} hour {hour}: {e}")
+            run_metrics.incr("archives_corrupt")
+            return CORRUPT_ARCHIVE
+        finally:
+            os.remove(spool_path)
+        hour_cache.store(cache_key, counts)
+    return worker_repo_table.count_array(counts)
+
+def day_result(date_str, hours_ok, total_counts):
+    if hours_ok:
+        if hours_ok < len(HOURS_PER_DAY):
+            logging.warning(f"Only {hours_ok}/{len(HOURS_PER_DAY)} hours available for {date_str}, will retry next run")
+            return "partial", total_counts
+        return "complete", total_counts
+
+    logging.warning(f"No data available for {date_str}, inserting NA for all repos")
+    return "na", np.full(len(total_counts), NA, dtype=np.int32)
+
+def clear_spool(spool_dir=SPOOL_DIR):
+    if os.path.exists(spool_dir):
+        for filename in os.listdir(spool_dir):
+            os.remove(os.path.join(spool_dir, filename))
+    os.makedirs(spool_dir, exist_ok=True)
+
+def ingest_hours(hours, table, cpu_workers=CPU_WORKERS, spool_dir=SPOOL_DIR):
+    # Downloads run in threads under an adaptive in-flight limit, parsing runs in a process
+    # pool sized to the cores, and a bounded queue between them applies backpressure.
+    # Yields (day, hour, counts by table id) as hours finish, counts None if unreadable.
+    # Corrupt archives (e.g. a truncated transfer) go round again, up to ARCHIVE_RETRIES times.
+    limit = hour_scheduler.AdaptiveLimit(INITIAL_DOWNLOADS, maximum=MAX_DOWNLOADS)
+    clear_spool(spool_dir)
+    pending = list(hours)
+    # Workers are started from the download threads, so they are spawned rather than forked:
+    # a fork there could copy a lock (run_metrics, logging) that another thread holds
+    executor = ProcessPoolExecutor(
+        max_workers=cpu_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(table.spec, logging_configured),
+    )
+    with executor:
+        for attempt in range(ARCHIVE_RETRIES + 1):
+            scheduled = hour_scheduler.run(
+                pending,
+                is_cached=lambda key: hour_cache.contains(f"{key[0]}-{key[1]}"),
+                fetch=lambda key: fetch_archive(key[0], key[1], limit, spool_dir),
+                executor=executor,
+                parse=parse_hour,
+                limit=limit,
+                queue_size=MAX_DOWNLOADS + SPOOL_QUEUE_PER_WORKER * cpu_workers,
+            )
+            pending = []
+            for (day, hour), result in scheduled:
+                counts = None
+                if result is not None:
+                    counts, worker_metrics = result
+                    run_metrics.merge(worker_metrics)
+                # Compared by type: the marker comes back from the pool as a copy
+                if isinstance(counts, str):
+                    if attempt < ARCHIVE_RETRIES:
+                        pending.append((day, hour))
+                        continue
+                    logging.warning(f"Giving up on corrupt archive {day} hour {hour} after {attempt + 1} downloads")
+                    run_metrics.incr("archives_failed")
+                    counts = None
+                yield day, hour, counts
+            if not pending:
+                break
+            logging.info(f"Downloading {len(pending)} corrupt archives again")
+
+    run_metrics.set_gauge("download_concurrency_final", limit.limit)
+    run_metrics.set_gauge("download_concurrency_peak", limit.peak)
+    run_metrics.set_gauge("download_concurrency_adjustments", limit.adjustments)
+
+def fetch_days(days, table, store, store_rows):
+    remaining = dict.fromkeys(days, len(HOURS_PER_DAY))
+    hours_ok = dict.fromkeys(days, 0)
+    totals = {}
+    results = {}
+    hours = [(day, hour) for day in days for hour in HOURS_PER_DAY]
+
+    for day, hour, counts in ingest_hours(hours, table):
+        if counts is not None:
+            hours_ok[day] += 1
+            if day in totals:
+                totals[day] += counts
+            else:
+                totals[day] = counts
+        remaining[day] -= 1
+        if not remaining[day]:
+            # Each day is committed as soon as its last hour is in, so only open days hold arrays
+            status, day_counts = day_result(day, hours_ok[day], totals.pop(day, np.zeros(len(table), dtype=np.int32)))
+            update_journal.record(day, status, day_counts)
+            store.set_day_values(day, store_rows, day_counts)
+            results[day] = status
+    return results
+
+def record_pool_metrics(pool_seconds, days):
+    busy = run_metrics.snapshot()["histograms"].get("hour_seconds", {}).get("sum", 0.0)
+    workers = CPU_WORKERS if days else 0
+    run_metrics.set_gauge("update_pool_seconds", round(pool_seconds, 3))
+    if workers and pool_seconds > 0:
+        # Share of the pool's wall time that its workers spent parsing hours
+        run_metrics.set_gauge("update_worker_utilisation", round(busy / (pool_seconds * workers), 3))
+    counters = run_metrics.snapshot()["counters"]
+    if counters.get("archive_decompress_seconds"):
+        run_metrics.set_gauge(
+            "archive_decompress_mb_per_second",
+            round(counters["archive_decompressed_bytes"] / counters["archive_decompress_seconds"] / 1e6, 1)
+        )
+
+def replay_journal(journalled, day_strings, store, store_rows):
+    # Days a crashed run had already ingested for the same repos; days that have since left
+    # the window are ignored because trim() may already have rolled them up
+    replayed = {}
+    for day, (status, counts) in journalled.items():
+        if day in day_strings:
+            store.set_day_values(day, store_rows, counts)
+            replayed[day] = status
+    if replayed:
+        logging.info(f"Replayed {len(replayed)} days from the update journal of an interrupted run")
+        run_metrics.incr("journal_days_replayed", len(replayed))
+    return replayed
+
+def get_days_to_fetch(day_strings, manifest, active_repos):
+    new_repos = active_repos - set(manifest["repos"])
+    if new_repos:
+        # Days already ingested have no rows for these repos, so the whole window is needed
+        logging.info(f"{len(new_repos)} new repositories need backfill — fetching all {len(day_strings)} days")
+        return list(day_strings)
+    return [day for day in day_strings if manifest["days"].get(day) != "complete"]
+
+def history_window(now=None):
+    now = now or datetime.now(pytz.utc)
+    return [(now - timedelta(days=(DAYS_HISTORY - i))).strftime('%Y-%m-%d') for i in range(DAYS_HISTORY)]
+
+def settle_pending_merge(manifest, store):
+    # A shard merge records its ledger as pending, keyed by the digest of the store it is about
+    # to save. The ledger is adopted only if that store made it to disk, so an interrupted merge
+    # can be re-run without counting its hours twice.
+    pending = manifest.pop("pending_merge", None)
+    if pending is not None and pending["store_digest"] == store.digest():
+        manifest["merged_hours"] = pending["merged_hours"]
+        logging.info("Adopted the hour ledger of an interrupted shard merge")
+
+def daily_since(manifest, store):
+    # First day the daily update has ingested. Shard merges leave that day and later ones alone
+    # unless they merged them first, so the two never count the same hour.
+    if "daily_since" in manifest:
+        return manifest["daily_since"]
+    if "merged_hours" in manifest:
+        return None
+    # Stores from before shard merges existed may hold rolled-up daily data older than the window
+    return store.coverage_start()
+
+def adopt_history(store):
+    # Manifest for a history written without one (before incremental updates, or lost): days
+    # every repo's history has a value for count as ingested, the rest of the window is fetched
+    # again. Keeps an upgrade from wiping and re-downloading history that is already there.
+    days = {}
+    for day in history_window():
+        if day not in store.days or not store.repos:
+            continue
+        column = store.counts[:, store.days.index(day)]
+        if (column != MISSING).all():
+            days[day] = "na" if (column == NA).all() else "complete"
+    if store.repos:
+        logging.info(f"No manifest found — adopting existing history of {len(store.repos)} repositories ({len(days)} days present)")
+    return {"days": days, "repos": list(store.repos)}
+
+def prepare_store(repo_ids):
+    # Loads the manifest and a store with a row for every indexed repo, following renames
+    # recorded by the registry
+    active_repos = set(repo_ids)
+    registry = RepoRegistry.load_or_bootstrap(active_repos)
+    renames = registry.sync(repo_ids)
+    store = load_store(registry)
+    manifest = load_manifest() or adopt_history(store)
+    manifest["repos"] = [renames.get(repo, repo) for repo in manifest["repos"]]
+    settle_pending_merge(manifest, store)
+    store.rename(renames)
+    store.add_repos(active_repos)
+    return manifest, store, registry
+
+def main(full_rebuild=False, repo_ids=None, export_csv=False):
+    # repo_ids maps each indexed repo's full name to its GitHub id (None if unknown)
     logging.info("Starting optimized star history update")
 
     if not os.path.exists(STAR_HISTORY_DIR):
         os.makedirs(STAR_HISTORY_DIR)
+    hour_cache.evict()
 
-    if is_first_run():
-        logging.info("First run detected — clearing old star history")
+    if full_rebuild:
+        logging.info("Full rebuild requested — clearing old star history and cached hours")
         clear_star_history()
+        update_journal.clear()
+        hour_cache.clear()
 
-    active_repos = get_active_repos()
+    if repo_ids is None:
+        repo_ids = get_repo_ids()
+    active_repos = set(repo_ids)
     if not active_repos:
         logging.warning("No active repositories found. Exiting.")
-        return
-
-    now = datetime.now(pytz.utc)
-    day_strings = [
-        (now - timedelta(days=(DAYS_HISTORY - i))).strftime('%Y-%m-%d')
-        for i in range(DAYS_HISTORY)
-    ]
-
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        executor.map(process_day_wrapper, [(day, active_repos) for day in day_strings])
+        return None
+
+    day_strings = history_window()
+    manifest, store, registry = prepare_store(repo_ids)
+    since = daily_since(manifest, store)
+    table = RepoTable.create(active_repos)
+    store_rows = np.array([store.repo_index[repo] for repo in table.repo_names()], dtype=np.intp)
+    pool_started = time.perf_counter()
+    try:
+        replayed = replay_journal(update_journal.begin(table.repo_names()), day_strings, store, store_rows)
+        days_to_fetch = [
+            day for day in get_days_to_fetch(day_strings, manifest, active_repos)
+            if replayed.get(day) != "complete"
+        ]
+        logging.info(f"Fetching {len(days_to_fetch)} of {len(day_strings)} days")
+        results = {**replayed, **fetch_days(days_to_fetch, table, store, store_rows)}
+    finally:
+        table.close(unlink=True)
+    record_pool_metrics(time.perf_counter() - pool_started, len(days_to_fetch))
+
+    with run_metrics.timed("write_batch_updates_seconds"):
+        write_batch_updates(store, active_repos, registry, export_csv)
+
+    manifest["days"] = {
+        day: results.get(day, manifest["days"].get(day))
+        for day in day_strings
+        if day in results or day in manifest["days"]
+    }
+    manifest["repos"] = sorted(active_repos)
+    if results:
+        # A day ingested here replaces whatever shard merges put into it
+        manifest["daily_since"] = min(day for day in (since, *results) if day)
+        for day in results:
+            manifest.get("merged_hours", {}).pop(day, None)
+    save_manifest(manifest)
+    # Everything journalled is now in the saved store
+    update_journal.clear()
 
-    cleanup_temp_files()
     logging.info("Star history update complete.")
+    return store
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Update per-repo daily star counts from GH Archive")
+    parser.add_argument("--full", action="store_true", help="discard existing history and cached hours, and re-fetch every day in the window")
+    parser.add_argument("--export-csv", action="store_true", help=f"also write each repository's history to {STAR_HISTORY_DIR}/ as CSV for older tools")
+    args = parser.parse_args()
+    configure_logging()
+    main(full_rebuild=args.full, export_csv=args.export_csv)
\ No newline at end of file
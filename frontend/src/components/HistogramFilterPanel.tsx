@@ -140,6 +140,8 @@ const HistogramFilterPanel: React.FC<HistogramFilterPanelProps> = ({
                 
                 <div className="space-y-2">
                   {[
+                    { type: '365d', label: '365-Day' },
+                    { type: '90d', label: '90-Day' },
                     { type: '30d', label: '30-Day' },
                     { type: '5d', label: '5-Day' },
                     { type: '1d', label: '1-Day' },
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
-import { Repository, FilterState, HistogramBin, GrowthMetric } from '@/types/repository';
-import { loadRepositoryData } from '@/utils/dataLoader';
+import { Repository, FilterState, HistogramBin, GrowthMetric, FilterLookup } from '@/types/repository';
+import { loadRepositoryData, loadHistogramBins, loadFilterLookup } from '@/utils/dataLoader';
 import { generateHistogram } from '@/utils/histogramUtils';
 import { getDefaultFilters, applyFilters } from '@/utils/filterUtils';
 import Histogram from '@/components/Histogram';
@@ -13,6 +13,7 @@ const Dashboard = () => {
   const [allRepositories, setAllRepositories] = useState<Repository[]>([]);
   const [filteredRepositories, setFilteredRepositories] = useState<Repository[]>([]);
   const [histogramBins, setHistogramBins] = useState<HistogramBin[]>([]);
+  const [filterLookup, setFilterLookup] = useState<FilterLookup | null>(null);
   
   // Load initial state from sessionStorage or use defaults
   const loadPersistedHistogramMetric = (): GrowthMetric => {
@@ -66,14 +67,18 @@ const Dashboard = () => {
     };
   }, []);
 
-  const histogramGrowthMetricLabel = `${histogramGrowthMetric.type === '30d' ? '30-Day' : 
+  const histogramGrowthMetricLabel = `${histogramGrowthMetric.type === '365d' ? '365-Day' :
+                                        histogramGrowthMetric.type === '90d' ? '90-Day' :
+                                        histogramGrowthMetric.type === '30d' ? '30-Day' : 
                                         histogramGrowthMetric.type === '5d' ? '5-Day' :
                                         histogramGrowthMetric.type === '1d' ? '1-Day' :
                                         histogramGrowthMetric.type === 'post_5d' ? 'Post-Maximum 5-Day' :
                                         histogramGrowthMetric.type === 'post_day' ? `Post-Day ${histogramGrowthMetric.day || 1}` :
                                         'Post-Day'} Growth (${histogramGrowthMetric.format === 'pct' ? '%' : 'Raw'})`;
 
-  const listGrowthMetricLabel = `${listFilters.growthMetric.type === '30d' ? '30-Day' :
+  const listGrowthMetricLabel = `${listFilters.growthMetric.type === '365d' ? '365-Day' :
+                                listFilters.growthMetric.type === '90d' ? '90-Day' :
+                                listFilters.growthMetric.type === '30d' ? '30-Day' :
                                 listFilters.growthMetric.type === '5d' ? '5-Day' :
                                 listFilters.growthMetric.type === '1d' ? '1-Day' :
                                 listFilters.growthMetric.type === 'post_5d' ? 'Post-Maximum 5-Day' :
@@ -102,10 +107,10 @@ const Dashboard = () => {
   // Apply filters to repository list when filters change
   useEffect(() => {
     if (allRepositories.length > 0) {
-      const filtered = applyFilters(allRepositories, listFilters);
+      const filtered = applyFilters(allRepositories, listFilters, filterLookup);
       setFilteredRepositories(filtered);
     }
-  }, [allRepositories, listFilters]);
+  }, [allRepositories, listFilters, filterLookup]);
 
   const loadHistogramData = async () => {
     setLoading(true);
@@ -115,8 +120,7 @@ const Dashboard = () => {
         histogramGrowthMetric.day ? `_${histogramGrowthMetric.day}` : ''
       }`;
       
-      const repos = await loadRepositoryData(filename);
-      const bins = generateHistogram(repos);
+      const bins = await loadHistogramBins(filename) ?? generateHistogram(await loadRepositoryData(filename));
       
       setTimeout(() => {
         setHistogramBins(bins);
@@ -136,7 +140,8 @@ const Dashboard = () => {
         listFilters.growthMetric.day ? `_${listFilters.growthMetric.day}` : ''
       }`;
       
-      const repos = await loadRepositoryData(filename);
+      const [repos, lookup] = await Promise.all([loadRepositoryData(filename), loadFilterLookup()]);
+      setFilterLookup(lookup);
       setAllRepositories(repos);
       
     } catch (error) {
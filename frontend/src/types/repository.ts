@@ -20,7 +20,7 @@ export interface StarHistoryPoint {
 }
 
 export interface GrowthMetric {
-  type: '30d' | '5d' | '1d' | 'post_5d' | 'post_day';
+  type: '365d' | '90d' | '30d' | '5d' | '1d' | 'post_5d' | 'post_day';
   format: 'pct' | 'raw';
   day?: number; // for post_day metrics
 }
@@ -43,4 +43,46 @@ export interface HistogramBin {
   max: number;
   count: number;
   label: string;
-}
\ No newline at end of file
+}
+
+export interface BundleMetric {
+  label: string;
+  order: number[];
+  values: (number | null)[];
+  histogram?: { min: number; max: number | null; count: number }[];
+  quantiles?: number[];
+}
+
+// Categorical filter value -> ascending repo ids, keyed as applyFilters compares them
+export interface FilterIndexes {
+  topics: Record<string, number[]>;
+  license: Record<string, number[]>;
+  owner_type: Record<string, number[]>;
+}
+
+export interface FilterLookup {
+  repoIds: Map<string, number>;
+  indexes: FilterIndexes;
+}
+
+export interface DataBundle {
+  version: number;
+  repos: {
+    repo_name: string[];
+    html_url: string[];
+    created_at: string[];
+    stargazers_count: number[];
+    pushed_at: string[];
+    forks_count: number[];
+    topics: string[];
+    license_spdx: string[];
+    owner_type: string[];
+    upcoming: boolean[];
+  };
+  metrics: Record<string, BundleMetric>;
+  indexes?: FilterIndexes;
+  history: {
+    dates: string[];
+    stars: (number | null)[][];
+  };
+}
@@ -1,4 +1,5 @@
-import { Repository, StarHistoryPoint } from '@/types/repository';
+import { DataBundle, FilterLookup, HistogramBin, Repository, StarHistoryPoint } from '@/types/repository';
+import { binLabel } from '@/utils/histogramUtils';
 
 export const parseCSV = (csvText: string): any[] => {
   const lines = csvText.trim().replace(/\r\n/g, '\n').replace(/\r/g, '\n').split('\n');
@@ -25,7 +26,100 @@ export const parseCSV = (csvText: string): any[] => {
   return data;
 };
 
+let bundlePromise: Promise<{ bundle: DataBundle; repoIds: Map<string, number> } | null> | null = null;
+
+// One content-hashed bundle holds metadata, every growth metric and all histories.
+// Resolves to null when no bundle is published, so callers fall back to the CSVs.
+export const loadDataBundle = () => {
+  if (!bundlePromise) {
+    bundlePromise = (async () => {
+      try {
+        const pointerResponse = await fetch('/data_bundle.json', { headers: { 'Cache-Control': 'no-cache' } });
+        if (!pointerResponse.ok) {
+          return null;
+        }
+        const { file } = await pointerResponse.json();
+        const response = await fetch(`/${file}`);
+        if (!response.ok) {
+          return null;
+        }
+        const bundle: DataBundle = await response.json();
+        const repoIds = new Map(bundle.repos.repo_name.map((name, id) => [name, id] as [string, number]));
+        console.log(`Loaded data bundle ${file} with ${repoIds.size} repositories`);
+        return { bundle, repoIds };
+      } catch (error) {
+        console.warn('Data bundle unavailable, falling back to CSV files:', error);
+        return null;
+      }
+    })();
+  }
+  return bundlePromise;
+};
+
+const repositoryFromBundle = (bundle: DataBundle, id: number): Repository => {
+  const repos = bundle.repos;
+  return {
+    repo_name: repos.repo_name[id],
+    html_url: repos.html_url[id] || `https://github.com/${repos.repo_name[id]}`,
+    created_at: repos.created_at[id],
+    stargazers_count: repos.stargazers_count[id],
+    pushed_at: repos.pushed_at[id],
+    forks_count: repos.forks_count[id],
+    topics: repos.topics[id],
+    license_spdx: repos.license_spdx[id],
+    owner_type: repos.owner_type[id] || 'User',
+    upcoming: repos.upcoming[id]
+  };
+};
+
+// Bins precomputed by the backend for the whole metric; null when the bundle has none
+export const loadHistogramBins = async (growthMetric: string): Promise<HistogramBin[] | null> => {
+  const loaded = await loadDataBundle();
+  const histogram = loaded?.bundle.metrics[growthMetric]?.histogram;
+  if (!histogram) {
+    return null;
+  }
+  return histogram.map((bin, i) => ({
+    min: bin.min,
+    max: bin.max ?? Infinity,
+    count: bin.count,
+    label: binLabel(bin.min, bin.max ?? Infinity, i === histogram.length - 1)
+  }));
+};
+
+// Inverted indexes for the categorical filters; null when the bundle has none
+export const loadFilterLookup = async (): Promise<FilterLookup | null> => {
+  const loaded = await loadDataBundle();
+  if (!loaded?.bundle.indexes) {
+    return null;
+  }
+  return { repoIds: loaded.repoIds, indexes: loaded.bundle.indexes };
+};
+
+// Each sorted CSV sorted_<format>_<type>[_<day>] carries its value in <format>_<type>[_<day>]_growth,
+// except the post-maximum 5-day rankings, which keep their older post_<format>_5d_growth name
+const growthColumn = (growthMetric: string): string => {
+  const metric = growthMetric.replace(/^sorted_/, '');
+  const post5d = metric.match(/^(pct|raw)_post_5d$/);
+  return post5d ? `post_${post5d[1]}_5d_growth` : `${metric}_growth`;
+};
+
+const readGrowthValue = (row: any, growthMetric: string): number => {
+  const value = row[growthColumn(growthMetric)] || row.growth_value;
+  return value ? parseFloat(value) : 0;
+};
+
 export const loadRepositoryData = async (growthMetric: string): Promise<Repository[]> => {
+  const loaded = await loadDataBundle();
+  const metric = loaded?.bundle.metrics[growthMetric];
+  if (loaded && metric) {
+    return metric.order.map((id, rank) => ({
+      ...repositoryFromBundle(loaded.bundle, id),
+      growth_value: metric.values[rank] ?? 0,
+      current_stars: loaded.bundle.repos.stargazers_count[id]
+    }));
+  }
+
   const maxRetries = 3;
   
   for (let attempt = 1; attempt <= maxRetries; attempt++) {
@@ -68,53 +162,7 @@ export const loadRepositoryData = async (growthMetric: string): Promise<Reposito
         return growthData.map(row => {
           const repoName = row.repo_name || row.full_name || row.repository || row.name || '';
           
-          let growthValue = 0;
-          
-          if (row.raw_30d_growth) {
-            growthValue = parseFloat(row.raw_30d_growth);
-          } else if (row.raw_5d_growth) {
-            growthValue = parseFloat(row.raw_5d_growth);
-          } else if (row.raw_1d_growth) {
-            growthValue = parseFloat(row.raw_1d_growth);
-          } else if (row.post_raw_5d_growth) {
-            growthValue = parseFloat(row.post_raw_5d_growth);
-          } else if (row.post_raw_day_growth) {
-            growthValue = parseFloat(row.post_raw_day_growth);
-          }
-          else {
-            for (let day = 1; day <= 29; day++) {
-              if (row[`raw_post_day_${day}_growth`]) {
-                growthValue = parseFloat(row[`raw_post_day_${day}_growth`]);
-                break;
-              }
-            }
-          }
-          
-          if (growthValue === 0) {
-            if (row.pct_30d_growth) {
-              growthValue = parseFloat(row.pct_30d_growth);
-            } else if (row.pct_5d_growth) {
-              growthValue = parseFloat(row.pct_5d_growth);
-            } else if (row.pct_1d_growth) {
-              growthValue = parseFloat(row.pct_1d_growth);
-            } else if (row.post_pct_5d_growth) {
-              growthValue = parseFloat(row.post_pct_5d_growth);
-            } else if (row.post_pct_day_growth) {
-              growthValue = parseFloat(row.post_pct_day_growth);
-            }
-            else {
-              for (let day = 1; day <= 29; day++) {
-                if (row[`pct_post_day_${day}_growth`]) {
-                  growthValue = parseFloat(row[`pct_post_day_${day}_growth`]);
-                  break;
-                }
-              }
-            }
-            
-            if (growthValue === 0 && row.growth_value) {
-              growthValue = parseFloat(row.growth_value);
-            }
-          }
+          const growthValue = readGrowthValue(row, growthMetric);
           
           return {
             repo_name: repoName,
@@ -141,53 +189,7 @@ export const loadRepositoryData = async (growthMetric: string): Promise<Reposito
         return growthData.map(row => {
           const repoName = row.repo_name || row.full_name || row.repository || row.name || '';
           
-          let growthValue = 0;
-          
-          if (row.raw_30d_growth) {
-            growthValue = parseFloat(row.raw_30d_growth);
-          } else if (row.raw_5d_growth) {
-            growthValue = parseFloat(row.raw_5d_growth);
-          } else if (row.raw_1d_growth) {
-            growthValue = parseFloat(row.raw_1d_growth);
-          } else if (row.post_raw_5d_growth) {
-            growthValue = parseFloat(row.post_raw_5d_growth);
-          } else if (row.post_raw_day_growth) {
-            growthValue = parseFloat(row.post_raw_day_growth);
-          }
-          else {
-            for (let day = 1; day <= 29; day++) {
-              if (row[`raw_post_day_${day}_growth`]) {
-                growthValue = parseFloat(row[`raw_post_day_${day}_growth`]);
-                break;
-              }
-            }
-          }
-          
-          if (growthValue === 0) {
-            if (row.pct_30d_growth) {
-              growthValue = parseFloat(row.pct_30d_growth);
-            } else if (row.pct_5d_growth) {
-              growthValue = parseFloat(row.pct_5d_growth);
-            } else if (row.pct_1d_growth) {
-              growthValue = parseFloat(row.pct_1d_growth);
-            } else if (row.post_pct_5d_growth) {
-              growthValue = parseFloat(row.post_pct_5d_growth);
-            } else if (row.post_pct_day_growth) {
-              growthValue = parseFloat(row.post_pct_day_growth);
-            }
-            else {
-              for (let day = 1; day <= 29; day++) {
-                if (row[`pct_post_day_${day}_growth`]) {
-                  growthValue = parseFloat(row[`pct_post_day_${day}_growth`]);
-                  break;
-                }
-              }
-            }
-            
-            if (growthValue === 0 && row.growth_value) {
-              growthValue = parseFloat(row.growth_value);
-            }
-          }
+          const growthValue = readGrowthValue(row, growthMetric);
           
           return {
             repo_name: repoName,
@@ -223,53 +225,7 @@ export const loadRepositoryData = async (growthMetric: string): Promise<Reposito
         const repoName = growthRow.repo_name || growthRow.full_name || growthRow.repository || growthRow.name || '';
         const metadata = repoMetadataMap.get(repoName); // This may be undefined, and that's OK
         
-        let growthValue = 0;
-        
-        if (growthRow.raw_30d_growth) {
-          growthValue = parseFloat(growthRow.raw_30d_growth);
-        } else if (growthRow.raw_5d_growth) {
-          growthValue = parseFloat(growthRow.raw_5d_growth);
-        } else if (growthRow.raw_1d_growth) {
-          growthValue = parseFloat(growthRow.raw_1d_growth);
-        } else if (growthRow.post_raw_5d_growth) {
-          growthValue = parseFloat(growthRow.post_raw_5d_growth);
-        } else if (growthRow.post_raw_day_growth) {
-          growthValue = parseFloat(growthRow.post_raw_day_growth);
-        }
-        else {
-          for (let day = 1; day <= 29; day++) {
-            if (growthRow[`raw_post_day_${day}_growth`]) {
-              growthValue = parseFloat(growthRow[`raw_post_day_${day}_growth`]);
-              break;
-            }
-          }
-        }
-        
-        if (growthValue === 0) {
-          if (growthRow.pct_30d_growth) {
-            growthValue = parseFloat(growthRow.pct_30d_growth);
-          } else if (growthRow.pct_5d_growth) {
-            growthValue = parseFloat(growthRow.pct_5d_growth);
-          } else if (growthRow.pct_1d_growth) {
-            growthValue = parseFloat(growthRow.pct_1d_growth);
-          } else if (growthRow.post_pct_5d_growth) {
-            growthValue = parseFloat(growthRow.post_pct_5d_growth);
-          } else if (growthRow.post_pct_day_growth) {
-            growthValue = parseFloat(growthRow.post_pct_day_growth);
-          }
-          else {
-            for (let day = 1; day <= 29; day++) {
-              if (growthRow[`pct_post_day_${day}_growth`]) {
-                growthValue = parseFloat(growthRow[`pct_post_day_${day}_growth`]);
-                break;
-              }
-            }
-          }
-          
-          if (growthValue === 0 && growthRow.growth_value) {
-            growthValue = parseFloat(growthRow.growth_value);
-          }
-        }
+        const growthValue = readGrowthValue(growthRow, growthMetric);
         
         // Use metadata if available, otherwise fall back to growth data or defaults
         return {
@@ -310,6 +266,11 @@ export const loadRepositoryData = async (growthMetric: string): Promise<Reposito
 };
 
 export const loadFilterData = async (): Promise<Repository[]> => {
+  const loaded = await loadDataBundle();
+  if (loaded) {
+    return loaded.bundle.repos.repo_name.map((_, id) => repositoryFromBundle(loaded.bundle, id));
+  }
+
   try {
     console.log('Loading filter data from repo_filters.csv');
     const response = await fetch('/repo_filters.csv');
@@ -345,6 +306,15 @@ export const loadFilterData = async (): Promise<Repository[]> => {
 };
 
 export const loadStarHistory = async (owner: string, name: string): Promise<StarHistoryPoint[]> => {
+  const loaded = await loadDataBundle();
+  const id = loaded?.repoIds.get(`${owner}/${name}`);
+  if (loaded && id !== undefined) {
+    const { dates, stars } = loaded.bundle.history;
+    return dates
+      .map((date, i) => ({ date, stars: stars[id][i] }))
+      .filter((point): point is StarHistoryPoint => point.stars !== null);
+  }
+
   try {
     console.log('Loading star history for:', `${owner}/${name}`);
     // Updated path to match your file structure: converted_star_history/[owner]/[repo_name].csv
@@ -1,6 +1,35 @@
-import { Repository, FilterState } from '@/types/repository';
+import { Repository, FilterState, FilterLookup } from '@/types/repository';
+
+const unionIds = (index: Record<string, number[]>, keys: string[]): Set<number> => {
+  const ids = new Set<number>();
+  keys.forEach(key => (index[key] || []).forEach(id => ids.add(id)));
+  return ids;
+};
+
+const intersect = (allowed: Set<number> | null, ids: Set<number>): Set<number> => {
+  return allowed ? new Set([...allowed].filter(id => ids.has(id))) : ids;
+};
+
+// Resolves the included topics, licenses and ownership to one set of allowed repo ids,
+// or null when none of them restricts anything
+const allowedIds = ({ indexes }: FilterLookup, filters: FilterState): Set<number> | null => {
+  let allowed: Set<number> | null = null;
+  if (filters.licenses.length > 0) {
+    allowed = intersect(allowed, unionIds(indexes.license, filters.licenses));
+  }
+  if (filters.ownership.length > 0) {
+    allowed = intersect(allowed, unionIds(indexes.owner_type, filters.ownership));
+  }
+  if (filters.includeTopics.length > 0) {
+    allowed = intersect(allowed, unionIds(indexes.topics, filters.includeTopics.map(topic => topic.toLowerCase())));
+  }
+  return allowed;
+};
+
+export const applyFilters = (repositories: Repository[], filters: FilterState, lookup?: FilterLookup | null): Repository[] => {
+  const allowed = lookup ? allowedIds(lookup, filters) : null;
+  const excluded = lookup ? unionIds(lookup.indexes.topics, filters.excludeTopics.map(topic => topic.toLowerCase())) : null;
 
-export const applyFilters = (repositories: Repository[], filters: FilterState): Repository[] => {
   const result = repositories.filter(repo => {
     if (repo.stargazers_count < filters.stars[0] || repo.stargazers_count > filters.stars[1]) {
       return false;
@@ -29,55 +58,71 @@ export const applyFilters = (repositories: Repository[], filters: FilterState):
       return false;
     }
 
-    const repoTopics = (repo.topics || '')
-      .toLowerCase()
-      .split('|')
-      .map(t => t.trim())
-      .filter(Boolean);
-
-    if (filters.includeTopics.length > 0) {
-      const hasIncludedTopic = filters.includeTopics.some(topic =>
-        repoTopics.includes(topic.toLowerCase())
-      );
-      if (!hasIncludedTopic) {
+    if (lookup) {
+      const id = lookup.repoIds.get(repo.repo_name);
+      if (allowed && (id === undefined || !allowed.has(id))) {
         return false;
       }
-    }
-
-    if (filters.excludeTopics.length > 0) {
-      const hasExcludedTopic = filters.excludeTopics.some(topic =>
-        repoTopics.includes(topic.toLowerCase())
-      );
-      if (hasExcludedTopic) {
+      if (id !== undefined && excluded!.has(id)) {
         return false;
       }
+    } else if (!passesCategoricalFilters(repo, filters)) {
+      return false;
     }
 
-    if (filters.licenses.length > 0) {
-      let repoLicense = repo.license_spdx;
-      if (!repoLicense || repoLicense === 'NOASSERTION') {
-        repoLicense = 'No License';
-      } else if (!['MIT', 'Apache-2.0', 'GPL-3.0', 'AGPL-3.0'].includes(repoLicense)) {
-        repoLicense = 'Other';
-      }
+    if (filters.upcoming !== null && repo.upcoming !== filters.upcoming) {
+      return false;
+    }
 
-      if (!filters.licenses.includes(repoLicense)) {
-        return false;
-      }
+    return true;
+  });
+
+  return result;
+};
+
+const passesCategoricalFilters = (repo: Repository, filters: FilterState): boolean => {
+  const repoTopics = (repo.topics || '')
+    .toLowerCase()
+    .split('|')
+    .map(t => t.trim())
+    .filter(Boolean);
+
+  if (filters.includeTopics.length > 0) {
+    const hasIncludedTopic = filters.includeTopics.some(topic =>
+      repoTopics.includes(topic.toLowerCase())
+    );
+    if (!hasIncludedTopic) {
+      return false;
     }
+  }
 
-    if (filters.ownership.length > 0 && !filters.ownership.includes(repo.owner_type)) {
+  if (filters.excludeTopics.length > 0) {
+    const hasExcludedTopic = filters.excludeTopics.some(topic =>
+      repoTopics.includes(topic.toLowerCase())
+    );
+    if (hasExcludedTopic) {
       return false;
     }
+  }
+
+  if (filters.licenses.length > 0) {
+    let repoLicense = repo.license_spdx;
+    if (!repoLicense || repoLicense === 'NOASSERTION') {
+      repoLicense = 'No License';
+    } else if (!['MIT', 'Apache-2.0', 'GPL-3.0', 'AGPL-3.0'].includes(repoLicense)) {
+      repoLicense = 'Other';
+    }
 
-    if (filters.upcoming !== null && repo.upcoming !== filters.upcoming) {
+    if (!filters.licenses.includes(repoLicense)) {
       return false;
     }
+  }
 
-    return true;
-  });
+  if (filters.ownership.length > 0 && !filters.ownership.includes(repo.owner_type)) {
+    return false;
+  }
 
-  return result;
+  return true;
 };
 
 export const getDefaultFilters = (): FilterState => {
@@ -50,9 +50,7 @@ export const generateHistogram = (repositories: Repository[]): HistogramBin[] =>
     console.log(`- Count: ${count}`);
     console.log(`- Sample values in bin:`, valuesInBin.slice(0, 5));
     
-    const label = i === binCount - 1 
-      ? `>${formatValue(binMin)}` 
-      : `${formatValue(binMin)}-${formatValue(binMax)}`;
+    const label = binLabel(binMin, binMax, i === binCount - 1);
     
     bins.push({
       min: binMin,
@@ -76,4 +74,8 @@ const formatValue = (value: number): string => {
   } else {
     return (Math.round(value / 100) * 100).toString();
   }
-};
\ No newline at end of file
+};
+
+export const binLabel = (binMin: number, binMax: number, last: boolean): string => {
+  return last ? `>${formatValue(binMin)}` : `${formatValue(binMin)}-${formatValue(binMax)}`;
+};
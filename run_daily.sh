@@ -17,23 +17,16 @@ source "$SCRIPT_DIR/venv/bin/activate"
 
 # Check if files exist in backend/utils directory
 echo "Checking for required files in backend/utils directory..."
+[ -f "$SCRIPT_DIR/backend/run_pipeline.py" ] || { echo "Error: run_pipeline.py not found"; exit 1; }
 [ -f "$SCRIPT_DIR/backend/fetch_repos.py" ] || { echo "Error: fetch_repos.py not found"; exit 1; }
 [ -f "$SCRIPT_DIR/backend/update_star_history.py" ] || { echo "Error: update_star_history.py not found"; exit 1; }
 [ -f "$SCRIPT_DIR/backend/cleanup_old_repos.py" ] || { echo "Error: cleanup_old_repos.py not found"; exit 1; }
 [ -f "$SCRIPT_DIR/backend/convert_and_sort_star_history.py" ] || { echo "Error: convert_and_sort_star_history.py not found"; exit 1; }
 
-# Run scripts with correct paths
-echo "Running repository discovery..."
-python "$SCRIPT_DIR/backend/fetch_repos.py" || exit 1
-
-echo "Updating star histories..."
-python "$SCRIPT_DIR/backend/update_star_history.py" || exit 1
-
-echo "Cleaning up old repositories..."
-python "$SCRIPT_DIR/backend/cleanup_old_repos.py" || exit 1
-
-echo "Converting and sorting star history..."
-python "$SCRIPT_DIR/backend/convert_and_sort_star_history.py" || exit 1
+# Discovery, star history update, cleanup and conversion run as stages of one process.
+# Stages whose inputs are unchanged are skipped, so rerunning after a failure resumes where it stopped.
+echo "Running pipeline..."
+python "$SCRIPT_DIR/backend/run_pipeline.py" "$@" || exit 1
 
 echo "----------------------------------------"
 echo "Daily tracking completed successfully"